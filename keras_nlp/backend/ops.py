@@ -49,3 +49,13 @@ if keras_core.config.backend() == "tensorflow" or not multi_backend():
         return keras_core.src.backend.tensorflow.numpy.take_along_axis(
             x, indices, axis=axis
         )
+
+
+if keras_core.config.backend() == "jax" and multi_backend():
+
+    def scatter_update(inputs, indices, updates):
+        # TODO: move this fix for immutable jax arrays into keras-core.
+        import jax.numpy as jnp
+
+        indices = jnp.transpose(jnp.array(indices))
+        return inputs.at[tuple(indices)].set(updates)
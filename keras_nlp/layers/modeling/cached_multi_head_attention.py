@@ -13,8 +13,15 @@
 # limitations under the License.
 
 from keras_nlp.api_export import keras_nlp_export
+from keras_nlp.backend import config
 from keras_nlp.backend import keras
 from keras_nlp.backend import ops
+from keras_nlp.layers.modeling.quantized_dense import QuantizedDense
+from keras_nlp.layers.modeling.quantized_dense import get_quantization_mode
+from keras_nlp.layers.modeling.quantized_dense import quantize_sublayers_from
+from keras_nlp.layers.modeling.transformer_layer_utils import gather_paged_cache
+from keras_nlp.layers.modeling.transformer_layer_utils import update_cache
+from keras_nlp.layers.modeling.transformer_layer_utils import update_paged_cache
 
 
 @keras_nlp_export("keras_nlp.layers.CachedMultiHeadAttention")
@@ -36,6 +43,11 @@ class CachedMultiHeadAttention(keras.layers.MultiHeadAttention):
     Note that caching is useful only during inference and should not be used
     during training.
 
+    If `quantization_mode="int8"` is passed, the layer builds
+    `keras_nlp.layers.QuantizedDense` projections with int8 kernels in place
+    of float projections. Use `quantize_from()` to set their weights from a
+    float layer with the same config.
+
     We use the notation `B`, `T`, `S` below, where `B` is the batch dimension,
     `T` is the target sequence length, and `S` in the source sequence length.
     Note that during generative decoding, `T` is usually 1 (you are
@@ -64,7 +76,17 @@ class CachedMultiHeadAttention(keras.layers.MultiHeadAttention):
         cache_update_index: a int or int Tensor, the index at which to update
             `cache` (usually the index of the current token being processed
             when running generation). If `cache_update_index=None` while `cache`
-            is set, the cache will not be updated.
+            is set, the cache will not be updated. An int Tensor of shape
+            `(B,)` can be passed to update each sequence of the batch at its
+            own index (e.g. when batched sequences are at different lengths).
+        cache_block_table: an int Tensor of shape `(B, max_num_blocks)`. If
+            set, `cache` is a paged cache, a pool of fixed size blocks of shape
+            `[num_blocks, 2, block_size, num_heads, key_dims]` shared by all
+            sequences, and `cache_block_table` holds the indices of the blocks
+            of each sequence in the pool. Position `p` of a sequence is stored
+            at offset `p % block_size` of its `p // block_size`-th block, and
+            `S` is `max_num_blocks * block_size`. A paged cache only needs
+            blocks for the tokens each sequence actually holds.
 
     Returns:
         An `(attention_output, cache)` tuple. `attention_output` is the result
@@ -75,6 +97,94 @@ class CachedMultiHeadAttention(keras.layers.MultiHeadAttention):
         updated cache.
     """
 
+    def __init__(self, *args, quantization_mode=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.quantization_mode = get_quantization_mode(quantization_mode)
+
+    # The attention projections are built by `build()` on Keras Core, and by
+    # `_build_from_signature()` on `tf.keras`. We only override the method of
+    # the current backend, as callers check for `_build_from_signature`.
+    if config.multi_backend():
+
+        def build(self, query_shape, value_shape, key_shape=None):
+            if self.quantization_mode is None:
+                return super().build(query_shape, value_shape, key_shape)
+            self._build_quantized(query_shape, value_shape, key_shape)
+
+    else:
+
+        def _build_from_signature(self, query, value, key=None):
+            if self.quantization_mode is None:
+                return super()._build_from_signature(query, value, key)
+            self._built_from_signature = True
+            self._query_shape = tuple(getattr(query, "shape", query))
+            self._value_shape = tuple(getattr(value, "shape", value))
+            self._key_shape = self._value_shape
+            if key is not None:
+                self._key_shape = tuple(getattr(key, "shape", key))
+            self._build_quantized(
+                self._query_shape, self._value_shape, self._key_shape
+            )
+
+    def _build_quantized(self, query_shape, value_shape, key_shape=None):
+        key_shape = value_shape if key_shape is None else key_shape
+        output_dim = self._output_shape
+        if output_dim is None:
+            output_dim = query_shape[-1]
+        if not isinstance(output_dim, int):
+            raise ValueError(
+                "Quantized attention only supports an integer `output_shape`. "
+                f"Received: output_shape={output_dim}"
+            )
+
+        def projection(name, equation, kernel_shape, bias_shape):
+            return QuantizedDense(
+                equation=equation,
+                kernel_shape=kernel_shape,
+                bias_shape=bias_shape if self._use_bias else None,
+                dtype=self.dtype_policy,
+                name=name,
+            )
+
+        heads, key_dim, value_dim = (
+            self._num_heads,
+            self._key_dim,
+            self._value_dim,
+        )
+        self._query_dense = projection(
+            "query",
+            "...a,abc->...bc",
+            (query_shape[-1], heads, key_dim),
+            (heads, key_dim),
+        )
+        self._key_dense = projection(
+            "key",
+            "...a,abc->...bc",
+            (key_shape[-1], heads, key_dim),
+            (heads, key_dim),
+        )
+        self._value_dense = projection(
+            "value",
+            "...a,abc->...bc",
+            (value_shape[-1], heads, value_dim),
+            (heads, value_dim),
+        )
+        self._build_attention(len(query_shape) + 1)
+        self._output_dense = projection(
+            "attention_output",
+            "...ab,abc->...c",
+            (heads, value_dim, output_dim),
+            (output_dim,),
+        )
+        for layer in (
+            self._query_dense,
+            self._key_dense,
+            self._value_dense,
+            self._output_dense,
+        ):
+            layer.build()
+        self.built = True
+
     def call(
         self,
         query,
@@ -83,6 +193,7 @@ class CachedMultiHeadAttention(keras.layers.MultiHeadAttention):
         attention_mask=None,
         cache=None,
         cache_update_index=None,
+        cache_block_table=None,
     ):
         if (
             hasattr(self, "_build_from_signature")
@@ -102,18 +213,30 @@ class CachedMultiHeadAttention(keras.layers.MultiHeadAttention):
         # cache at the specified index. `cache = None` handles the training
         # case, where we don't use the cache at all.
         if cache is not None:
-            key_cache = cache[:, 0, ...]
-            value_cache = cache[:, 1, ...]
-            if cache_update_index is None:
-                key = key_cache
-                value = value_cache
-            else:
+            if cache_update_index is not None:
                 key_update = self._key_dense(key)
                 value_update = self._value_dense(value)
-                start = [0, cache_update_index, 0, 0]
-                key = ops.slice_update(key_cache, start, key_update)
-                value = ops.slice_update(value_cache, start, value_update)
-                cache = ops.stack((key, value), axis=1)
+                # Write keys and values with a single update of the cache, so
+                # we only touch the new entries, and never restack the cache.
+                update = ops.stack((key_update, value_update), axis=1)
+                if cache_block_table is None:
+                    cache = update_cache(
+                        cache, update, cache_update_index, axis=2
+                    )
+                else:
+                    cache = update_paged_cache(
+                        cache,
+                        update,
+                        cache_update_index,
+                        cache_block_table,
+                        axis=2,
+                    )
+            key = cache[:, 0, ...]
+            value = cache[:, 1, ...]
+            if cache_block_table is not None:
+                # Gather the blocks of each sequence into a dense view.
+                key = gather_paged_cache(key, cache_block_table)
+                value = gather_paged_cache(value, cache_block_table)
         else:
             if cache_update_index is not None:
                 raise ValueError(
@@ -139,3 +262,22 @@ class CachedMultiHeadAttention(keras.layers.MultiHeadAttention):
         )
         attention_output = self._output_dense(attention_output)
         return attention_output, cache
+
+    def quantize_from(self, layer):
+        """Set the weights of the quantized layer from a float `layer`.
+
+        Args:
+            layer: A built float `CachedMultiHeadAttention` layer with the same
+                config as this layer.
+        """
+        quantize_sublayers_from(
+            self,
+            layer,
+            ["_query_dense", "_key_dense", "_value_dense", "_output_dense"],
+        )
+
+    def get_config(self):
+        config = super().get_config()
+        if self.quantization_mode is not None:
+            config["quantization_mode"] = self.quantization_mode
+        return config
@@ -74,3 +74,64 @@ class CachedMultiHeadAttentionTest(TestCase):
 
         self.assertAllClose(output, no_loop_outputs)
         self.assertAllClose(output_cache, no_loop_cache)
+
+    def test_per_row_cache_update_index(self):
+        batch_size = 2
+        seq_len = 4
+        num_heads = 2
+        key_dim = 4
+        hidden_dim = num_heads * key_dim
+
+        x = ops.random.uniform(shape=(batch_size, seq_len, hidden_dim))
+        cache = ops.zeros((batch_size, 2, seq_len, num_heads, key_dim))
+        mask = ops.tril(ops.ones((seq_len, seq_len)))
+        layer = CachedMultiHeadAttention(num_heads=num_heads, key_dim=key_dim)
+        outputs, cache = layer(
+            x, x, cache=cache, cache_update_index=0, attention_mask=mask
+        )
+
+        # Decode the row `i` at index `i`, which should match the full pass.
+        index = ops.arange(batch_size)
+        next_input = ops.stack([x[0, 0:1], x[1, 1:2]])
+        next_mask = ops.stack([mask[0:1], mask[1:2]])
+        next_outputs, next_cache = layer(
+            next_input,
+            next_input,
+            cache=cache,
+            cache_update_index=index,
+            attention_mask=next_mask,
+        )
+        self.assertAllClose(next_outputs[0], outputs[0, 0:1])
+        self.assertAllClose(next_outputs[1], outputs[1, 1:2])
+        self.assertAllClose(next_cache, cache)
+
+    def test_paged_cache(self):
+        batch_size = 2
+        seq_len = 4
+        num_heads = 2
+        key_dim = 4
+        hidden_dim = num_heads * key_dim
+        block_size = 2
+
+        x = ops.random.uniform(shape=(batch_size, seq_len, hidden_dim))
+        mask = ops.tril(ops.ones((seq_len, seq_len)))
+        layer = CachedMultiHeadAttention(num_heads=num_heads, key_dim=key_dim)
+        dense_cache = ops.zeros((batch_size, 2, seq_len, num_heads, key_dim))
+        outputs, dense_cache = layer(
+            x, x, cache=dense_cache, cache_update_index=0, attention_mask=mask
+        )
+
+        # Two blocks per row, scattered across a pool of five blocks.
+        block_table = ops.array([[3, 1], [4, 2]])
+        cache = ops.zeros((5, 2, block_size, num_heads, key_dim))
+        paged_outputs, cache = layer(
+            x,
+            x,
+            cache=cache,
+            cache_update_index=0,
+            cache_block_table=block_table,
+            attention_mask=mask,
+        )
+        self.assertAllClose(paged_outputs, outputs)
+        self.assertAllClose(cache[3, :, :, ...], dense_cache[0, :, :2, ...])
+        self.assertAllClose(cache[2, :, :, ...], dense_cache[1, :, 2:, ...])
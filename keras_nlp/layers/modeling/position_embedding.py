@@ -42,6 +42,8 @@ class PositionEmbedding(keras.layers.Layer):
         start_index: An integer or integer tensor. The starting position to
             compute the position embedding from. This is useful during cached
             decoding, where each position is predicted separately in a loop.
+            An integer tensor of shape `(batch_size,)` can be passed to start
+            each row of the batch at a different position.
 
     Examples:
 
@@ -110,6 +112,11 @@ class PositionEmbedding(keras.layers.Layer):
         # trim to match the length of the input sequence, which might be less
         # than the sequence_length of the layer.
         position_embeddings = ops.convert_to_tensor(self.position_embeddings)
+        if len(getattr(start_index, "shape", ())) == 1:
+            # Gather a separate range of positions for each row.
+            positions = ops.arange(sequence_length, dtype="int32")
+            positions = ops.cast(start_index, "int32")[:, None] + positions
+            return ops.take(position_embeddings, positions, axis=0)
         position_embeddings = ops.slice(
             position_embeddings,
             (start_index, 0),
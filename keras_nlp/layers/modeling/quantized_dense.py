@@ -0,0 +1,335 @@
+# Copyright 2023 The KerasNLP Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+
+import numpy as np
+
+from keras_nlp.backend import keras
+from keras_nlp.backend import ops
+
+QUANTIZATION_MODES = ("int8",)
+
+
+def check_quantization_mode(mode):
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(
+            "`mode` must be one of "
+            f"""{", ".join(QUANTIZATION_MODES)}. Received: mode={mode}"""
+        )
+
+
+def quantize_int8(weights, axis):
+    """Quantize float weights to int8 with a symmetric scale.
+
+    Args:
+        weights: A float array or variable.
+        axis: int or tuple of ints. The axes reduced for each scale, i.e.
+            the axes *not* receiving their own scale.
+
+    Returns:
+        A `(quantized, scale)` tuple of numpy arrays, where `quantized` is an
+        int8 array of the same shape as `weights` and `scale` is a float array
+        with the reduced axes kept as size one, such that `quantized * scale`
+        approximates `weights`.
+    """
+    weights = ops.convert_to_numpy(weights)
+    scale = np.max(np.abs(weights), axis=axis, keepdims=True) / 127.0
+    # Avoid dividing by zero for channels which are all zeros.
+    scale = np.where(scale == 0, 1.0, scale).astype(weights.dtype)
+    quantized = np.clip(np.round(weights / scale), -127, 127)
+    return quantized.astype("int8"), scale
+
+
+_QUANTIZATION_MODE = None
+
+
+@contextlib.contextmanager
+def quantization_scope(mode):
+    """Create quantized layers for `mode` within the scope.
+
+    Quantizable layers created within the scope default to
+    `quantization_mode=mode`, and build int8 weights in place of float
+    weights. This is used to rebuild a model with quantized layers from its
+    config.
+    """
+    global _QUANTIZATION_MODE
+    check_quantization_mode(mode)
+    previous_mode = _QUANTIZATION_MODE
+    _QUANTIZATION_MODE = mode
+    try:
+        yield
+    finally:
+        _QUANTIZATION_MODE = previous_mode
+
+
+def get_quantization_mode(quantization_mode=None):
+    """Return `quantization_mode`, or the mode of the current scope."""
+    if quantization_mode is None:
+        return _QUANTIZATION_MODE
+    check_quantization_mode(quantization_mode)
+    return quantization_mode
+
+
+def build_dense(layer, inputs_shape, quantization_mode=None):
+    """Build an unbuilt `Dense` or `EinsumDense` layer, quantized if requested.
+
+    If `quantization_mode` is `None`, `layer` is built and returned. Otherwise,
+    a built `QuantizedDense` layer with the same projection is returned in
+    place of `layer`, and no float weights are created.
+    """
+    if quantization_mode is None:
+        layer.build(inputs_shape)
+        return layer
+    if isinstance(layer, keras.layers.EinsumDense):
+        equation = layer.equation
+        output_shape = list(layer.partial_output_shape)
+        bias_axes = layer.bias_axes
+    elif isinstance(layer, keras.layers.Dense):
+        equation = "...a,ab->...b"
+        output_shape = [layer.units]
+        bias_axes = "b" if layer.use_bias else None
+    else:
+        raise ValueError(
+            "`layer` must be a `keras.layers.Dense` or "
+            f"`keras.layers.EinsumDense` layer. Received: layer={layer}"
+        )
+    input_axes, kernel_axes, output_axes = _parse_equation(equation)
+    # Explicit axes are the trailing axes of the inputs and outputs.
+    sizes = dict(zip(input_axes, inputs_shape[-len(input_axes) :]))
+    for axis, size in zip(output_axes[::-1], output_shape[::-1]):
+        if size is not None:
+            sizes[axis] = size
+    bias_shape = None
+    if bias_axes is not None:
+        # The bias spans the output axes from its first axis, as in
+        # `EinsumDense`, with size one for output axes not in `bias_axes`.
+        first = min(output_axes.index(x) for x in bias_axes)
+        bias_shape = [
+            sizes[x] if x in bias_axes else 1 for x in output_axes[first:]
+        ]
+    quantized = QuantizedDense(
+        equation=equation,
+        kernel_shape=[sizes[x] for x in kernel_axes],
+        bias_shape=bias_shape,
+        activation=layer.activation,
+        dtype=layer.dtype_policy,
+        name=layer.name,
+    )
+    quantized.build(inputs_shape)
+    return quantized
+
+
+def quantize_sublayers_from(layer, source, names):
+    """Set the weights of quantized `layer` from a float `source` layer.
+
+    `layer` and `source` must have the same config, except for the
+    quantization mode. The sublayers `names` of `layer` are quantized from the
+    matching sublayers of `source` with their own `quantize_from()`, and all
+    other weights are copied as is.
+    """
+    sublayers = [
+        (getattr(layer, name), getattr(source, name))
+        for name in names
+        if getattr(layer, name, None) is not None
+    ]
+    for sublayer, source_sublayer in sublayers:
+        sublayer.quantize_from(source_sublayer)
+    quantized_ids = set()
+    for sublayer, source_sublayer in sublayers:
+        quantized_ids.update(id(x) for x in sublayer.weights)
+        quantized_ids.update(id(x) for x in source_sublayer.weights)
+    weights = [x for x in layer.weights if id(x) not in quantized_ids]
+    source_weights = [x for x in source.weights if id(x) not in quantized_ids]
+    shapes = [tuple(x.shape) for x in weights]
+    if shapes != [tuple(x.shape) for x in source_weights]:
+        raise ValueError(
+            f"The weights of layer '{layer.name}' do not match the weights "
+            f"of layer '{source.name}'. Both layers must have the same config."
+        )
+    for weight, source_weight in zip(weights, source_weights):
+        weight.assign(source_weight)
+
+
+def _parse_equation(equation):
+    """Split an einsum equation into lists of input, kernel, output axes."""
+    inputs, output = equation.split("->")
+    inputs, kernel = inputs.split(",")
+    # Leading ellipses are implicit, as they never hold kernel axes.
+    return [list(x.replace("...", "")) for x in (inputs, kernel, output)]
+
+
+class QuantizedDense(keras.layers.Layer):
+    """An int8 weight-only quantized dense projection.
+
+    This layer replaces a `keras.layers.Dense` or `keras.layers.EinsumDense`
+    layer for inference. The kernel is stored as
+    int8, with a float scale for each output channel, i.e. each kernel entry
+    not summed over by the projection. The kernel is dequantized on the fly,
+    by casting it to the compute dtype and scaling the outputs of the
+    projection, which is equivalent to scaling the kernel as each output
+    channel has its own scale. The kernel takes 4x less memory than a float32
+    kernel, and the bias is kept as is.
+
+    Use `QuantizedDense.from_layer()` to create a layer from a built `Dense`
+    or `EinsumDense` layer, or `build_dense()` to create a layer in place of
+    an unbuilt one, and `quantize_from()` to quantize float weights into it.
+
+    Args:
+        equation: string. An einsum equation for the projection, with the
+            inputs as first operand and the kernel as second operand, e.g.
+            `"...a,ab->...b"` for a `Dense` layer.
+        kernel_shape: tuple of ints. The shape of the kernel.
+        bias_shape: tuple of ints. The shape of the bias, broadcast against
+            the trailing axes of the output. If `None`, the layer has no bias.
+        activation: string or callable. The activation applied to outputs.
+    """
+
+    def __init__(
+        self,
+        equation,
+        kernel_shape,
+        bias_shape=None,
+        activation=None,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.equation = equation
+        self.kernel_shape = tuple(kernel_shape)
+        self.bias_shape = None if bias_shape is None else tuple(bias_shape)
+        self.activation = keras.activations.get(activation)
+        _, kernel_axes, output_axes = _parse_equation(equation)
+        # Axes of the kernel summed over by the projection.
+        self._reduced_axes = tuple(
+            i for i, x in enumerate(kernel_axes) if x not in output_axes
+        )
+        # Output axes holding kernel axes, in the order of the outputs.
+        self._scale_axes = [x for x in output_axes if x in kernel_axes]
+        self._kernel_axes = kernel_axes
+        self._output_axes = output_axes
+
+    def build(self, inputs_shape=None):
+        self.kernel = self.add_weight(
+            name="kernel",
+            shape=self.kernel_shape,
+            initializer="zeros",
+            dtype="int8",
+            trainable=False,
+        )
+        # The scale has the rank of the explicit output axes, with size one
+        # for axes not in the kernel, so it broadcasts against the outputs.
+        scale_shape = [
+            self.kernel_shape[self._kernel_axes.index(x)]
+            if x in self._kernel_axes
+            else 1
+            for x in self._output_axes
+        ]
+        self.kernel_scale = self.add_weight(
+            name="kernel_scale",
+            shape=scale_shape,
+            initializer="ones",
+            trainable=False,
+        )
+        self.bias = None
+        if self.bias_shape is not None:
+            self.bias = self.add_weight(
+                name="bias",
+                shape=self.bias_shape,
+                initializer="zeros",
+                trainable=False,
+            )
+        self.built = True
+
+    def quantize_kernel(self, kernel):
+        """Quantize a float kernel for this layer.
+
+        Returns a `(kernel, kernel_scale)` tuple matching the variables of
+        the layer.
+        """
+        kernel, scale = quantize_int8(kernel, axis=self._reduced_axes)
+        # Drop the reduced axes, and transpose kernel axes to output order.
+        scale = np.squeeze(scale, axis=self._reduced_axes)
+        kept_axes = [x for x in self._kernel_axes if x in self._output_axes]
+        scale = np.transpose(
+            scale, [kept_axes.index(x) for x in self._scale_axes]
+        )
+        scale = np.reshape(scale, self.kernel_scale.shape)
+        return kernel, scale
+
+    def call(self, inputs):
+        kernel = ops.cast(self.kernel, self.compute_dtype)
+        outputs = ops.einsum(self.equation, inputs, kernel)
+        outputs = outputs * ops.cast(self.kernel_scale, self.compute_dtype)
+        if self.bias is not None:
+            outputs = outputs + ops.cast(self.bias, self.compute_dtype)
+        if self.activation is not None:
+            outputs = self.activation(outputs)
+        return outputs
+
+    @classmethod
+    def from_layer(cls, layer):
+        """Create a quantized copy of a built `Dense` or `EinsumDense` layer."""
+        if isinstance(layer, keras.layers.EinsumDense):
+            equation = layer.equation
+        elif isinstance(layer, keras.layers.Dense):
+            equation = "...a,ab->...b"
+        else:
+            raise ValueError(
+                "`layer` must be a `keras.layers.Dense` or "
+                f"`keras.layers.EinsumDense` layer. Received: layer={layer}"
+            )
+        bias = getattr(layer, "bias", None)
+        quantized = cls(
+            equation=equation,
+            kernel_shape=layer.kernel.shape,
+            bias_shape=None if bias is None else bias.shape,
+            activation=layer.activation,
+            dtype=layer.dtype_policy,
+            name=layer.name,
+        )
+        quantized.build()
+        quantized.quantize_from(layer)
+        return quantized
+
+    def quantize_from(self, layer):
+        """Set the weights of the layer from a float `Dense` or `EinsumDense`.
+
+        The kernel of `layer` is quantized, and its bias is copied as is.
+        """
+        kernel, kernel_scale = self.quantize_kernel(layer.kernel)
+        self.kernel.assign(kernel)
+        self.kernel_scale.assign(kernel_scale)
+        if self.bias is not None:
+            self.bias.assign(ops.reshape(layer.bias, self.bias.shape))
+
+    def get_config(self):
+        config = super().get_config()
+        config.update(
+            {
+                "equation": self.equation,
+                "kernel_shape": self.kernel_shape,
+                "bias_shape": self.bias_shape,
+                "activation": keras.activations.serialize(self.activation),
+            }
+        )
+        return config
+
+    def compute_output_shape(self, inputs_shape):
+        input_axes, kernel_axes, output_axes = _parse_equation(self.equation)
+        # Leading axes matched by an ellipsis are kept as is.
+        num_leading = len(inputs_shape) - len(input_axes)
+        sizes = dict(zip(input_axes, inputs_shape[num_leading:]))
+        sizes.update(zip(kernel_axes, self.kernel_shape))
+        output_shape = [sizes[x] for x in output_axes]
+        return tuple(inputs_shape[:num_leading]) + tuple(output_shape)
@@ -0,0 +1,115 @@
+# Copyright 2023 The KerasNLP Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+from absl.testing import parameterized
+
+from keras_nlp.backend import keras
+from keras_nlp.layers.modeling.cached_multi_head_attention import (
+    CachedMultiHeadAttention,
+)
+from keras_nlp.layers.modeling.quantized_dense import QuantizedDense
+from keras_nlp.layers.modeling.quantized_dense import build_dense
+from keras_nlp.layers.modeling.quantized_dense import quantize_int8
+from keras_nlp.tests.test_case import TestCase
+
+
+class QuantizedDenseTest(TestCase):
+    def test_quantize_int8(self):
+        weights = np.array([[1.0, -0.5], [-2.0, 0.0], [0.5, 0.0]], "float32")
+        quantized, scale = quantize_int8(weights, axis=0)
+        self.assertEqual(quantized.dtype, np.int8)
+        self.assertAllClose(scale, [[2.0 / 127, 0.5 / 127]])
+        self.assertAllEqual(quantized[:, 1], [-127, 0, 0])
+        self.assertAllClose(quantized * scale, weights, atol=1e-2)
+
+    @parameterized.named_parameters(
+        ("dense", keras.layers.Dense(8, activation="relu")),
+        ("dense_no_bias", keras.layers.Dense(8, use_bias=False)),
+        (
+            "einsum_dense",
+            keras.layers.EinsumDense(
+                "abc,cde->abde",
+                output_shape=(None, 2, 4),
+                bias_axes="de",
+            ),
+        ),
+        (
+            "einsum_dense_transposed",
+            keras.layers.EinsumDense(
+                "abc,dc->abd",
+                output_shape=(None, 8),
+            ),
+        ),
+    )
+    def test_from_layer(self, layer):
+        inputs = np.random.uniform(size=(2, 3, 4)).astype("float32")
+        outputs = layer(inputs)
+        quantized = QuantizedDense.from_layer(layer)
+        self.assertEqual(quantized.kernel.dtype, "int8")
+        self.assertEqual(quantized.trainable_weights, [])
+        self.assertAllClose(quantized(inputs), outputs, atol=0.02)
+        self.assertEqual(
+            quantized.compute_output_shape(inputs.shape), outputs.shape
+        )
+
+    @parameterized.named_parameters(
+        ("dense", lambda: keras.layers.Dense(8, activation="relu")),
+        (
+            "einsum_dense",
+            lambda: keras.layers.EinsumDense(
+                "abc,cde->abde",
+                output_shape=(None, 2, 4),
+                bias_axes="e",
+            ),
+        ),
+    )
+    def test_build_dense(self, make_layer):
+        inputs = np.random.uniform(size=(2, 3, 4)).astype("float32")
+        layer = make_layer()
+        outputs = layer(inputs)
+        quantized = build_dense(make_layer(), inputs.shape, "int8")
+        self.assertIsInstance(quantized, QuantizedDense)
+        self.assertEqual(quantized.bias.shape, layer.bias.shape)
+        quantized.quantize_from(layer)
+        self.assertAllClose(quantized(inputs), outputs, atol=0.02)
+        # Without a quantization mode, the layer is built as is.
+        layer = make_layer()
+        self.assertIs(build_dense(layer, inputs.shape), layer)
+        self.assertTrue(layer.built)
+
+    def test_invalid_layer(self):
+        with self.assertRaises(ValueError):
+            QuantizedDense.from_layer(keras.layers.Dropout(0.1))
+
+    def test_quantize_attention(self):
+        layer = CachedMultiHeadAttention(num_heads=2, key_dim=4)
+        inputs = np.random.uniform(size=(2, 3, 8)).astype("float32")
+        outputs, _ = layer(inputs, inputs)
+        quantized = CachedMultiHeadAttention.from_config(
+            {**layer.get_config(), "quantization_mode": "int8"}
+        )
+        quantized(inputs, inputs)
+        quantized.quantize_from(layer)
+        self.assertIsInstance(quantized._query_dense, QuantizedDense)
+        self.assertLen(quantized.weights, 4 * 3)
+        self.assertEqual(quantized.trainable_weights, [])
+        quantized_outputs, _ = quantized(inputs, inputs)
+        self.assertAllClose(quantized_outputs, outputs, atol=0.02)
+
+    def test_invalid_quantization(self):
+        with self.assertRaises(ValueError):
+            CachedMultiHeadAttention(
+                num_heads=2, key_dim=4, quantization_mode="int4"
+            )
@@ -17,6 +17,8 @@ import numpy as np
 from keras_nlp.api_export import keras_nlp_export
 from keras_nlp.backend import keras
 from keras_nlp.backend import ops
+from keras_nlp.layers.modeling.quantized_dense import get_quantization_mode
+from keras_nlp.layers.modeling.quantized_dense import quantize_int8
 
 
 @keras_nlp_export("keras_nlp.layers.ReversibleEmbedding")
@@ -34,6 +36,11 @@ class ReversibleEmbedding(keras.layers.Embedding):
 
     This layer has no bias terms.
 
+    If `quantization_mode="int8"` is passed, the layer is built for inference
+    with int8 embeddings, and a float scale per token which is shared by the
+    embedding lookup and the tied reverse projection. Use `quantize_from()` to
+    set the quantized weights from a float layer with the same config.
+
     Args:
         input_dim: Integer. Size of the vocabulary,
             i.e. maximum integer index + 1.
@@ -49,6 +56,9 @@ class ReversibleEmbedding(keras.layers.Embedding):
             the `embeddings` matrix (see `keras.constraints`).
         mask_zero: Boolean, whether or not the input value 0 is a special
             "padding" value that should be masked out.
+        quantization_mode: string. If `"int8"`, weights are stored as int8
+            for inference and are not trainable. Defaults to `None`, or the
+            mode of the enclosing quantization scope.
 
     Call args:
         inputs: The tensor inputs to the layer.
@@ -87,6 +97,7 @@ class ReversibleEmbedding(keras.layers.Embedding):
         embeddings_regularizer=None,
         embeddings_constraint=None,
         mask_zero=False,
+        quantization_mode=None,
         **kwargs,
     ):
         super().__init__(
@@ -99,8 +110,11 @@ class ReversibleEmbedding(keras.layers.Embedding):
             **kwargs,
         )
         self.tie_weights = tie_weights
+        self.quantization_mode = get_quantization_mode(quantization_mode)
 
     def build(self, inputs_shape=None):
+        if self.quantization_mode is not None:
+            return self._build_quantized()
         super().build(inputs_shape)
 
         if not self.tie_weights:
@@ -112,6 +126,8 @@ class ReversibleEmbedding(keras.layers.Embedding):
             )
 
     def call(self, inputs, reverse=False):
+        if self.quantization_mode is not None:
+            return self._quantized_call(inputs, reverse=reverse)
         if reverse:
             if self.tie_weights:
                 reverse_embeddings = ops.transpose(
@@ -123,6 +139,97 @@ class ReversibleEmbedding(keras.layers.Embedding):
 
         return super().call(inputs)
 
+    def _quantized_call(self, inputs, reverse=False):
+        # The scale of each token is applied to the outputs, so the int8
+        # weights are only cast, never scaled, before the lookup or matmul.
+        if reverse:
+            if self.tie_weights:
+                reverse_embeddings = ops.transpose(
+                    ops.convert_to_tensor(self.embeddings)
+                )
+                scale = self.embeddings_scale
+            else:
+                reverse_embeddings = self.reverse_embeddings
+                scale = self.reverse_embeddings_scale
+            reverse_embeddings = ops.cast(
+                reverse_embeddings, self.compute_dtype
+            )
+            outputs = ops.matmul(inputs, reverse_embeddings)
+            return outputs * ops.cast(scale, self.compute_dtype)
+
+        if inputs.dtype != "int32" and inputs.dtype != "int64":
+            inputs = ops.cast(inputs, "int32")
+        outputs = ops.take(self.embeddings, inputs, axis=0)
+        scale = ops.take(self.embeddings_scale, inputs, axis=0)
+        outputs = ops.cast(outputs, self.compute_dtype)
+        return outputs * ops.cast(
+            ops.expand_dims(scale, -1), self.compute_dtype
+        )
+
+    def _build_quantized(self):
+        self.embeddings = self.add_weight(
+            name="embeddings",
+            shape=(self.input_dim, self.output_dim),
+            initializer="zeros",
+            dtype="int8",
+            trainable=False,
+        )
+        self.embeddings_scale = self.add_weight(
+            name="embeddings_scale",
+            shape=(self.input_dim,),
+            initializer="ones",
+            trainable=False,
+        )
+        if not self.tie_weights:
+            self.reverse_embeddings = self.add_weight(
+                name="reverse_embeddings",
+                shape=(self.output_dim, self.input_dim),
+                initializer="zeros",
+                dtype="int8",
+                trainable=False,
+            )
+            self.reverse_embeddings_scale = self.add_weight(
+                name="reverse_embeddings_scale",
+                shape=(self.input_dim,),
+                initializer="ones",
+                trainable=False,
+            )
+        self.built = True
+
+    def quantize_from(self, layer):
+        """Set the weights of the quantized layer from a float `layer`.
+
+        The embeddings are quantized with a float scale per token. If weights
+        are untied, the reverse embeddings are quantized with a float scale per
+        output token.
+
+        Args:
+            layer: A built float `ReversibleEmbedding` layer with the same
+                config as this layer.
+        """
+        if not self.built:
+            self.build()
+        embeddings, embeddings_scale = quantize_int8(layer.embeddings, axis=-1)
+        self.embeddings.assign(embeddings)
+        self.embeddings_scale.assign(np.squeeze(embeddings_scale, -1))
+        if not self.tie_weights:
+            reverse_embeddings, reverse_embeddings_scale = quantize_int8(
+                layer.reverse_embeddings, axis=0
+            )
+            self.reverse_embeddings.assign(reverse_embeddings)
+            self.reverse_embeddings_scale.assign(
+                np.squeeze(reverse_embeddings_scale, 0)
+            )
+
+    def _quantized_variables(self):
+        variables = [self.embeddings, self.embeddings_scale]
+        if not self.tie_weights:
+            variables += [
+                self.reverse_embeddings,
+                self.reverse_embeddings_scale,
+            ]
+        return variables
+
     def get_config(self):
         config = super().get_config()
         config.update(
@@ -130,11 +237,23 @@ class ReversibleEmbedding(keras.layers.Embedding):
                 "tie_weights": self.tie_weights,
             }
         )
+        if self.quantization_mode is not None:
+            config["quantization_mode"] = self.quantization_mode
         return config
 
+    def save_own_variables(self, store):
+        if self.quantization_mode is None:
+            return super().save_own_variables(store)
+        for i, variable in enumerate(self._quantized_variables()):
+            store[str(i)] = ops.convert_to_numpy(variable)
+
     def load_own_variables(self, store):
         if not self.built:
             self.build()
+        if self.quantization_mode is not None:
+            for i, variable in enumerate(self._quantized_variables()):
+                variable.assign(store[str(i)])
+            return
         self.embeddings.assign(store["0"])
         if not self.tie_weights:
             # Handle the case where saved weights are tied, but the layer
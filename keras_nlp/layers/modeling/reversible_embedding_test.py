@@ -100,3 +100,38 @@ class ReversibleEmbeddingTest(TestCase):
 
         restored_output = restored_model(input_data)
         self.assertAllClose(model_output, restored_output)
+
+    @parameterized.named_parameters(
+        ("tie_weights", True),
+        ("untie_weights", False),
+    )
+    def test_quantize(self, tie_weights):
+        def make_model(quantization_mode=None):
+            embedding = ReversibleEmbedding(
+                100,
+                16,
+                tie_weights=tie_weights,
+                quantization_mode=quantization_mode,
+            )
+            inputs = keras.Input(shape=(10,), dtype="int32")
+            hidden_states = embedding(inputs)
+            outputs = embedding(hidden_states, reverse=True)
+            return keras.Model(inputs, outputs), embedding
+
+        model, embedding = make_model()
+        input_data = np.random.randint(100, size=(4, 10))
+        model_output = model(input_data)
+        quantized_model, quantized_embedding = make_model("int8")
+        quantized_embedding.quantize_from(embedding)
+        self.assertEqual(quantized_embedding.embeddings.dtype, "int8")
+        self.assertEqual(quantized_embedding.trainable_weights, [])
+        self.assertLen(quantized_embedding.weights, 2 if tie_weights else 4)
+        quantized_output = quantized_model(input_data)
+        self.assertAllClose(quantized_output, model_output, atol=1e-3)
+
+        # Quantized weights are kept when saving and loading weights.
+        path = os.path.join(self.get_temp_dir(), "model.weights.h5")
+        quantized_model.save_weights(path)
+        restored_model, _ = make_model("int8")
+        restored_model.load_weights(path)
+        self.assertAllClose(restored_model(input_data), quantized_output)
@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import numpy as np
+
 from keras_nlp.api_export import keras_nlp_export
 from keras_nlp.backend import keras
 from keras_nlp.backend import ops
@@ -38,6 +40,11 @@ class RotaryEmbedding(keras.layers.Layer):
         scaling_factor: float. The scaling factor used to scale frequency range.
         sequence_axis: int. Sequence axis in the input tensor.
         feature_axis: int. Feature axis in the input tensor.
+        max_sequence_length: int. The maximum position of the inputs. If set,
+            a sine/cosine table of all positions is computed once when the
+            layer is built, and sliced at the positions of each call. Inputs
+            must then not extend past `max_sequence_length`. If `None`, the
+            sine/cosine embedding is computed for the positions of each call.
 
     Call args:
         inputs: The tensor inputs to apply the embedding to. This can have
@@ -46,6 +53,9 @@ class RotaryEmbedding(keras.layers.Layer):
         start_index: An integer or integer tensor. The starting position to
             compute the rotary embedding from. This is useful during cached
             decoding, where each position is predicted separately in a loop.
+            An integer tensor of shape `(batch_size,)` sets the starting
+            position of each sequence of the batch separately, with the
+            batch on the first axis of `inputs`.
 
     Examples:
 
@@ -75,6 +85,7 @@ class RotaryEmbedding(keras.layers.Layer):
         scaling_factor=1.0,
         sequence_axis=1,
         feature_axis=-1,
+        max_sequence_length=None,
         **kwargs
     ):
         super().__init__(**kwargs)
@@ -82,46 +93,72 @@ class RotaryEmbedding(keras.layers.Layer):
         self.sequence_axis = sequence_axis
         self.feature_axis = feature_axis
         self.scaling_factor = scaling_factor
+        self.max_sequence_length = max_sequence_length
+
+    def build(self, inputs_shape):
+        # The frequencies only depend on the feature size of the inputs, so we
+        # compute them, and the sine/cosine table of all positions, once.
+        rotary_dim = inputs_shape[self.feature_axis]
+        freq_range = np.arange(0, rotary_dim, 2, dtype="float32")
+        freq_range = freq_range / np.float32(self.scaling_factor)
+        self._inverse_freq = 1.0 / (
+            self.max_wavelength ** (freq_range / np.float32(rotary_dim))
+        )
+        self._cos_table = self._sin_table = None
+        if self.max_sequence_length is not None:
+            positions = np.arange(self.max_sequence_length, dtype="float32")
+            freq = np.outer(positions, self._inverse_freq)
+            self._cos_table, self._sin_table = np.cos(freq), np.sin(freq)
+        self.built = True
 
     def call(self, inputs, start_index=0):
-        rotary_dim = ops.shape(inputs)[-1]
-        cos_emb, sin_emb = self._compute_cos_sin_embedding(
-            inputs, rotary_dim, start_index
-        )
+        cos_emb, sin_emb = self._compute_cos_sin_embedding(inputs, start_index)
         return self._apply_rotary_pos_emb(inputs, cos_emb, sin_emb)
 
     def _apply_rotary_pos_emb(self, tensor, cos_emb, sin_emb):
+        # Rotate both halves of the features in a single pass, with the
+        # sine/cosine of each frequency shared by both halves.
         x1, x2 = ops.split(tensor, 2, axis=self.feature_axis)
-        half_rot_tensor = ops.concatenate((-x2, x1), axis=self.feature_axis)
-        return (tensor * cos_emb) + (half_rot_tensor * sin_emb)
-
-    def _compute_cos_sin_embedding(self, x, rotary_dim, start_index):
-        freq_range = ops.arange(0, rotary_dim, 2, dtype="float32")
-        freq_range = ops.cast(freq_range, self.compute_dtype)
-        freq_range = freq_range / ops.cast(
-            self.scaling_factor, self.compute_dtype
-        )
-        inverse_freq = 1.0 / (
-            self.max_wavelength
-            ** (freq_range / ops.cast(rotary_dim, self.compute_dtype))
+        return ops.concatenate(
+            (x1 * cos_emb - x2 * sin_emb, x2 * cos_emb + x1 * sin_emb),
+            axis=self.feature_axis,
         )
+
+    def _compute_cos_sin_embedding(self, x, start_index):
         seq_len = ops.shape(x)[self.sequence_axis]
-        tensor = ops.arange(seq_len, dtype="float32") + start_index
-        tensor = ops.cast(tensor, dtype=inverse_freq.dtype)
-        freq = ops.einsum("i, j -> ij", tensor, inverse_freq)
-        embedding = ops.concatenate((freq, freq), axis=self.feature_axis)
+        start_index = ops.cast(start_index, "int32")
+        positions = ops.arange(seq_len, dtype="int32")
+        # With a start index per sequence, positions have a leading batch axis.
+        per_sequence = len(start_index.shape) == 1
+        if per_sequence:
+            positions = ops.expand_dims(positions, 0)
+            start_index = ops.expand_dims(start_index, -1)
+        positions = positions + start_index
+        if self._cos_table is not None:
+            cos_emb = ops.take(self._cos_table, positions, axis=0)
+            sin_emb = ops.take(self._sin_table, positions, axis=0)
+        else:
+            positions = ops.cast(positions, "float32")
+            freq = ops.einsum("...i, j -> ...ij", positions, self._inverse_freq)
+            cos_emb, sin_emb = ops.cos(freq), ops.sin(freq)
+        cos_emb = ops.cast(cos_emb, self.compute_dtype)
+        sin_emb = ops.cast(sin_emb, self.compute_dtype)
 
         def get_axis(axis):
             return axis if axis > 0 else len(x.shape) + axis
 
         feature_axis = get_axis(self.feature_axis)
         sequence_axis = get_axis(self.sequence_axis)
+        embedding_axes = [sequence_axis, feature_axis]
+        if per_sequence:
+            embedding_axes.append(0)
 
         for axis in range(len(x.shape)):
-            if axis != sequence_axis and axis != feature_axis:
-                embedding = ops.expand_dims(embedding, axis)
+            if axis not in embedding_axes:
+                cos_emb = ops.expand_dims(cos_emb, axis)
+                sin_emb = ops.expand_dims(sin_emb, axis)
 
-        return ops.cos(embedding), ops.sin(embedding)
+        return cos_emb, sin_emb
 
     def get_config(self):
         config = super().get_config()
@@ -131,6 +168,7 @@ class RotaryEmbedding(keras.layers.Layer):
                 "scaling_factor": self.scaling_factor,
                 "sequence_axis": self.sequence_axis,
                 "feature_axis": self.feature_axis,
+                "max_sequence_length": self.max_sequence_length,
             }
         )
         return config
@@ -96,12 +96,35 @@ class RotaryEmbeddingTest(TestCase):
             )
         self.assertAllClose(full_output, sequential_output)
 
+    def test_start_index_per_sequence(self):
+        batch_size, seq_length, num_heads, feature_size = 2, 3, 2, 4
+        layer = RotaryEmbedding(seq_length)
+        data = ops.random.uniform(
+            shape=(batch_size, seq_length, num_heads, feature_size)
+        )
+        output = layer(data, start_index=ops.array([0, 2]))
+        self.assertAllClose(output[:1], layer(data[:1], start_index=0))
+        self.assertAllClose(output[1:], layer(data[1:], start_index=2))
+
+    def test_max_sequence_length(self):
+        batch_size, seq_length, feature_size = 2, 3, 4
+        layer = RotaryEmbedding()
+        table_layer = RotaryEmbedding(max_sequence_length=8)
+        data = ops.random.uniform(shape=(batch_size, seq_length, feature_size))
+        self.assertAllClose(table_layer(data), layer(data))
+        for start_index in (5, ops.array([0, 5])):
+            self.assertAllClose(
+                table_layer(data, start_index=start_index),
+                layer(data, start_index=start_index),
+            )
+
     def test_get_config_and_from_config(self):
         embedding_layer = RotaryEmbedding(
             max_wavelength=1000,
             scaling_factor=2.0,
             sequence_axis=1,
             feature_axis=-1,
+            max_sequence_length=128,
         )
         config = embedding_layer.get_config()
         expected_config = {
@@ -109,6 +132,7 @@ class RotaryEmbeddingTest(TestCase):
             "scaling_factor": 2.0,
             "sequence_axis": 1,
             "feature_axis": -1,
+            "max_sequence_length": 128,
         }
         self.assertEqual(config, {**config, **expected_config})
         restored_embedding_layer = RotaryEmbedding.from_config(config)
@@ -18,6 +18,9 @@ from keras_nlp.backend import ops
 from keras_nlp.layers.modeling.cached_multi_head_attention import (
     CachedMultiHeadAttention,
 )
+from keras_nlp.layers.modeling.quantized_dense import build_dense
+from keras_nlp.layers.modeling.quantized_dense import get_quantization_mode
+from keras_nlp.layers.modeling.quantized_dense import quantize_sublayers_from
 from keras_nlp.utils.keras_utils import clone_initializer
 
 from keras_nlp.layers.modeling.transformer_layer_utils import (  # isort:skip
@@ -72,6 +75,11 @@ class TransformerDecoder(keras.layers.Layer):
             (similar to GPT-2). If set to False, outputs of attention layer and
             intermediate dense layer are normalized (similar to BERT).
             Defaults to `False`.
+        quantization_mode: string. If `"int8"`, the layer builds int8
+            attention and feedforward projections for inference. Use
+            `quantize_from()` to set their weights from a float layer.
+            Defaults to `None`, or the mode of the enclosing quantization
+            scope.
         name: string. The name of the layer. Defaults to `None`.
         **kwargs: other keyword arguments.
 
@@ -111,6 +119,7 @@ class TransformerDecoder(keras.layers.Layer):
         kernel_initializer="glorot_uniform",
         bias_initializer="zeros",
         normalize_first=False,
+        quantization_mode=None,
         name=None,
         **kwargs,
     ):
@@ -128,6 +137,7 @@ class TransformerDecoder(keras.layers.Layer):
         self.kernel_initializer = keras.initializers.get(kernel_initializer)
         self.bias_initializer = keras.initializers.get(bias_initializer)
         self.normalize_first = normalize_first
+        self.quantization_mode = get_quantization_mode(quantization_mode)
         self.supports_masking = True
         self._decoder_sequence_shape = None
         self._encoder_sequence_shape = None
@@ -160,6 +170,7 @@ class TransformerDecoder(keras.layers.Layer):
             dropout=self.dropout,
             kernel_initializer=clone_initializer(self.kernel_initializer),
             bias_initializer=clone_initializer(self.bias_initializer),
+            quantization_mode=self.quantization_mode,
         )
         if hasattr(self._self_attention_layer, "_build_from_signature"):
             self._self_attention_layer._build_from_signature(
@@ -189,6 +200,7 @@ class TransformerDecoder(keras.layers.Layer):
                 dropout=self.dropout,
                 kernel_initializer=clone_initializer(self.kernel_initializer),
                 bias_initializer=clone_initializer(self.bias_initializer),
+                quantization_mode=self.quantization_mode,
             )
             if hasattr(self._cross_attention_layer, "_build_from_signature"):
                 self._cross_attention_layer._build_from_signature(
@@ -209,21 +221,27 @@ class TransformerDecoder(keras.layers.Layer):
             )
 
         # Feedforward layers.
-        self._feedforward_intermediate_dense = keras.layers.Dense(
-            self.intermediate_dim,
-            activation=self.activation,
-            kernel_initializer=clone_initializer(self.kernel_initializer),
-            bias_initializer=clone_initializer(self.bias_initializer),
-        )
-        self._feedforward_intermediate_dense.build(decoder_sequence_shape)
-        self._feedforward_output_dense = keras.layers.Dense(
-            hidden_dim,
-            kernel_initializer=clone_initializer(self.kernel_initializer),
-            bias_initializer=clone_initializer(self.bias_initializer),
+        self._feedforward_intermediate_dense = build_dense(
+            keras.layers.Dense(
+                self.intermediate_dim,
+                activation=self.activation,
+                kernel_initializer=clone_initializer(self.kernel_initializer),
+                bias_initializer=clone_initializer(self.bias_initializer),
+            ),
+            decoder_sequence_shape,
+            self.quantization_mode,
         )
         intermediate_shape = list(decoder_sequence_shape)
         intermediate_shape[-1] = self.intermediate_dim
-        self._feedforward_output_dense.build(tuple(intermediate_shape))
+        self._feedforward_output_dense = build_dense(
+            keras.layers.Dense(
+                hidden_dim,
+                kernel_initializer=clone_initializer(self.kernel_initializer),
+                bias_initializer=clone_initializer(self.bias_initializer),
+            ),
+            tuple(intermediate_shape),
+            self.quantization_mode,
+        )
         self._feedforward_layer_norm = keras.layers.LayerNormalization(
             epsilon=self.layer_norm_epsilon,
         )
@@ -260,6 +278,7 @@ class TransformerDecoder(keras.layers.Layer):
         encoder_attention_mask=None,
         self_attention_cache=None,
         self_attention_cache_update_index=None,
+        self_attention_cache_block_table=None,
         cross_attention_cache=None,
         cross_attention_cache_update_index=None,
         use_causal_mask=True,
@@ -290,6 +309,12 @@ class TransformerDecoder(keras.layers.Layer):
             self_attention_cache_update_index: an int or int Tensor, the index
                 at which to update the `self_attention_cache`. Usually, this is
                 the index of the current token being processed during decoding.
+            self_attention_cache_block_table: an int Tensor of shape
+                `[batch_size, max_num_blocks]`. If set, `self_attention_cache`
+                is a paged cache of shape
+                `[num_blocks, 2, block_size, num_heads, key_dims]`, and this
+                table holds the blocks of each sequence. See
+                `keras_nlp.layers.CachedMultiHeadAttention`.
             cross_attention_cache: a dense float Tensor. The cache of
                 key/value pairs in the cross-attention layer. Has shape
                 `[batch_size, 2, S, num_heads, key_dims]`.
@@ -355,6 +380,7 @@ class TransformerDecoder(keras.layers.Layer):
             use_causal_mask=use_causal_mask,
             self_attention_cache=self_attention_cache,
             self_attention_cache_update_index=self_attention_cache_update_index,
+            self_attention_cache_block_table=self_attention_cache_block_table,
         )
 
         x = decoder_sequence  # Intermediate result.
@@ -369,6 +395,7 @@ class TransformerDecoder(keras.layers.Layer):
             attention_mask=self_attention_mask,
             cache=self_attention_cache,
             cache_update_index=self_attention_cache_update_index,
+            cache_block_table=self_attention_cache_block_table,
         )
         x = self._self_attention_dropout(x)
         x = x + residual
@@ -425,6 +452,7 @@ class TransformerDecoder(keras.layers.Layer):
         use_causal_mask,
         self_attention_cache,
         self_attention_cache_update_index,
+        self_attention_cache_block_table=None,
     ):
         decoder_mask = merge_padding_and_attention_mask(
             decoder_sequence, decoder_padding_mask, decoder_attention_mask
@@ -437,6 +465,10 @@ class TransformerDecoder(keras.layers.Layer):
             # generally be length 1, and `cache` will be the full generation length.
             if self_attention_cache is not None:
                 input_length = ops.shape(self_attention_cache)[2]
+                if self_attention_cache_block_table is not None:
+                    # A paged cache has one block of positions per table entry.
+                    num_blocks = ops.shape(self_attention_cache_block_table)[1]
+                    input_length = input_length * num_blocks
 
             causal_mask = compute_causal_mask(
                 batch_size,
@@ -453,6 +485,24 @@ class TransformerDecoder(keras.layers.Layer):
             )
         return decoder_mask
 
+    def quantize_from(self, layer):
+        """Set the weights of the quantized layer from a float `layer`.
+
+        Args:
+            layer: A built float `TransformerDecoder` layer with the same
+                config as this layer.
+        """
+        quantize_sublayers_from(
+            self,
+            layer,
+            [
+                "_self_attention_layer",
+                "_cross_attention_layer",
+                "_feedforward_intermediate_dense",
+                "_feedforward_output_dense",
+            ],
+        )
+
     def get_config(self):
         config = super().get_config()
         config.update(
@@ -473,6 +523,8 @@ class TransformerDecoder(keras.layers.Layer):
                 "encoder_sequence_shape": self._encoder_sequence_shape,
             }
         )
+        if self.quantization_mode is not None:
+            config["quantization_mode"] = self.quantization_mode
         return config
 
     def compute_output_shape(self, decoder_sequence_shape):
@@ -48,19 +48,129 @@ def compute_causal_mask(batch_size, input_length, output_length, cache_index=0):
             query sequence will be considered to start at `cache_index` rather
             than zero. For example, a causal mask with `output_length=1` and
             `cache_index=5` would allow the query tensor to attend to the first
-            five positions of the key/value tensors.
+            five positions of the key/value tensors. Can also be an int tensor
+            of shape `(batch_size,)`, in which case each row of the batch
+            starts at its own index.
 
     Return:
         A causal attention mask with shape
         `(batch_size, output_length, input_length)` that can be passed to a
         attention layer.
     """
-    i = ops.expand_dims(ops.arange(output_length), axis=1) + cache_index
-    j = ops.arange(input_length)
-    mask = ops.expand_dims(ops.cast(i >= j, dtype="int32"), axis=0)
+    cache_index = ops.reshape(ops.cast(cache_index, "int32"), (-1, 1, 1))
+    i = ops.arange(output_length, dtype="int32")[None, :, None] + cache_index
+    j = ops.arange(input_length, dtype="int32")[None, None, :]
+    mask = ops.cast(i >= j, dtype="int32")
     return ops.broadcast_to(mask, (batch_size, output_length, input_length))
 
 
+def update_cache(cache, update, cache_update_index, axis=1):
+    """Splice new key/value projections into a cache along the sequence axis.
+
+    Only the updated entries are written, so the cost of an update follows
+    the size of `update`, not the size of `cache`.
+
+    Args:
+        cache: a dense float Tensor of shape `(batch_size, ..., max_length,
+            ...)`, with the sequence axis at `axis`.
+        update: a dense float Tensor with the same shape as `cache`, except
+            for a length `<= max_length` along the sequence axis.
+        cache_update_index: an int or int Tensor, the index along the sequence
+            axis at which `update` should be written. Can also be an int tensor
+            of shape `(batch_size,)`, in which case each row of the batch is
+            written at its own index.
+        axis: int. The sequence axis of `cache` and `update`.
+
+    Return:
+        The updated cache, with the same shape as `cache`.
+    """
+    if len(getattr(cache_update_index, "shape", ())) == 0:
+        start = [0] * len(cache.shape)
+        start[axis] = cache_update_index
+        return ops.slice_update(cache, start, update)
+
+    # Scatter each row at its own position.
+    cache_update_index = ops.cast(cache_update_index, "int32")
+    cache_update_index = ops.reshape(cache_update_index, (-1,) + (1,) * axis)
+    indices = _index_grid(tuple(update.shape)[: axis + 1])
+    indices[axis] = indices[axis] + cache_update_index
+    indices = ops.reshape(ops.stack(indices, axis=-1), (-1, axis + 1))
+    updates = ops.reshape(update, (-1,) + tuple(update.shape)[axis + 1 :])
+    return ops.scatter_update(cache, indices, updates)
+
+
+def update_paged_cache(cache, update, cache_update_index, block_table, axis=1):
+    """Write new key/value projections into a paged cache.
+
+    A paged cache stores the sequence axis of each sequence in fixed size
+    blocks, allocated from a pool shared by the whole batch. Position `p` of
+    sequence `b` is stored at offset `p % block_size` of block
+    `block_table[b, p // block_size]`.
+
+    Args:
+        cache: a dense float Tensor of shape `(num_blocks, ..., block_size,
+            ...)`, with the block offset axis at `axis`. The pool of cache
+            blocks.
+        update: a dense float Tensor of shape `(batch_size, ..., length, ...)`,
+            with the sequence axis at `axis`.
+        cache_update_index: an int or int Tensor, the position along the
+            sequence axis at which `update` should be written. Can also be an
+            int tensor of shape `(batch_size,)`, in which case each row of the
+            batch is written at its own position.
+        block_table: an int Tensor of shape `(batch_size, max_num_blocks)`.
+            The indices of the blocks of each sequence in `cache`.
+        axis: int. The block offset axis of `cache` and the sequence axis of
+            `update`.
+
+    Return:
+        The updated cache, with the same shape as `cache`.
+    """
+    block_size = ops.shape(cache)[axis]
+    cache_update_index = ops.cast(cache_update_index, "int32")
+    cache_update_index = ops.reshape(cache_update_index, (-1,) + (1,) * axis)
+    indices = _index_grid(tuple(update.shape)[: axis + 1])
+    positions = indices[axis] + cache_update_index
+    # Look up the block of each position in the block table of its row.
+    block_table = ops.cast(block_table, "int32")
+    batch_size = ops.shape(block_table)[0]
+    rows = ops.reshape(positions // block_size, (batch_size, -1))
+    blocks = ops.take_along_axis(block_table, rows, axis=1)
+    indices[0] = ops.reshape(blocks, ops.shape(positions))
+    indices[axis] = positions % block_size
+    indices = ops.reshape(ops.stack(indices, axis=-1), (-1, axis + 1))
+    updates = ops.reshape(update, (-1,) + tuple(update.shape)[axis + 1 :])
+    return ops.scatter_update(cache, indices, updates)
+
+
+def gather_paged_cache(cache, block_table):
+    """Gather a dense view of each sequence in a paged cache.
+
+    Args:
+        cache: a dense float Tensor of shape `(num_blocks, block_size, ...)`.
+            The pool of cache blocks.
+        block_table: an int Tensor of shape `(batch_size, max_num_blocks)`.
+            The indices of the blocks of each sequence in `cache`.
+
+    Return:
+        A dense float Tensor of shape
+        `(batch_size, max_num_blocks * block_size, ...)`.
+    """
+    x = ops.take(cache, ops.cast(block_table, "int32"), axis=0)
+    shape = tuple(x.shape)
+    return ops.reshape(x, (-1, shape[1] * shape[2]) + shape[3:])
+
+
+def _index_grid(shape):
+    """The index along each axis, for every entry of a tensor of `shape`."""
+    grid = []
+    for axis, size in enumerate(shape):
+        index_shape = [1] * len(shape)
+        index_shape[axis] = size
+        index = ops.reshape(ops.arange(size, dtype="int32"), index_shape)
+        grid.append(ops.broadcast_to(index, shape))
+    return grid
+
+
 def merge_padding_and_attention_mask(
     inputs,
     padding_mask,
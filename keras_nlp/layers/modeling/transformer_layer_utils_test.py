@@ -22,6 +22,37 @@ class TransformerLayerUtilsTest(TestCase):
         mask = utils.compute_causal_mask(1, 2, 2)
         self.assertAllEqual(mask, [[[1, 0], [1, 1]]])
 
+    def test_compute_causal_mask_per_row_index(self):
+        mask = utils.compute_causal_mask(2, 3, 1, ops.array([0, 2]))
+        self.assertAllEqual(mask, [[[1, 0, 0]], [[1, 1, 1]]])
+
+    def test_update_cache(self):
+        cache = ops.zeros((2, 4, 1))
+        update = ops.ones((2, 1, 1))
+        scalar_index = utils.update_cache(cache, update, 1)
+        self.assertAllEqual(scalar_index[..., 0], [[0, 1, 0, 0], [0, 1, 0, 0]])
+        row_index = utils.update_cache(cache, update, ops.array([0, 3]))
+        self.assertAllEqual(row_index[..., 0], [[1, 0, 0, 0], [0, 0, 0, 1]])
+
+    def test_update_cache_axis(self):
+        cache = ops.zeros((2, 2, 3))
+        update = ops.ones((2, 2, 1))
+        outputs = utils.update_cache(cache, update, ops.array([2, 0]), axis=2)
+        self.assertAllEqual(
+            outputs, [[[0, 0, 1], [0, 0, 1]], [[1, 0, 0], [1, 0, 0]]]
+        )
+
+    def test_paged_cache(self):
+        cache = ops.zeros((4, 2, 1))
+        block_table = ops.array([[2, 1], [3, 0]])
+        update = ops.ones((2, 1, 1))
+        cache = utils.update_paged_cache(
+            cache, update, ops.array([2, 1]), block_table
+        )
+        self.assertAllEqual(cache[..., 0], [[0, 0], [1, 0], [0, 0], [0, 1]])
+        dense = utils.gather_paged_cache(cache, block_table)
+        self.assertAllEqual(dense[..., 0], [[0, 0, 1, 0], [0, 1, 0, 0]])
+
     def test_merge_padding_and_attention_mask(self):
         padding_mask = ops.array([[1, 1, 0]])
         attention_mask = ops.array([[[0, 0, 1], [0, 1, 0], [1, 0, 0]]])
@@ -35,6 +35,7 @@ from keras_nlp.models.bert.bert_masked_lm_preprocessor import (
 )
 from keras_nlp.models.bert.bert_preprocessor import BertPreprocessor
 from keras_nlp.models.bert.bert_tokenizer import BertTokenizer
+from keras_nlp.models.continuous_batching_engine import ContinuousBatchingEngine
 from keras_nlp.models.deberta_v3.deberta_v3_backbone import DebertaV3Backbone
 from keras_nlp.models.deberta_v3.deberta_v3_classifier import (
     DebertaV3Classifier,
@@ -94,6 +95,7 @@ from keras_nlp.models.opt.opt_causal_lm_preprocessor import (
 )
 from keras_nlp.models.opt.opt_preprocessor import OPTPreprocessor
 from keras_nlp.models.opt.opt_tokenizer import OPTTokenizer
+from keras_nlp.models.prefix_cache import PrefixCache
 from keras_nlp.models.roberta.roberta_backbone import RobertaBackbone
 from keras_nlp.models.roberta.roberta_classifier import RobertaClassifier
 from keras_nlp.models.roberta.roberta_masked_lm import RobertaMaskedLM
@@ -103,12 +105,17 @@ from keras_nlp.models.roberta.roberta_masked_lm_preprocessor import (
 from keras_nlp.models.roberta.roberta_preprocessor import RobertaPreprocessor
 from keras_nlp.models.roberta.roberta_tokenizer import RobertaTokenizer
 from keras_nlp.models.t5.t5_backbone import T5Backbone
+from keras_nlp.models.t5.t5_seq_2_seq_lm import T5Seq2SeqLM
 from keras_nlp.models.t5.t5_tokenizer import T5Tokenizer
 from keras_nlp.models.whisper.whisper_audio_feature_extractor import (
     WhisperAudioFeatureExtractor,
 )
 from keras_nlp.models.whisper.whisper_backbone import WhisperBackbone
 from keras_nlp.models.whisper.whisper_preprocessor import WhisperPreprocessor
+from keras_nlp.models.whisper.whisper_seq_2_seq_lm import WhisperSeq2SeqLM
+from keras_nlp.models.whisper.whisper_seq_2_seq_lm_preprocessor import (
+    WhisperSeq2SeqLMPreprocessor,
+)
 from keras_nlp.models.whisper.whisper_tokenizer import WhisperTokenizer
 from keras_nlp.models.xlm_roberta.xlm_roberta_backbone import XLMRobertaBackbone
 from keras_nlp.models.xlm_roberta.xlm_roberta_classifier import (
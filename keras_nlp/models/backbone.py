@@ -15,6 +15,8 @@
 import os
 
 from keras_nlp.backend import keras
+from keras_nlp.layers.modeling.quantized_dense import check_quantization_mode
+from keras_nlp.layers.modeling.quantized_dense import quantization_scope
 from keras_nlp.utils.python_utils import classproperty
 from keras_nlp.utils.python_utils import format_docstring
 
@@ -24,6 +26,7 @@ class Backbone(keras.Model):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._token_embedding = None
+        self.quantization_mode = None
 
     def __setattr__(self, name, value):
         # Work around torch setattr for properties.
@@ -48,19 +51,74 @@ class Backbone(keras.Model):
         self._token_embedding = value
         self._setattr_tracking = True
 
+    def quantize(self, mode):
+        """Return a copy of the backbone with weights quantized for inference.
+
+        The backbone is rebuilt from its config with quantized layers, and
+        the weights of the backbone are quantized into them. The backbone
+        itself is left unchanged. The quantized weights are kept when saving
+        and loading the returned backbone. With `mode="int8"`, the weights of
+        dense projections in attention and feedforward layers, and of the
+        token embedding, are stored as int8 with a float scale per output
+        channel, taking roughly 4x less memory than float32 weights. Weights
+        are dequantized on the fly, by scaling the outputs of each projection.
+        Quantized weights are not trainable.
+
+        Args:
+            mode: string. The quantization mode, only `"int8"` is supported.
+
+        Examples:
+        ```python
+        gpt2_lm = keras_nlp.models.GPT2CausalLM.from_preset("gpt2_base_en")
+        gpt2_lm = keras_nlp.models.GPT2CausalLM(
+            backbone=gpt2_lm.backbone.quantize("int8"),
+            preprocessor=gpt2_lm.preprocessor,
+        )
+        gpt2_lm.generate("I want to say", max_length=30)
+        ```
+        """
+        check_quantization_mode(mode)
+        if self.quantization_mode is not None:
+            raise ValueError(
+                "The backbone is already quantized. Received: "
+                f"mode={mode}, with quantization_mode={self.quantization_mode}"
+            )
+        config = self.get_config()
+        config["quantization_mode"] = mode
+        quantized = self.__class__.from_config(config)
+        # Both backbones are built from the same config, so their layers
+        # match one to one.
+        for layer, source in zip(quantized.layers, self.layers):
+            if hasattr(layer, "quantize_from"):
+                layer.quantize_from(source)
+            else:
+                layer.set_weights(source.get_weights())
+        return quantized
+
     def get_config(self):
         # Don't chain to super here. The default `get_config()` for functional
         # models is nested and cannot be passed to our Backbone constructors.
-        return {
+        config = {
             "name": self.name,
             "trainable": self.trainable,
         }
+        if self.quantization_mode is not None:
+            config["quantization_mode"] = self.quantization_mode
+        return config
 
     @classmethod
     def from_config(cls, config):
         # The default `from_config()` for functional models will return a
         # vanilla `keras.Model`. We override it to get a subclass instance back.
-        return cls(**config)
+        config = config.copy()
+        quantization_mode = config.pop("quantization_mode", None)
+        if quantization_mode is None:
+            return cls(**config)
+        # Layers created in the scope build quantized weights.
+        with quantization_scope(quantization_mode):
+            model = cls(**config)
+        model.quantization_mode = quantization_mode
+        return model
 
     @classproperty
     def presets(cls):
@@ -254,17 +254,18 @@ class BartSeq2SeqLM(GenerativeTask):
             decoder_token_ids: a dense int Tensor of shape
                 `(batch_size, max_length)`. Input token ids to be fed to
                 the decoder.
-            self_attention_cache: a dense float Tensor of shape
-                `(batch_size, num_layers, 2, max_length, num_heads, key_dims)`.
+            self_attention_cache: a tuple of `num_layers` dense float Tensors
+                of shape `(batch_size, 2, max_length, num_heads, key_dims)`.
                 The cached key/value tensors of previously seen tokens in the
-                decoder's self-attention layer.
+                decoder's self-attention layers.
             self_attention_cache_update_index: an int or int Tensor, the index
                 at which to update the `self_attention_cache`. Usually, this is
                 the index of the current token being processed during decoding.
-            cross_attention_cache: a dense float Tensor of shape
-                `(batch_size, num_layers, 2, encoder_sequence_length, num_heads, key_dims)`.
+            cross_attention_cache: a tuple of `num_layers` dense float Tensors
+                of shape
+                `(batch_size, 2, encoder_sequence_length, num_heads, key_dims)`.
                 The cached key/value tensors of the encoder outputs in the
-                decoder's cross-attention layer.
+                decoder's cross-attention layers.
             cross_attention_cache_update_index: an int or int Tensor, the index
                 at which to update the `cross_attention_cache`. Usually, this is
                 either `0` (compute the entire `cross_attention_cache`), or
@@ -295,12 +296,13 @@ class BartSeq2SeqLM(GenerativeTask):
         x = self.backbone.get_layer("decoder_embeddings_dropout")(x)
 
         # Every decoder layer has a separate cache for the self-attention layer
-        # and the cross-attention layer. We update all of them separately.
+        # and the cross-attention layer. We update all of them separately, in
+        # place, without copying the caches of other layers.
         self_attention_caches = []
         cross_attention_caches = []
         for i in range(self.backbone.num_layers):
-            current_self_attention_cache = self_attention_cache[:, i, ...]
-            current_cross_attention_cache = cross_attention_cache[:, i, ...]
+            current_self_attention_cache = self_attention_cache[i]
+            current_cross_attention_cache = cross_attention_cache[i]
 
             (
                 x,
@@ -322,9 +324,9 @@ class BartSeq2SeqLM(GenerativeTask):
                 cross_attention_caches.append(next_cross_attention_cache)
 
         if self_attention_cache_update_index is not None:
-            self_attention_cache = ops.stack(self_attention_caches, axis=1)
+            self_attention_cache = tuple(self_attention_caches)
         if cross_attention_cache_update_index is not None:
-            cross_attention_cache = ops.stack(cross_attention_caches, axis=1)
+            cross_attention_cache = tuple(cross_attention_caches)
 
         hidden_states = x
         logits = self.backbone.token_embedding(hidden_states, reverse=True)
@@ -369,18 +371,17 @@ class BartSeq2SeqLM(GenerativeTask):
         num_heads = self.backbone.num_heads
         head_dim = self.backbone.hidden_dim // self.backbone.num_heads
 
-        shape = [
-            batch_size,
-            num_layers,
-            2,
-            decoder_max_length,
-            num_heads,
-            head_dim,
-        ]
-        self_attention_cache = ops.zeros(shape, dtype=self.compute_dtype)
+        shape = [batch_size, 2, decoder_max_length, num_heads, head_dim]
+        self_attention_cache = tuple(
+            ops.zeros(shape, dtype=self.compute_dtype)
+            for _ in range(num_layers)
+        )
 
-        shape[3] = encoder_max_length
-        cross_attention_cache = ops.zeros(shape, dtype=self.compute_dtype)
+        shape[2] = encoder_max_length
+        cross_attention_cache = tuple(
+            ops.zeros(shape, dtype=self.compute_dtype)
+            for _ in range(num_layers)
+        )
 
         return (self_attention_cache, cross_attention_cache)
 
@@ -421,6 +422,7 @@ class BartSeq2SeqLM(GenerativeTask):
         self,
         inputs,
         end_token_id=None,
+        num_samples=1,
     ):
         """A compilable generation function for a batch of inputs.
 
@@ -437,6 +439,10 @@ class BartSeq2SeqLM(GenerativeTask):
             end_token_id: The id of the end token to stop on. If all
                 sequences have produced a new `end_token_id`, generation
                 will stop.
+            num_samples: int. The number of sequences to generate for each
+                input, decoded from the caches of a single forward pass over
+                the inputs. The outputs hold the sequences of each input in
+                consecutive rows.
         """
         (
             encoder_token_ids,
@@ -450,8 +456,6 @@ class BartSeq2SeqLM(GenerativeTask):
             inputs["decoder_padding_mask"],
         )
 
-        batch_size = ops.shape(encoder_token_ids)[0]
-
         # Create and seed cache with a single forward pass.
         (
             hidden_states,
@@ -461,32 +465,66 @@ class BartSeq2SeqLM(GenerativeTask):
         ) = self._build_cache(
             encoder_token_ids, encoder_padding_mask, decoder_token_ids
         )
+        # Decode each input `num_samples` times from the same caches.
+        (
+            hidden_states,
+            encoder_hidden_states,
+            encoder_padding_mask,
+            self_attention_cache,
+            cross_attention_cache,
+            decoder_token_ids,
+            decoder_padding_mask,
+        ) = self._repeat_samples(
+            (
+                hidden_states,
+                encoder_hidden_states,
+                encoder_padding_mask,
+                self_attention_cache,
+                cross_attention_cache,
+                decoder_token_ids,
+                decoder_padding_mask,
+            ),
+            num_samples,
+        )
         # Compute the lengths of all user inputted tokens ids.
         row_lengths = ops.sum(ops.cast(decoder_padding_mask, "int32"), axis=-1)
         # Start at the first index that has no user inputted id.
         index = ops.min(row_lengths)
 
         def next(prompt, cache, index):
+            # Per-row encoder state is passed through the cache, as samplers
+            # may repeat or drop rows along the batch axis (e.g. for beams).
+            (
+                self_attention_cache,
+                cross_attention_cache,
+                encoder_hidden_states,
+                encoder_padding_mask,
+            ) = cache
             # The cache index is the index of our previous token.
             cache_index = index - 1
             num_samples = ops.shape(prompt)[0]
             prompt = ops.slice(prompt, [0, cache_index], [num_samples, 1])
 
-            def repeat_tensor(x):
-                """Repeats tensors along batch axis to match dim for beam search."""
-                if ops.shape(x)[0] == num_samples:
-                    return x
-                return ops.repeat(x, repeats=num_samples // batch_size, axis=0)
-
-            logits, hidden_states, cache, _ = self.call_decoder_with_cache(
-                encoder_hidden_states=repeat_tensor(encoder_hidden_states),
-                encoder_padding_mask=repeat_tensor(encoder_padding_mask),
+            (
+                logits,
+                hidden_states,
+                self_attention_cache,
+                _,
+            ) = self.call_decoder_with_cache(
+                encoder_hidden_states=encoder_hidden_states,
+                encoder_padding_mask=encoder_padding_mask,
                 decoder_token_ids=prompt,
-                self_attention_cache=cache,
+                self_attention_cache=self_attention_cache,
                 self_attention_cache_update_index=cache_index,
-                cross_attention_cache=repeat_tensor(cross_attention_cache),
+                cross_attention_cache=cross_attention_cache,
                 cross_attention_cache_update_index=None,
             )
+            cache = (
+                self_attention_cache,
+                cross_attention_cache,
+                encoder_hidden_states,
+                encoder_padding_mask,
+            )
             return (
                 ops.squeeze(logits, axis=1),
                 ops.squeeze(hidden_states, axis=1),
@@ -496,7 +534,12 @@ class BartSeq2SeqLM(GenerativeTask):
         decoder_token_ids = self._sampler(
             next=next,
             prompt=decoder_token_ids,
-            cache=self_attention_cache,
+            cache=(
+                self_attention_cache,
+                cross_attention_cache,
+                encoder_hidden_states,
+                encoder_padding_mask,
+            ),
             index=index,
             mask=decoder_padding_mask,
             end_token_id=end_token_id,
@@ -151,6 +151,13 @@ class BartSeq2SeqLMTest(TestCase):
         ).batch(2)
         self.assertIsInstance(self.seq_2_seq_lm.generate(raw_dataset)[0], str)
 
+    def test_generate_num_samples(self):
+        self.seq_2_seq_lm.compile(sampler="greedy")
+        inputs = [" airplane at airport", " airplane"]
+        expected = self.seq_2_seq_lm.generate(inputs)
+        outputs = self.seq_2_seq_lm.generate(inputs, num_samples=2)
+        self.assertEqual(outputs, [expected[0]] * 2 + [expected[1]] * 2)
+
     def test_early_stopping(self):
         call_decoder_with_cache = self.seq_2_seq_lm.call_decoder_with_cache
 
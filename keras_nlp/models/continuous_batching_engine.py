@@ -0,0 +1,517 @@
+# Copyright 2023 The KerasNLP Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+
+import numpy as np
+import tensorflow as tf
+import tree
+
+from keras_nlp.api_export import keras_nlp_export
+from keras_nlp.backend import config
+from keras_nlp.backend import ops
+from keras_nlp.samplers.sampler import Sampler
+from keras_nlp.utils.tensor_utils import tensor_to_list
+
+
+@keras_nlp_export("keras_nlp.models.ContinuousBatchingEngine")
+class ContinuousBatchingEngine:
+    """Generate text for a stream of prompts with continuous batching.
+
+    `GenerativeTask.generate()` decodes a batch of prompts in lock step, so
+    every sequence in a batch waits until the slowest sequence is done, and new
+    prompts can only start once the whole batch is finished. This engine keeps
+    a fixed pool of `num_slots` key/value cache slots instead. Prompts are
+    queued with `submit()`, and each call to `step()` will:
+
+    1. Admit queued prompts into free slots, seeding the caches of all
+       admitted prompts with a single batched forward pass.
+    2. Decode one new token for every occupied slot, with each slot at its own
+       position in the sequence.
+    3. Evict all sequences that produced an `end_token_id` or reached
+       `max_length`, freeing their slots for the next step.
+
+    The engine works with decoder-only `keras_nlp.models.GenerativeTask` models
+    exposing `call_with_cache()` and `_build_cache()`, such as
+    `keras_nlp.models.GPT2CausalLM`, `keras_nlp.models.OPTCausalLM` and
+    `keras_nlp.models.GPTNeoXCausalLM`. Tokens are sampled with the sampler
+    passed to `causal_lm.compile()`, which must be a sampler implementing
+    `get_next_token()` (e.g. `"greedy"`, `"top_k"`, `"top_p"` or `"random"`),
+    without a `constraint` or penalties.
+
+    Admitted prompts are prefilled together, with the batch and the prompt
+    length padded to powers of two, so that only a few prefill functions are
+    compiled. The cache is updated in place by each decode step: its buffers
+    are donated to the compiled function on the JAX backend, and held in
+    variables on the TensorFlow backend.
+
+    By default, each slot holds a dense cache preallocated to `max_length`.
+    If `block_size` is set, the engine uses a paged cache instead: a pool of
+    `num_blocks` fixed size blocks shared by all slots, with a block table
+    mapping the positions of each sequence to its blocks. Blocks are allocated
+    as sequences grow, so cache memory follows the number of tokens actually
+    held rather than `num_slots * max_length`, and a pool much smaller than
+    the dense cache can serve the same number of slots. If the pool runs out
+    of blocks, the sequence of the newest request is preempted and queued
+    again, to be resumed (and its cache recomputed) once blocks free up.
+
+    Args:
+        causal_lm: A decoder-only `keras_nlp.models.GenerativeTask`.
+        num_slots: int. The number of sequences to decode concurrently.
+        max_length: int. The maximum length of each sequence, including the
+            prompt. Defaults to the `sequence_length` of the `preprocessor`
+            attached to `causal_lm`.
+        end_token_id: int. The id of the token ending a sequence. Defaults to
+            the `end_token_id` of the `preprocessor` tokenizer, if set.
+        block_size: int. If set, use a paged cache with blocks of
+            `block_size` positions. Defaults to `None`, a dense cache.
+        num_blocks: int. The number of blocks in the paged cache pool. Must
+            be large enough to hold a single sequence of `max_length`.
+            Defaults to enough blocks for `num_slots` sequences of
+            `max_length`. Only used if `block_size` is set.
+
+    Examples:
+    ```python
+    gpt2_lm = keras_nlp.models.GPT2CausalLM.from_preset("gpt2_base_en")
+    gpt2_lm.compile(sampler="greedy")
+    engine = keras_nlp.models.ContinuousBatchingEngine(
+        gpt2_lm, num_slots=4, max_length=64
+    )
+
+    # Generate for a list of prompts, in any number of decode batches.
+    engine.generate(["That's weird", "Where are you", "I want to say"])
+
+    # Use a paged cache, with memory for 64 blocks of 16 tokens.
+    engine = keras_nlp.models.ContinuousBatchingEngine(
+        gpt2_lm, num_slots=16, max_length=256, block_size=16, num_blocks=64
+    )
+
+    # Or drive the engine manually, submitting prompts as they arrive.
+    request_id = engine.submit("That's weird")
+    outputs = {}
+    while engine.has_pending_requests:
+        outputs.update(engine.step())
+    outputs[request_id]
+    ```
+    """
+
+    def __init__(
+        self,
+        causal_lm,
+        num_slots=8,
+        max_length=None,
+        end_token_id=None,
+        block_size=None,
+        num_blocks=None,
+    ):
+        preprocessor = causal_lm.preprocessor
+        if max_length is None:
+            if preprocessor is None:
+                raise ValueError(
+                    "`max_length` must be set if `causal_lm` has no "
+                    "`preprocessor`. Received: max_length=None."
+                )
+            max_length = preprocessor.sequence_length
+        if end_token_id is None and preprocessor is not None:
+            end_token_id = preprocessor.tokenizer.end_token_id
+        sampler = causal_lm._sampler
+        if type(sampler).__call__ is not Sampler.__call__:
+            raise ValueError(
+                "`ContinuousBatchingEngine` samples each token with "
+                "`sampler.get_next_token()`, and does not support samplers "
+                "that override the full sampling loop. Compile `causal_lm` "
+                "with a sampler like `'greedy'`, `'top_k'`, `'top_p'` or "
+                f"`'random'`. Received: sampler={sampler.__class__.__name__}"
+            )
+        if sampler.constraint is not None:
+            raise ValueError(
+                "`ContinuousBatchingEngine` does not support samplers with a "
+                "`constraint`. Received: "
+                f"constraint={sampler.constraint.__class__.__name__}"
+            )
+        if sampler.has_penalties:
+            raise ValueError(
+                "`ContinuousBatchingEngine` does not support samplers with "
+                "repetition, presence or frequency penalties. Received: "
+                f"repetition_penalty={sampler.repetition_penalty}, "
+                f"presence_penalty={sampler.presence_penalty}, "
+                f"frequency_penalty={sampler.frequency_penalty}"
+            )
+
+        max_num_blocks = None
+        if block_size is not None:
+            max_num_blocks = -(-max_length // block_size)
+            if num_blocks is None:
+                num_blocks = num_slots * max_num_blocks
+            if num_blocks < max_num_blocks:
+                raise ValueError(
+                    "`num_blocks` must be large enough to hold a sequence of "
+                    f"`max_length`, at least {max_num_blocks} blocks of size "
+                    f"{block_size}. Received: num_blocks={num_blocks}, "
+                    f"max_length={max_length}."
+                )
+
+        self.causal_lm = causal_lm
+        self.num_slots = num_slots
+        self.max_length = max_length
+        self.end_token_id = end_token_id
+        self.block_size = block_size
+        self.num_blocks = num_blocks
+        self._max_num_blocks = max_num_blocks
+
+        self._queue = collections.deque()
+        self._next_request_id = 0
+        # The request id and token ids of the sequence in each slot.
+        self._slot_requests = [None] * num_slots
+        self._slot_tokens = [None] * num_slots
+        # The cache is allocated lazily, on the first admitted prompts.
+        self._cache = None
+        if block_size is not None:
+            # Block 0 of the pool is scratch space for empty slots and unused
+            # table entries, and never holds the cache of a sequence.
+            self._free_blocks = list(range(1, num_blocks + 1))
+            self._slot_blocks = [[] for _ in range(num_slots)]
+            self._block_table = np.zeros(
+                (num_slots, max_num_blocks), dtype="int32"
+            )
+        self._prefill_function = causal_lm.make_inference_function(
+            self._prefill
+        )
+        self._insert_function = self._make_cache_function(
+            self._insert if block_size is None else self._insert_blocks
+        )
+        self._decode_function = self._make_cache_function(self._decode)
+
+    @property
+    def has_pending_requests(self):
+        """Whether any submitted request is queued or being decoded."""
+        occupied = any(r is not None for r in self._slot_requests)
+        return occupied or len(self._queue) > 0
+
+    def submit(self, prompt):
+        """Queue a prompt for generation and return its request id.
+
+        Args:
+            prompt: A string if `causal_lm` has a `preprocessor`. Otherwise, a
+                1D list or array of prompt token ids, without padding.
+        """
+        request_id = self._next_request_id
+        self._next_request_id += 1
+        self._queue.append((request_id, self._tokenize(prompt)))
+        return request_id
+
+    def step(self):
+        """Run one decode step, admitting and evicting sequences as needed.
+
+        Returns:
+            A dict mapping the request id of each sequence that finished during
+            this step to its generated output.
+        """
+        finished = self._admit()
+        if self.block_size is not None:
+            self._allocate_blocks()
+        active = [i for i, r in enumerate(self._slot_requests) if r is not None]
+        if not active:
+            return finished
+
+        # Every occupied slot decodes from its last token at its own index.
+        last_tokens = np.zeros((self.num_slots, 1), dtype="int32")
+        indices = np.zeros((self.num_slots,), dtype="int32")
+        for slot in active:
+            last_tokens[slot, 0] = self._slot_tokens[slot][-1]
+            indices[slot] = len(self._slot_tokens[slot]) - 1
+        block_table = None
+        if self.block_size is not None:
+            block_table = ops.convert_to_tensor(self._block_table)
+        next_tokens = self._decode_function(
+            ops.convert_to_tensor(last_tokens),
+            ops.convert_to_tensor(indices),
+            block_table,
+        )
+        next_tokens = ops.convert_to_numpy(next_tokens)
+
+        for slot in active:
+            tokens = self._slot_tokens[slot]
+            tokens.append(int(next_tokens[slot]))
+            if self._is_done(tokens):
+                finished.update(self._evict(slot))
+        return finished
+
+    def generate(self, prompts):
+        """Generate outputs for a list of prompts.
+
+        Prompts are decoded `num_slots` at a time, with new prompts admitted as
+        soon as any sequence finishes.
+
+        Args:
+            prompts: A list of prompts, see `submit()`.
+
+        Returns:
+            A list of outputs, in the same order as `prompts`.
+        """
+        request_ids = [self.submit(prompt) for prompt in prompts]
+        outputs = {}
+        while self.has_pending_requests:
+            outputs.update(self.step())
+        return [outputs.pop(request_id) for request_id in request_ids]
+
+    def _tokenize(self, prompt):
+        preprocessor = self.causal_lm.preprocessor
+        if preprocessor is None:
+            token_ids = [int(x) for x in ops.convert_to_numpy(prompt)]
+        else:
+            x = preprocessor.generate_preprocess(
+                [prompt], sequence_length=self.max_length
+            )
+            token_ids = ops.convert_to_numpy(x["token_ids"])[0]
+            padding_mask = ops.convert_to_numpy(x["padding_mask"])[0]
+            token_ids = [int(x) for x in token_ids[padding_mask.astype(bool)]]
+        if not 0 < len(token_ids) <= self.max_length:
+            raise ValueError(
+                "Each prompt must contain between 1 and `max_length` tokens. "
+                f"Received: {len(token_ids)} tokens, "
+                f"max_length={self.max_length}."
+            )
+        return token_ids
+
+    def _admit(self):
+        """Move queued prompts into free slots, seeding their caches."""
+        finished = {}
+        admitted = []
+        for slot in range(self.num_slots):
+            if not self._queue:
+                break
+            if self._slot_requests[slot] is not None:
+                continue
+            request_id, tokens = self._queue[0]
+            if self.block_size is not None:
+                num_needed = -(-len(tokens) // self.block_size)
+                if num_needed > len(self._free_blocks):
+                    # Wait for running sequences to free some blocks.
+                    break
+            self._queue.popleft()
+            self._slot_requests[slot] = request_id
+            self._slot_tokens[slot] = tokens
+            if self._is_done(tokens):
+                # Nothing to generate, e.g. the prompt fills `max_length`.
+                finished.update(self._evict(slot))
+                continue
+            if self.block_size is not None:
+                for _ in range(num_needed):
+                    self._slot_blocks[slot].append(self._free_blocks.pop())
+                self._update_block_table(slot)
+            admitted.append(slot)
+        if admitted:
+            self._prefill_slots(admitted)
+        return finished
+
+    def _prefill_slots(self, slots):
+        """Seed the caches of newly admitted slots with one forward pass."""
+        # Pad the batch and the prompt length to powers of two, so that we
+        # compile a few functions for all admissions. Extra rows repeat the
+        # last admitted slot, and write the same cache to it.
+        num_rows = min(_next_power_of_two(len(slots)), self.num_slots)
+        slots = slots + slots[-1:] * (num_rows - len(slots))
+        length = max(len(self._slot_tokens[slot]) for slot in slots)
+        length = min(_next_power_of_two(length), self.max_length)
+        token_ids = np.zeros((num_rows, length), dtype="int32")
+        for row, slot in enumerate(slots):
+            tokens = self._slot_tokens[slot]
+            token_ids[row, : len(tokens)] = tokens
+        cache = self._prefill_function(ops.convert_to_tensor(token_ids))
+        if self._cache is None:
+            self._cache = tree.map_structure(self._allocate_cache, cache)
+        if self.block_size is None:
+            destinations = np.array(slots, dtype="int32")
+        else:
+            destinations = self._block_table[slots]
+        self._insert_function(cache, ops.convert_to_tensor(destinations))
+
+    def _allocate_cache(self, x):
+        shape = tuple(x.shape)
+        if self.block_size is None:
+            # Slots hold the cache of full `max_length` sequences.
+            shape = (self.num_slots,) + shape[1:2]
+            shape = shape + (self.max_length,) + tuple(x.shape)[3:]
+        else:
+            # A pool of blocks (plus one scratch block) replaces the batch and
+            # sequence axes of the cache.
+            pool_shape = (self.num_blocks + 1,) + shape[1:2]
+            shape = pool_shape + (self.block_size,) + shape[3:]
+        cache = ops.zeros(shape, dtype=x.dtype)
+        if self._cache_in_variables:
+            return tf.Variable(cache, trainable=False)
+        return cache
+
+    @property
+    def _cache_in_variables(self):
+        backend = config.backend()
+        return backend == "tensorflow" and not self.causal_lm.run_eagerly
+
+    def _make_cache_function(self, function):
+        """Compile `function`, updating the engine cache in place.
+
+        `function` takes the cache as its first argument, and returns an
+        `(outputs, cache)` tuple. The returned callable takes the remaining
+        arguments, replaces `self._cache` with the updated cache, and returns
+        `outputs`. So that the cache is not copied on each call, its buffers
+        are donated on the JAX backend, and held in variables assigned inside
+        the compiled function on the TensorFlow backend.
+        """
+        causal_lm = self.causal_lm
+        if self._cache_in_variables:
+
+            def assign_cache(variables, *args):
+                cache = tree.map_structure(lambda v: v.value(), variables)
+                outputs, cache = function(cache, *args)
+                for variable, x in zip(
+                    tree.flatten(variables), tree.flatten(cache)
+                ):
+                    variable.assign(x)
+                return outputs
+
+            compiled_function = causal_lm.make_inference_function(assign_cache)
+
+            def call(*args):
+                return compiled_function(self._cache, *args)
+
+        else:
+            compiled_function = causal_lm.make_inference_function(
+                function, donate_argnums=(0,)
+            )
+
+            def call(*args):
+                outputs, self._cache = compiled_function(self._cache, *args)
+                return outputs
+
+        return call
+
+    def _allocate_blocks(self):
+        """Make sure each sequence has a block for its next cache update."""
+        for slot in self._admission_order():
+            tokens = self._slot_tokens[slot]
+            if tokens is None:
+                # Preempted while allocating for an earlier slot.
+                continue
+            num_needed = (len(tokens) - 1) // self.block_size + 1
+            while len(self._slot_blocks[slot]) < num_needed:
+                if not self._free_blocks:
+                    self._preempt(self._admission_order()[-1])
+                    if self._slot_tokens[slot] is None:
+                        break
+                    continue
+                self._slot_blocks[slot].append(self._free_blocks.pop())
+            if self._slot_tokens[slot] is not None:
+                self._update_block_table(slot)
+
+    def _admission_order(self):
+        """Occupied slots, from the oldest to the newest request."""
+        active = [i for i, r in enumerate(self._slot_requests) if r is not None]
+        return sorted(active, key=lambda i: self._slot_requests[i])
+
+    def _preempt(self, slot):
+        """Free the blocks of a sequence, and queue it to resume later."""
+        request_id = self._slot_requests[slot]
+        tokens = self._slot_tokens[slot]
+        self._release(slot)
+        self._queue.appendleft((request_id, tokens))
+
+    def _update_block_table(self, slot):
+        blocks = self._slot_blocks[slot]
+        self._block_table[slot] = 0
+        self._block_table[slot, : len(blocks)] = blocks
+
+    def _release(self, slot):
+        self._slot_requests[slot] = None
+        self._slot_tokens[slot] = None
+        if self.block_size is not None:
+            self._free_blocks.extend(self._slot_blocks[slot])
+            self._slot_blocks[slot] = []
+            self._block_table[slot] = 0
+
+    def _is_done(self, tokens):
+        if len(tokens) >= self.max_length:
+            return True
+        return self.end_token_id is not None and tokens[-1] == self.end_token_id
+
+    def _evict(self, slot):
+        request_id = self._slot_requests[slot]
+        tokens = self._slot_tokens[slot]
+        self._release(slot)
+        return {request_id: self._postprocess(tokens)}
+
+    def _postprocess(self, tokens):
+        preprocessor = self.causal_lm.preprocessor
+        token_ids = np.array(tokens, dtype="int32")
+        if preprocessor is None:
+            return token_ids
+        outputs = preprocessor.generate_postprocess(
+            {
+                "token_ids": token_ids[None, :],
+                "padding_mask": np.ones_like(token_ids, dtype=bool)[None, :],
+            }
+        )
+        return tensor_to_list(outputs)[0]
+
+    def _prefill(self, token_ids):
+        _, cache = self.causal_lm._build_cache(token_ids)
+        return cache
+
+    def _insert(self, cache, new_cache, slots):
+        def insert(x, update):
+            # Pad the prompt caches to the full sequence length of the slots.
+            pad_width = [[0, 0]] * len(update.shape)
+            pad_width[2] = [0, x.shape[2] - update.shape[2]]
+            update = ops.pad(ops.cast(update, x.dtype), pad_width)
+            return ops.scatter_update(x, slots[:, None], update)
+
+        return None, tree.map_structure(insert, cache, new_cache)
+
+    def _insert_blocks(self, cache, new_cache, block_ids):
+        num_blocks, block_size = self._max_num_blocks, self.block_size
+
+        def insert(x, update):
+            # Split the sequence axis of the prompt caches into blocks.
+            padding = num_blocks * block_size - update.shape[2]
+            pad_width = [[0, 0]] * len(update.shape)
+            pad_width[2] = [0, padding]
+            update = ops.pad(ops.cast(update, x.dtype), pad_width)
+            shape = tuple(update.shape)
+            update = ops.reshape(
+                update, shape[:2] + (num_blocks, block_size) + shape[3:]
+            )
+            # Move the blocks of all rows to the first axis.
+            axes = list(range(len(update.shape)))
+            update = ops.transpose(update, [0, 2, 1] + axes[3:])
+            update = ops.reshape(update, (-1,) + tuple(update.shape[2:]))
+            indices = ops.reshape(block_ids, (-1, 1))
+            return ops.scatter_update(x, indices, update)
+
+        return None, tree.map_structure(insert, cache, new_cache)
+
+    def _decode(self, cache, token_ids, cache_update_index, block_table=None):
+        sampler = self.causal_lm._sampler
+        logits, _, cache = self.causal_lm.call_with_cache(
+            token_ids,
+            cache,
+            cache_update_index,
+            cache_block_table=block_table,
+        )
+        logits = ops.squeeze(logits, axis=1)
+        next_token = sampler.get_next_token_from_logits(logits)
+        return ops.cast(next_token, "int32"), cache
+
+
+def _next_power_of_two(x):
+    return 1 << (x - 1).bit_length()
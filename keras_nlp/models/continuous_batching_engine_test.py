@@ -0,0 +1,142 @@
+# Copyright 2023 The KerasNLP Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from keras_nlp.models.continuous_batching_engine import ContinuousBatchingEngine
+from keras_nlp.models.gpt2.gpt2_backbone import GPT2Backbone
+from keras_nlp.models.gpt2.gpt2_causal_lm import GPT2CausalLM
+from keras_nlp.models.gpt2.gpt2_causal_lm_preprocessor import (
+    GPT2CausalLMPreprocessor,
+)
+from keras_nlp.models.gpt2.gpt2_tokenizer import GPT2Tokenizer
+from keras_nlp.samplers.finite_state_constraint import FiniteStateConstraint
+from keras_nlp.samplers.greedy_sampler import GreedySampler
+from keras_nlp.tests.test_case import TestCase
+
+
+class ContinuousBatchingEngineTest(TestCase):
+    def setUp(self):
+        self.vocab = {
+            "!": 0,
+            "air": 1,
+            "Ġair": 2,
+            "plane": 3,
+            "Ġat": 4,
+            "port": 5,
+            "<|endoftext|>": 6,
+        }
+        self.merges = ["Ġ a", "Ġ t", "Ġ i", "Ġ b", "a i", "p l", "n e"]
+        self.merges += ["Ġa t", "p o", "r t", "Ġt h", "ai r", "pl a", "po rt"]
+        self.merges += ["Ġai r", "Ġa i", "pla ne"]
+        self.preprocessor = GPT2CausalLMPreprocessor(
+            GPT2Tokenizer(vocabulary=self.vocab, merges=self.merges),
+            sequence_length=8,
+        )
+        self.backbone = GPT2Backbone(
+            vocabulary_size=self.preprocessor.tokenizer.vocabulary_size(),
+            num_layers=2,
+            num_heads=2,
+            hidden_dim=4,
+            intermediate_dim=8,
+            max_sequence_length=self.preprocessor.packer.sequence_length,
+        )
+        self.causal_lm = GPT2CausalLM(
+            backbone=self.backbone,
+            preprocessor=self.preprocessor,
+        )
+        self.causal_lm.compile(sampler="greedy")
+        self.prompts = [" airplane at airport", " airplane", " airport at"]
+
+    def test_matches_generate(self):
+        engine = ContinuousBatchingEngine(self.causal_lm, num_slots=2)
+        outputs = engine.generate(self.prompts)
+        for prompt, output in zip(self.prompts, outputs):
+            self.assertEqual(output, self.causal_lm.generate(prompt))
+
+    def test_admit_and_evict(self):
+        engine = ContinuousBatchingEngine(self.causal_lm, num_slots=1)
+        first_id = engine.submit(self.prompts[0])
+        second_id = engine.submit(self.prompts[1])
+        outputs = {}
+        while engine.has_pending_requests:
+            outputs.update(engine.step())
+        self.assertEqual(set(outputs), {first_id, second_id})
+        self.assertFalse(engine.has_pending_requests)
+
+    def test_batched_admission(self):
+        engine = ContinuousBatchingEngine(self.causal_lm, num_slots=4)
+        prefill_function = engine._prefill_function
+        prefill_shapes = []
+
+        def wrapped_prefill_function(token_ids):
+            prefill_shapes.append(tuple(token_ids.shape))
+            return prefill_function(token_ids)
+
+        engine._prefill_function = wrapped_prefill_function
+        prompts = [" airplane", " airport at", " airplane"]
+        outputs = engine.generate(prompts)
+        for prompt, output in zip(prompts, outputs):
+            self.assertEqual(output, self.causal_lm.generate(prompt))
+        # All prompts are prefilled together, padded to powers of two.
+        self.assertEqual(prefill_shapes, [(4, 4)])
+
+    def test_without_preprocessor(self):
+        self.causal_lm.preprocessor = None
+        engine = ContinuousBatchingEngine(
+            self.causal_lm, num_slots=2, max_length=8
+        )
+        outputs = engine.generate([[6, 2, 3], [6, 2, 3, 4, 1, 5]])
+        self.assertAllEqual(outputs[0][:3], [6, 2, 3])
+        self.assertAllEqual(outputs[1][:6], [6, 2, 3, 4, 1, 5])
+        for output in outputs:
+            self.assertLessEqual(len(output), 8)
+
+    def test_unsupported_sampler(self):
+        self.causal_lm.compile(sampler="beam")
+        with self.assertRaises(ValueError):
+            ContinuousBatchingEngine(self.causal_lm)
+
+    def test_unsupported_constraint(self):
+        constraint = FiniteStateConstraint.from_sequences(
+            [[2, 3]], vocabulary_size=7, end_token_id=6
+        )
+        self.causal_lm.compile(sampler=GreedySampler(constraint=constraint))
+        with self.assertRaises(ValueError):
+            ContinuousBatchingEngine(self.causal_lm)
+
+    def test_unsupported_penalties(self):
+        self.causal_lm.compile(sampler=GreedySampler(repetition_penalty=1.2))
+        with self.assertRaises(ValueError):
+            ContinuousBatchingEngine(self.causal_lm)
+
+    def test_paged_cache(self):
+        engine = ContinuousBatchingEngine(
+            self.causal_lm, num_slots=2, block_size=2
+        )
+        outputs = engine.generate(self.prompts)
+        for prompt, output in zip(self.prompts, outputs):
+            self.assertEqual(output, self.causal_lm.generate(prompt))
+
+    def test_paged_cache_preemption(self):
+        # Only enough blocks for a single full length sequence.
+        engine = ContinuousBatchingEngine(
+            self.causal_lm, num_slots=3, block_size=2, num_blocks=4
+        )
+        outputs = engine.generate(self.prompts)
+        for prompt, output in zip(self.prompts, outputs):
+            self.assertEqual(output, self.causal_lm.generate(prompt))
+        self.assertEqual(len(engine._free_blocks), 4)
+
+    def test_paged_cache_too_few_blocks(self):
+        with self.assertRaises(ValueError):
+            ContinuousBatchingEngine(self.causal_lm, block_size=2, num_blocks=3)
@@ -12,15 +12,24 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import functools
 import itertools
+import json
+import os
+import time
 
+import numpy as np
 import tensorflow as tf
 import tree
 
 from keras_nlp.backend import config
 from keras_nlp.backend import keras
 from keras_nlp.backend import ops
+from keras_nlp.backend import random
 from keras_nlp.models.task import Task
+from keras_nlp.samplers.beam_sampler import BeamSampler
+from keras_nlp.samplers.contrastive_sampler import ContrastiveSampler
+from keras_nlp.samplers.sampler import Sampler
 from keras_nlp.samplers.serialization import get as get_sampler
 from keras_nlp.utils.tensor_utils import tensor_to_list
 
@@ -35,8 +44,50 @@ class GenerativeTask(Task):
         run_eagerly=False,
         jit_compile=True,
         sampler="top_k",
+        batch_size_buckets=None,
+        sequence_length_buckets=None,
+        max_compiled_functions=8,
         **kwargs,
     ):
+        """Configures the model for training and generation.
+
+        All arguments of `keras.Model.compile()` are supported, along with the
+        following arguments for `generate()`.
+
+        Args:
+            sampler: A sampler name, or a `keras_nlp.samplers.Sampler` instance.
+                Configures the sampling method used by `generate()`. Defaults
+                to `"top_k"`.
+            batch_size_buckets: Optional. A list of ints. If set, the batch
+                size of each `generate()` batch is padded up to the smallest
+                bucket which fits it, so that only one generate function is
+                compiled per bucket. Batches larger than all buckets are not
+                padded.
+            sequence_length_buckets: Optional. A list of ints. If set, the
+                sequence length of each `generate()` batch is padded up to the
+                smallest bucket which fits it. Generation runs until the end of
+                the padded sequences (or the end token), and outputs are
+                truncated back to the original length.
+            max_compiled_functions: int. The maximum number of generate
+                functions kept compiled, one per distinct input shape. The
+                least recently used function is dropped first. Defaults to
+                `8`.
+        """
+        for buckets in (batch_size_buckets, sequence_length_buckets):
+            if buckets is not None and (
+                not buckets or any(x < 1 for x in buckets)
+            ):
+                raise ValueError(
+                    "Generate buckets should be a non-empty list of positive "
+                    "integers. Received: "
+                    f"batch_size_buckets={batch_size_buckets}, "
+                    f"sequence_length_buckets={sequence_length_buckets}"
+                )
+        if max_compiled_functions < 1:
+            raise ValueError(
+                "`max_compiled_functions` should be a positive integer. "
+                f"Received: max_compiled_functions={max_compiled_functions}"
+            )
         xla_compatible = True
         super().compile(
             *args,
@@ -46,8 +97,22 @@ class GenerativeTask(Task):
             **kwargs,
         )
         self._sampler = get_sampler(sampler)
-        # Clear the compiled generate function.
+        self.batch_size_buckets = batch_size_buckets
+        self.sequence_length_buckets = sequence_length_buckets
+        self.max_compiled_functions = max_compiled_functions
+        # Clear the compiled generate functions.
         self.generate_function = None
+        self._generate_functions = {}
+        # Hits and misses of the compiled generate functions, and the total
+        # time spent in the first call of each new function, in seconds.
+        self.generate_cache_stats = {
+            "hits": 0,
+            "misses": 0,
+            "first_call_time": 0.0,
+        }
+        self._speculative_generate_function = None
+        self._prefill_function = None
+        self._stream_step_function = None
 
     def generate_step(self):
         """Run generation on a single batch of input."""
@@ -58,81 +123,620 @@ class GenerativeTask(Task):
         if self.generate_function is not None:
             return self.generate_function
 
-        self.generate_function = self.generate_step
+        self.generate_function = self.make_inference_function(
+            self.generate_step
+        )
+        return self.generate_function
+
+    def _get_generate_function(self, key, num_samples=1):
+        """Return the compiled generation function for an input shape.
+
+        One function is compiled for each distinct input shape, keeping at
+        most `max_compiled_functions` functions, so that a function traced for
+        an evicted shape is freed. `key` holds the shapes of all inputs,
+        whether a prefix cache is used, and `num_samples`. Returns a
+        `(function, is_new)` tuple.
+        """
+        # Dicts keep insertion order, so the least recently used function is
+        # the first one.
+        functions = self._generate_functions
+        if key in functions:
+            self.generate_cache_stats["hits"] += 1
+            self.generate_function = functions.pop(key)
+            functions[key] = self.generate_function
+            return self.generate_function, False
+        self.generate_cache_stats["misses"] += 1
+        generate_step = self.generate_step
+        if num_samples > 1:
+            # Bind `num_samples`, as it sets the shape of decoding tensors.
+            generate_step = functools.partial(
+                generate_step, num_samples=num_samples
+            )
+        self._add_generate_function(
+            key, self.make_inference_function(generate_step)
+        )
+        return self.generate_function, True
+
+    def _add_generate_function(self, key, generate_function):
+        """Store a generation function, evicting the least recently used."""
+        functions = self._generate_functions
+        functions.pop(key, None)
+        functions[key] = generate_function
+        while len(functions) > self.max_compiled_functions:
+            functions.pop(next(iter(functions)))
+        self.generate_function = generate_function
+
+    def _pad_to_buckets(self, inputs):
+        """Pad a batch of generate inputs to the configured shape buckets.
+
+        Extra rows repeat the last row of the batch, so that they are valid
+        prompts, and extra positions are padding. Returns the padded inputs,
+        and the original `(batch_size, sequence_length)` of each input.
+        """
+
+        def bucket(size, buckets):
+            fits = [x for x in buckets or [] if x >= size]
+            return min(fits) if fits else size
+
+        def pad(x):
+            batch_size, length = tuple(x.shape)[:2]
+            new_batch_size = bucket(batch_size, self.batch_size_buckets)
+            new_length = bucket(length, self.sequence_length_buckets)
+            if new_batch_size > batch_size:
+                rows = ops.repeat(x[-1:], new_batch_size - batch_size, axis=0)
+                x = ops.concatenate([x, rows], axis=0)
+            if new_length > length:
+                x = ops.pad(x, [[0, 0], [0, new_length - length]])
+            return x
+
+        sizes = {k: tuple(v.shape)[:2] for k, v in inputs.items()}
+        return {k: pad(v) for k, v in inputs.items()}, sizes
+
+    def _repeat_samples(self, x, num_samples):
+        """Repeat each row of a nested structure `num_samples` times.
+
+        Used by `generate_step()` to decode several sequences for each input
+        from a single forward pass over the inputs. The repeats of each row
+        are consecutive.
+        """
+        if num_samples == 1:
+            return x
+        return tree.map_structure(
+            lambda y: ops.repeat(y, num_samples, axis=0), x
+        )
+
+    def make_speculative_generate_function(
+        self,
+        draft_model,
+        num_draft_tokens,
+    ):
+        """Create or return the compiled speculative generation function."""
+        # Key on the draft model id, as models are not hashable, and to avoid
+        # tracking the draft model as a sub-model of this model.
+        key = (id(draft_model), num_draft_tokens)
+        if self._speculative_generate_function is not None:
+            if self._speculative_generate_function[0] == key:
+                return self._speculative_generate_function[1]
+
+        def speculative_generate_step(inputs, end_token_id=None):
+            return self.speculative_generate_step(
+                inputs,
+                draft_model=draft_model,
+                num_draft_tokens=num_draft_tokens,
+                end_token_id=end_token_id,
+            )
+
+        generate_function = self.make_inference_function(
+            speculative_generate_step,
+            models=[draft_model],
+        )
+        self._speculative_generate_function = (key, generate_function)
+        return generate_function
+
+    def make_prefill_function(self):
+        """Create or return the compiled cache building function."""
+        if self._prefill_function is not None:
+            return self._prefill_function
+
+        self._prefill_function = self.make_inference_function(self._build_cache)
+        return self._prefill_function
+
+    def make_stream_step_function(self):
+        """Create or return the compiled single token generation function."""
+        if self._stream_step_function is not None:
+            return self._stream_step_function
+
+        self._stream_step_function = self.make_inference_function(
+            self.stream_step
+        )
+        return self._stream_step_function
+
+    def make_inference_function(
+        self,
+        function,
+        models=None,
+        donate_argnums=None,
+    ):
+        """Wrap `function` to be efficiently called for inference.
+
+        `function` may read all model variables, and may update the variables
+        of the attached `sampler` (e.g. random seed state), but should never
+        update other model state. The returned function will be compiled for
+        the current backend, unless the model was compiled with
+        `run_eagerly=True`. This is used to build `generate_function`, and can
+        be used to compile other inference time loops over `call_with_cache()`.
+
+        Args:
+            function: A callable taking tensors, or nested structures of
+                tensors, as arguments.
+            models: Optional. A list of other models whose variables are read,
+                but never updated, by `function`. For example, the draft model
+                used for speculative decoding.
+            donate_argnums: Optional. A tuple of ints, the positions of the
+                arguments of `function` whose buffers may be reused for its
+                outputs, such as a cache which is replaced by an updated cache
+                on each call. Donated arguments must not be used after the
+                call. Only used by the JAX backend.
+
+        Returns:
+            A callable with the same signature as `function`.
+        """
         if config.backend() == "torch":
             import torch
 
-            def wrapped_generate_function(
-                inputs,
-                end_token_id=None,
-            ):
+            def wrapped_function(*args, **kwargs):
                 with torch.no_grad():
-                    return self.generate_step(inputs, end_token_id)
+                    return function(*args, **kwargs)
 
-            self.generate_function = wrapped_generate_function
+            return wrapped_function
         elif config.backend() == "tensorflow" and not self.run_eagerly:
             # `jit_compile` is a property of keras.Model after TF 2.12.
             # Use `getattr()` for backwards compatibility.
             jit_compile = getattr(self, "jit_compile", True)
-            self.generate_function = tf.function(
-                self.generate_step, jit_compile=jit_compile
-            )
+            return tf.function(function, jit_compile=jit_compile)
         elif config.backend() == "jax" and not self.run_eagerly:
             import jax
 
-            @jax.jit
-            def compiled_generate_function(inputs, end_token_id, state):
-                (
-                    sampler_variables,
-                    trainable_variables,
-                    non_trainable_variables,
-                ) = state
-                mapping = itertools.chain(
-                    zip(self._sampler.variables, sampler_variables),
-                    zip(self.trainable_variables, trainable_variables),
-                    zip(self.non_trainable_variables, non_trainable_variables),
-                )
+            # The stateless function takes the variable state first.
+            donate_argnums = tuple(i + 1 for i in donate_argnums or ())
+            compiled_function = jax.jit(
+                self._make_stateless_function(function, models),
+                donate_argnums=donate_argnums,
+            )
+            return self._wrap_stateless_function(compiled_function, models)
+
+        return function
+
+    def _make_stateless_function(self, function, models=None):
+        """Make a pure jax function taking all variable state as inputs.
+
+        The returned function takes a `state` tuple of sampler, trainable,
+        non-trainable and other model variable values, followed by the inputs
+        of `function`, and returns its outputs along with the updated state.
+        """
+        models = models or []
+
+        def stateless_function(state, *args, **kwargs):
+            (
+                sampler_variables,
+                trainable_variables,
+                non_trainable_variables,
+                other_variables,
+            ) = state
+            model_variables = [v for model in models for v in model.variables]
+            mapping = itertools.chain(
+                zip(self._sampler.variables, sampler_variables),
+                zip(self.trainable_variables, trainable_variables),
+                zip(self.non_trainable_variables, non_trainable_variables),
+                zip(model_variables, other_variables),
+            )
+
+            with keras.StatelessScope(state_mapping=mapping) as scope:
+                outputs = function(*args, **kwargs)
+
+            # Get updated sampler variables from the stateless scope.
+            sampler_variables = []
+            for v in self._sampler.variables:
+                new_v = scope.get_current_value(v)
+                sampler_variables.append(new_v if new_v is not None else v)
+            state = (
+                sampler_variables,
+                trainable_variables,
+                non_trainable_variables,
+                other_variables,
+            )
+            return outputs, state
+
+        return stateless_function
+
+    def _wrap_stateless_function(self, compiled_function, models=None):
+        """Call a function from `_make_stateless_function()` on model state."""
+        import jax
+
+        models = models or []
 
-                with keras.StatelessScope(state_mapping=mapping) as scope:
-                    outputs = self.generate_step(inputs, end_token_id)
-
-                # Get updated sampler variables from the stateless scope.
-                sampler_variables = []
-                for v in self._sampler.variables:
-                    new_v = scope.get_current_value(v)
-                    sampler_variables.append(new_v if new_v is not None else v)
-                state = (
-                    sampler_variables,
-                    trainable_variables,
-                    non_trainable_variables,
+        def convert(x):
+            # Pass arrays through without a copy, so they can be donated.
+            if x is None or isinstance(x, jax.Array):
+                return x
+            return ops.convert_to_tensor(x)
+
+        def wrapped_function(*args, **kwargs):
+            # Create an explicit tuple of all variable state.
+            state = (
+                self._sampler.variables,
+                self.trainable_variables,
+                self.non_trainable_variables,
+                [v for model in models for v in model.variables],
+            )
+            args, kwargs = tree.map_structure(convert, (args, kwargs))
+            outputs, state = compiled_function(state, *args, **kwargs)
+            # Only assign the sampler variables (random seeds), as other
+            # model variables should never be updated in generation.
+            for ref_v, v in zip(self._sampler.variables, state[0]):
+                ref_v.assign(v)
+            return outputs
+
+        return wrapped_function
+
+    def stream_step(
+        self,
+        token_ids,
+        cache,
+        index,
+        done,
+        end_token_id=None,
+    ):
+        """A compilable function generating a single token for each sequence.
+
+        This is the decoding body used by `generate_stream()`. Each unfinished
+        sequence feeds its last token to `call_with_cache()`, and writes the
+        token chosen by the attached `sampler` at its own `index`.
+
+        Args:
+            token_ids: A dense int Tensor with shape `(batch_size, max_length)`.
+            cache: The decoding cache, seeded by `_build_cache()`.
+            index: An int Tensor of shape `(batch_size,)`. The position of the
+                next token of each sequence.
+            done: A bool Tensor of shape `(batch_size,)`. Whether each sequence
+                has finished generating.
+            end_token_id: The id of the end token to stop on.
+
+        Returns:
+            A `(token_ids, cache, index, done, next_token)` tuple, updated with
+            the new token of each sequence. `next_token` has shape
+            `(batch_size,)`, and holds the new token of each sequence which
+            was not already `done`.
+        """
+        max_length = ops.shape(token_ids)[1]
+        index = ops.cast(index, "int32")
+        token = ops.take_along_axis(token_ids, (index - 1)[:, None], axis=1)
+        logits, _, cache = self.call_with_cache(token, cache, index - 1)
+        next_token = self._sampler.get_next_token_from_logits(logits[:, 0, :])
+        next_token = ops.cast(next_token, token_ids.dtype)
+        positions = ops.arange(max_length, dtype="int32")[None, :]
+        update = (positions == index[:, None]) & ~done[:, None]
+        token_ids = ops.where(update, next_token[:, None], token_ids)
+        index = ops.where(done, index, index + 1)
+        done = done | (index >= max_length)
+        if end_token_id is not None:
+            done = done | ops.any(update & (token_ids == end_token_id), axis=1)
+        return token_ids, cache, index, done, next_token
+
+    def speculative_generate_step(
+        self,
+        inputs,
+        draft_model,
+        num_draft_tokens=4,
+        end_token_id=None,
+    ):
+        """A compilable speculative generation function for a batch of inputs.
+
+        Each iteration, `draft_model` proposes `num_draft_tokens` tokens one at
+        a time, and this model scores all proposals with a single forward pass.
+        Proposals are accepted or rejected with speculative sampling, so the
+        generated tokens follow the exact distribution of the attached
+        `sampler`, and each iteration generates at least one token.
+
+        Args:
+            inputs: A dictionary with two keys `"token_ids"` and
+                `"padding_mask"` and batched tensor values.
+            draft_model: A `keras_nlp.models.GenerativeTask` with the same
+                vocabulary as this model, used to propose tokens.
+            num_draft_tokens: int. The number of tokens to propose with the
+                draft model before each verification pass.
+            end_token_id: The id of the end token to stop on. If all
+                sequences have produced a new `end_token_id`, generation
+                will stop.
+        """
+        token_ids, padding_mask = inputs["token_ids"], inputs["padding_mask"]
+        padding_mask = ops.cast(padding_mask, "bool")
+        max_length = ops.shape(token_ids)[1]
+        if isinstance(max_length, int) and max_length <= num_draft_tokens:
+            raise ValueError(
+                "`max_length` must be greater than `num_draft_tokens`. "
+                f"Received: max_length={max_length}, "
+                f"num_draft_tokens={num_draft_tokens}"
+            )
+        sampler = self._sampler
+        # Samplers without a seed generator (e.g. greedy) always filter to a
+        # single token, and the outcome does not depend on the seed.
+        seed = getattr(sampler, "seed_generator", 0)
+        # Create and seed both caches with a single forward pass.
+        _, cache = self._build_cache(token_ids)
+        _, draft_cache = draft_model._build_cache(token_ids)
+        # Each row starts at the first index that has no user inputted id.
+        index = ops.sum(ops.cast(padding_mask, "int32"), axis=-1)
+        index = ops.cast(index, "int32")
+        positions = ops.arange(max_length, dtype="int32")[None, :]
+
+        def compute_probabilities(logits):
+            logits = ops.cast(logits, "float32")
+            probabilities = keras.activations.softmax(
+                logits / sampler.temperature
+            )
+            return sampler.filter_probabilities(probabilities)
+
+        def sample(probabilities):
+            next_token = random.categorical(
+                ops.log(probabilities), 1, seed=seed, dtype="int32"
+            )
+            return ops.squeeze(next_token, axis=-1)
+
+        def take_probability(probabilities, token):
+            probability = ops.take_along_axis(
+                probabilities, token[:, None], axis=-1
+            )
+            return ops.squeeze(probability, axis=-1)
+
+        def update(token_ids, token, index, update_mask):
+            update_mask = (positions == index[:, None]) & update_mask[:, None]
+            token = ops.cast(token, token_ids.dtype)
+            return ops.where(update_mask, token[:, None], token_ids)
+
+        def is_done(token_ids, index):
+            done = index >= max_length
+            if end_token_id is not None:
+                # Stop rows which have produced a *new* end_token_id.
+                end_tokens = (token_ids == end_token_id) & (~padding_mask)
+                done = done | ops.any(end_tokens, axis=-1)
+            return done
+
+        def cond(token_ids, cache, draft_cache, index):
+            return ops.logical_not(ops.all(is_done(token_ids, index)))
+
+        def body(token_ids, cache, draft_cache, index):
+            done = is_done(token_ids, index)
+            # Propose tokens with the draft model, starting from the last
+            # token of each row. We feed one more token than we sample, so the
+            # draft cache holds every proposal if all of them are accepted.
+            proposal_ids = token_ids
+            draft_tokens, draft_probabilities = [], []
+            next_token = ops.take_along_axis(
+                token_ids, (index - 1)[:, None], axis=1
+            )
+            for i in range(num_draft_tokens + 1):
+                cache_update_index = ops.minimum(index - 1 + i, max_length - 1)
+                logits, _, draft_cache = draft_model.call_with_cache(
+                    next_token,
+                    draft_cache,
+                    cache_update_index,
+                )
+                if i == num_draft_tokens:
+                    break
+                probabilities = compute_probabilities(logits[:, 0, :])
+                draft_token = sample(probabilities)
+                proposal_ids = update(
+                    proposal_ids,
+                    draft_token,
+                    index + i,
+                    index + i < max_length,
                 )
-                return outputs, state
+                draft_tokens.append(draft_token)
+                draft_probabilities.append(probabilities)
+                next_token = ops.cast(draft_token[:, None], token_ids.dtype)
 
-            def wrapped_generate_function(
-                inputs,
-                end_token_id=None,
-            ):
-                # Create an explicit tuple of all variable state.
-                state = (
-                    self._sampler.variables,
-                    self.trainable_variables,
-                    self.non_trainable_variables,
+            # Score all proposals with a single forward pass of the target
+            # model. Near `max_length`, the window is moved left to stay in
+            # bounds, which recomputes the cache for a few known tokens.
+            start = ops.minimum(index - 1, max_length - num_draft_tokens - 1)
+            window = start[:, None] + ops.arange(
+                num_draft_tokens + 1, dtype="int32"
+            )
+            window_ids = ops.take_along_axis(proposal_ids, window, axis=1)
+            logits, _, cache = self.call_with_cache(window_ids, cache, start)
+
+            # Accept each proposal with probability `min(1, p / q)`, where
+            # `p` and `q` are the target and draft probabilities. On the
+            # first rejection, resample from the normalized `max(0, p - q)`.
+            # If all proposals are accepted, sample one more token from `p`.
+            num_accepted = ops.zeros_like(index)
+            accepting = ops.ones_like(done)
+            final_probabilities = None
+            for i in range(num_draft_tokens + 1):
+                offset = ops.minimum(index + i - 1 - start, num_draft_tokens)
+                target_logits = ops.take_along_axis(
+                    logits, offset[:, None, None], axis=1
                 )
-                inputs = tree.map_structure(ops.convert_to_tensor, inputs)
-                outputs, state = compiled_generate_function(
-                    inputs,
-                    end_token_id,
-                    state,
+                target = compute_probabilities(target_logits[:, 0, :])
+                if i < num_draft_tokens:
+                    token = draft_tokens[i]
+                    draft = draft_probabilities[i]
+                    ratio = take_probability(target, token) / take_probability(
+                        draft, token
+                    )
+                    uniform = random.uniform(ops.shape(ratio), seed=seed)
+                    accepted = uniform < ratio
+                    residual = ops.maximum(target - draft, 0.0)
+                    residual = ops.where(
+                        ops.sum(residual, axis=-1, keepdims=True) > 0,
+                        residual,
+                        target,
+                    )
+                else:
+                    accepted = ops.zeros_like(accepting)
+                    residual = target
+                if final_probabilities is None:
+                    final_probabilities = residual
+                rejected = accepting & ops.logical_not(accepted)
+                final_probabilities = ops.where(
+                    rejected[:, None], residual, final_probabilities
                 )
-                # Only assign the sampler variables (random seeds), as other
-                # model variables should never be updated in generation.
-                for ref_v, v in zip(self._sampler.variables, state[0]):
-                    ref_v.assign(v)
-                return outputs
+                accepting = accepting & accepted
+                num_accepted = num_accepted + ops.cast(accepting, "int32")
+            final_token = sample(final_probabilities)
 
-            self.generate_function = wrapped_generate_function
+            # Write accepted proposals followed by the final token.
+            num_new = ops.minimum(num_accepted + 1, max_length - index)
+            num_new = ops.where(done, 0, num_new)
+            for i in range(num_draft_tokens + 1):
+                if i < num_draft_tokens:
+                    token = ops.where(
+                        num_accepted == i, final_token, draft_tokens[i]
+                    )
+                else:
+                    token = final_token
+                token_ids = update(token_ids, token, index + i, i < num_new)
+            return token_ids, cache, draft_cache, index + num_new
 
-        return self.generate_function
+        token_ids, _, _, _ = sampler.run_loop(
+            cond,
+            body,
+            loop_vars=(token_ids, cache, draft_cache, index),
+            maximum_iterations=max_length,
+        )
+
+        # Compute an output padding mask with the token ids we updated.
+        if end_token_id is not None:
+            # Build a mask of `end_token_id` locations not in the original
+            # prompt (not in locations where `padding_mask` is True).
+            end_locations = ops.logical_and(
+                ops.equal(token_ids, end_token_id),
+                ops.logical_not(padding_mask),
+            )
+            end_locations = ops.cast(end_locations, "int32")
+            # Use cumsum to get ones in all locations after end_locations.
+            cumsum = ops.cast(ops.cumsum(end_locations, axis=-1), "int32")
+            overflow = cumsum - end_locations
+            # Our padding mask is the inverse of these overflow locations.
+            padding_mask = ops.logical_not(ops.cast(overflow, "bool"))
+        else:
+            # Without early stopping, all locations will have been updated.
+            padding_mask = ops.ones_like(token_ids, dtype="bool")
+        return {
+            "token_ids": token_ids,
+            "padding_mask": padding_mask,
+        }
+
+    def _build_shared_cache(self, cache):
+        """Move a dense cache into a pool of blocks shared by all sequences.
+
+        Beam search reorders its beams at every step, and contrastive search
+        extends each sequence with `k` candidate tokens at every step. Rather
+        than copying the cache of each sequence, we hold the cache of all
+        sequences in a paged cache with single position blocks, and look up the
+        cache of each sequence through a block table. Samplers only repeat or
+        reorder the rows of the block table, which are per-row state, and pass
+        the pool through unchanged as their `shared_cache`.
+
+        This saves rewriting the cache of every layer for every sequence at
+        each step, and storing the prompt once per beam. It does not save
+        memory traffic in attention: each layer still gathers a dense
+        `(num_sequences, max_length, num_heads, head_dim)` view of the keys
+        and values of each sequence from the pool at each step.
+
+        For beam search, each beam writes its own block at each position, and
+        the prompt of each batch row is stored once, in the blocks of its first
+        beam. For contrastive search, each batch row owns a block at each
+        position, and `k` scratch blocks, listed after its positions in its
+        row of the block table. Each candidate token writes one of the scratch
+        blocks of its row, which is swapped into the block table of the
+        candidate, so that selecting a candidate also selects its cache.
+
+        Args:
+            cache: a tuple of dense float Tensors, the key/value cache of each
+                decoder layer, with shape
+                `(batch_size, 2, max_length, num_heads, head_dim)`.
+
+        Returns:
+            A `(cache, block_table)` tuple. `block_table` is an int Tensor of
+            shape `(batch_size, max_length)`, or
+            `(batch_size, max_length + k)` for contrastive search. Only its
+            first `max_length` columns index the cache of each sequence. If
+            the attached sampler is not a `keras_nlp.samplers.BeamSampler` or
+            `keras_nlp.samplers.ContrastiveSampler`, or the batch size is not
+            static, `cache` is returned unchanged and `block_table` is `None`.
+        """
+        batch_size, _, max_length = tuple(cache[0].shape)[:3]
+        if not isinstance(batch_size, int):
+            return cache, None
+        rows = ops.arange(batch_size, dtype="int32")[:, None]
+        positions = ops.arange(max_length, dtype="int32")[None, :]
+        if isinstance(self._sampler, BeamSampler):
+            # Leave the blocks of all other beams empty.
+            num_beams = self._sampler.num_beams
+            padding = [[0, 0], [0, num_beams - 1]] + [[0, 0]] * 4
+            block_table = rows * num_beams * max_length + positions
+            num_scratch_blocks = 0
+        elif isinstance(self._sampler, ContrastiveSampler):
+            k = self._sampler.k
+            padding = [[0, 0]] * 6
+            scratch_blocks = ops.arange(k, dtype="int32")[None, :]
+            scratch_blocks = batch_size * max_length + rows * k + scratch_blocks
+            block_table = ops.concatenate(
+                [rows * max_length + positions, scratch_blocks], axis=1
+            )
+            num_scratch_blocks = batch_size * k
+        else:
+            return cache, None
+
+        def to_blocks(x):
+            x = ops.transpose(x, (0, 2, 1, 3, 4))[:, None, ...]
+            x = ops.pad(x, padding)
+            x = ops.reshape(x, (-1,) + tuple(x.shape)[3:])
+            x = ops.pad(x, [[0, num_scratch_blocks]] + [[0, 0]] * 3)
+            return ops.expand_dims(x, axis=2)
+
+        return tuple(to_blocks(x) for x in cache), block_table
+
+    def _update_block_table(self, block_table, cache_update_index, batch_size):
+        """Point the current position of each sequence at a block it owns.
+
+        See `_build_shared_cache()`. Each beam owns the block
+        `i * max_length + p` at each position `p`, where `i` is its row in
+        `block_table`. Blocks are only written by their owner at their own
+        position, so blocks shared with other beams are never overwritten.
+
+        For contrastive search, each row of the batch writes the blocks of its
+        block table. Each of the `batch_size * k` candidate sequences instead
+        swaps its scratch block with the block at its current position.
+        """
+        num_rows, num_columns = ops.shape(block_table)
+        cache_update_index = ops.reshape(cache_update_index, (-1, 1))
+        columns = ops.arange(num_columns, dtype="int32")[None, :]
+        if isinstance(self._sampler, ContrastiveSampler):
+            if num_rows == batch_size:
+                return block_table
+            k = self._sampler.k
+            rows = ops.arange(num_rows, dtype="int32")[:, None]
+            scratch_columns = num_columns - k + rows % k
+            current_block = ops.take_along_axis(
+                block_table,
+                ops.broadcast_to(cache_update_index, (num_rows, 1)),
+                axis=1,
+            )
+            scratch_block = ops.take_along_axis(
+                block_table, scratch_columns, axis=1
+            )
+            block_table = ops.where(
+                columns == cache_update_index, scratch_block, block_table
+            )
+            return ops.where(
+                columns == scratch_columns, current_block, block_table
+            )
+        rows = ops.arange(num_rows, dtype="int32")[:, None]
+        blocks = rows * num_columns + columns
+        return ops.where(columns == cache_update_index, blocks, block_table)
 
     def _normalize_generate_inputs(
         self,
@@ -209,6 +813,10 @@ class GenerativeTask(Task):
         self,
         inputs,
         max_length=None,
+        draft_model=None,
+        num_draft_tokens=4,
+        prefix_cache=None,
+        num_samples=1,
     ):
         """Generate text given prompt `inputs`.
 
@@ -237,12 +845,46 @@ class GenerativeTask(Task):
                 `preprocessor`. If `preprocessor` is `None`, `inputs` should be
                 should be padded to the desired maximum length and this argument
                 will be ignored.
+            draft_model: Optional. A smaller `keras_nlp.models.GenerativeTask`
+                sharing the vocabulary of this model. If set, generation uses
+                speculative decoding: the draft model proposes tokens, which
+                are verified with a single forward pass of this model. The
+                generated text follows the same distribution as without a draft
+                model, but usually takes fewer forward passes of this model.
+                Only supported for decoder-only models, and samplers which
+                sample each token independently (e.g. not `"beam"`).
+            num_draft_tokens: int. The number of tokens `draft_model` proposes
+                before each verification pass. Defaults to `4`.
+            prefix_cache: Optional. A `keras_nlp.models.PrefixCache`. If set,
+                the key/value cache of each prompt is stored after its
+                prefill pass, and prompts sharing a prefix with a stored
+                prompt only run the prefill pass on their remaining tokens.
+                Only supported for decoder-only models, and not combined with
+                `draft_model`.
+            num_samples: int. The number of sequences to generate for each
+                input. The inputs are processed with a single forward pass,
+                whose cache is shared by all sequences of an input, which are
+                then decoded as one batch. Each sequence draws different
+                random samples, so this is only supported with samplers which
+                sample each token independently (e.g. not `"beam"`), and not
+                combined with `draft_model`. Outputs hold the `num_samples`
+                sequences of each input in consecutive rows. Defaults to `1`.
         """
         # Setup our three main passes.
         # 1. Optionally preprocessing strings to dense integer tensors.
         # 2. Generate new tokens via a compiled function on dense tensors.
         # 3. Optionally postprocess dense integer tensors back to string.
-        generate_function = self.make_generate_function()
+        if prefix_cache is not None:
+            self._check_prefix_caching(draft_model)
+        if num_samples != 1:
+            self._check_num_samples(num_samples, draft_model)
+        if draft_model is not None:
+            self._check_speculative_decoding(draft_model, num_draft_tokens)
+            speculative_generate_function = (
+                self.make_speculative_generate_function(
+                    draft_model, num_draft_tokens
+                )
+            )
         end_token_id = None
         if self.preprocessor is not None:
             end_token_id = self.preprocessor.tokenizer.end_token_id
@@ -253,7 +895,36 @@ class GenerativeTask(Task):
             )
 
         def generate(x):
-            return generate_function(x, end_token_id=end_token_id)
+            x, sizes = self._pad_to_buckets(x)
+            if draft_model is not None:
+                outputs = speculative_generate_function(
+                    x, end_token_id=end_token_id
+                )
+                return trim(outputs, sizes)
+            shape = tuple(tuple(v.shape) for v in tree.flatten(x))
+            key = (shape, prefix_cache is not None, num_samples)
+            generate_function, is_new = self._get_generate_function(
+                key, num_samples
+            )
+            kwargs = {"end_token_id": end_token_id}
+            if prefix_cache is not None:
+                cached_prefix = self._prefill_with_prefix_cache(x, prefix_cache)
+                kwargs["cached_prefix"] = cached_prefix
+            start = time.perf_counter()
+            outputs = generate_function(x, **kwargs)
+            if is_new:
+                # The first call traces and compiles the function, and also
+                # runs it, so this is an upper bound on compilation time.
+                elapsed = time.perf_counter() - start
+                self.generate_cache_stats["first_call_time"] += elapsed
+            return trim(outputs, sizes)
+
+        def trim(outputs, sizes):
+            """Drop the rows and positions added by `_pad_to_buckets()`."""
+            return {
+                k: v[: sizes[k][0] * num_samples, : sizes[k][1]]
+                for k, v in outputs.items()
+            }
 
         def postprocess(x):
             return self.preprocessor.generate_postprocess(x)
@@ -274,4 +945,525 @@ class GenerativeTask(Task):
         if self.preprocessor is not None:
             outputs = [postprocess(x) for x in outputs]
 
+        # Keep the batch axis of a scalar input with several samples.
+        input_is_scalar = input_is_scalar and num_samples == 1
         return self._normalize_generate_outputs(outputs, input_is_scalar)
+
+    def warmup(self, buckets):
+        """Compile the generation function for a list of input shapes.
+
+        By default, the generation function for each input shape is compiled
+        by the first `generate()` call with that shape. This method runs
+        generation once on a dummy batch of each shape in `buckets`, so that
+        later `generate()` calls with the same shapes skip compilation. Shapes
+        are padded with the `batch_size_buckets` and `sequence_length_buckets`
+        passed to `compile()`, as for `generate()`.
+
+        Args:
+            buckets: A list of `(batch_size, sequence_length)` tuples. The
+                `sequence_length` is the `max_length` of the generated
+                sequences, as passed to `generate()`.
+
+        Examples:
+        ```python
+        gpt2_lm = keras_nlp.models.GPT2CausalLM.from_preset("gpt2_base_en")
+        gpt2_lm.compile(sequence_length_buckets=[64, 128])
+        gpt2_lm.warmup([(1, 64), (1, 128), (8, 128)])
+        ```
+        """
+        for batch_size, sequence_length in buckets:
+            if self.preprocessor is not None:
+                self.generate([""] * batch_size, max_length=sequence_length)
+            else:
+                self.generate(
+                    self._make_warmup_inputs(batch_size, sequence_length)
+                )
+
+    def export_generate_functions(self, filepath, buckets):
+        """Export the compiled generation function for a list of input shapes.
+
+        Other processes can load the exported functions with
+        `load_generate_functions()`, instead of tracing generation for each
+        shape again. With the JAX backend, each function is stored with
+        `jax.experimental.export`, and takes the model weights as inputs, so
+        the weights of the loading model are used. With the TensorFlow
+        backend, the functions are stored as a SavedModel, which holds a copy
+        of the model weights at export time. The sampler attached when
+        exporting is used by the exported functions.
+
+        Args:
+            filepath: str. The directory to write the exported functions to.
+            buckets: A list of `(batch_size, sequence_length)` tuples, as for
+                `warmup()`.
+
+        Examples:
+        ```python
+        gpt2_lm = keras_nlp.models.GPT2CausalLM.from_preset("gpt2_base_en")
+        gpt2_lm.export_generate_functions("gpt2_generate", [(8, 128)])
+
+        # In another process.
+        gpt2_lm = keras_nlp.models.GPT2CausalLM.from_preset("gpt2_base_en")
+        gpt2_lm.load_generate_functions("gpt2_generate")
+        gpt2_lm.generate(["I want to say"] * 8, max_length=128)
+        ```
+        """
+        self._check_generate_export()
+        end_token_id = None
+        if self.preprocessor is not None:
+            end_token_id = self.preprocessor.tokenizer.end_token_id
+        os.makedirs(filepath, exist_ok=True)
+
+        specs = []
+        for i, (batch_size, sequence_length) in enumerate(buckets):
+            inputs = self._make_warmup_inputs(batch_size, sequence_length)
+            inputs = tree.map_structure(ops.convert_to_tensor, inputs)
+            shapes = [list(x.shape) for x in tree.flatten(inputs)]
+            specs.append((f"generate_{i}", shapes, inputs))
+
+        if config.backend() == "jax":
+            import jax
+            from jax.experimental.export import export
+            from jax.experimental.export import serialization
+
+            stateless_function = self._make_stateless_function(
+                self.generate_step
+            )
+
+            def generate_step(state, inputs):
+                return stateless_function(
+                    state, inputs, end_token_id=end_token_id
+                )
+
+            state = (
+                self._sampler.variables,
+                self.trainable_variables,
+                self.non_trainable_variables,
+                [],
+            )
+            state = tree.map_structure(
+                lambda v: jax.ShapeDtypeStruct(v.shape, v.dtype), state
+            )
+            for name, _, inputs in specs:
+                exported = export.export(jax.jit(generate_step))(state, inputs)
+                path = os.path.join(filepath, f"{name}.bin")
+                with open(path, "wb") as f:
+                    f.write(serialization.serialize(exported))
+        else:
+            jit_compile = getattr(self, "jit_compile", True)
+            module = tf.Module()
+            # Track all variables read by generation, so they are saved.
+            module.generate_variables = list(self.variables) + list(
+                self._sampler.variables
+            )
+            for name, _, inputs in specs:
+                function = tf.function(
+                    lambda x: self.generate_step(x, end_token_id=end_token_id),
+                    jit_compile=jit_compile,
+                )
+                function.get_concrete_function(
+                    tree.map_structure(
+                        lambda x: tf.TensorSpec(x.shape, x.dtype), inputs
+                    )
+                )
+                setattr(module, name, function)
+            tf.saved_model.save(module, os.path.join(filepath, "saved_model"))
+
+        index = {
+            "backend": config.backend(),
+            "end_token_id": end_token_id,
+            "functions": [
+                {"name": name, "shapes": shapes} for name, shapes, _ in specs
+            ],
+        }
+        with open(os.path.join(filepath, "index.json"), "w") as f:
+            json.dump(index, f)
+
+    def load_generate_functions(self, filepath):
+        """Load generation functions from `export_generate_functions()`.
+
+        The loaded functions are used by later `generate()` calls with the
+        exported input shapes, instead of compiling new functions. As
+        `compile()` clears all generation functions, load functions after
+        compiling the model.
+
+        Args:
+            filepath: str. The directory passed to
+                `export_generate_functions()`.
+        """
+        self._check_generate_export()
+        with open(os.path.join(filepath, "index.json")) as f:
+            index = json.load(f)
+        end_token_id = None
+        if self.preprocessor is not None:
+            end_token_id = self.preprocessor.tokenizer.end_token_id
+        if index["backend"] != config.backend():
+            raise ValueError(
+                "Generation functions must be loaded with the backend they "
+                f"were exported with. Received: exported with "
+                f"backend={index['backend']}, loading with "
+                f"backend={config.backend()}"
+            )
+        if index["end_token_id"] != end_token_id:
+            raise ValueError(
+                "Generation functions were exported with a different "
+                f"`end_token_id`. Received: exported with "
+                f"end_token_id={index['end_token_id']}, loading with "
+                f"end_token_id={end_token_id}"
+            )
+
+        if config.backend() == "jax":
+            import jax
+            from jax.experimental.export import export
+            from jax.experimental.export import serialization
+
+            def load(name):
+                with open(os.path.join(filepath, f"{name}.bin"), "rb") as f:
+                    exported = serialization.deserialize(bytearray(f.read()))
+                compiled_function = jax.jit(export.call_exported(exported))
+                return self._wrap_stateless_function(
+                    # `end_token_id` is fixed when exporting.
+                    lambda state, x, **kwargs: compiled_function(state, x)
+                )
+
+        else:
+            module = tf.saved_model.load(os.path.join(filepath, "saved_model"))
+
+            def load(name):
+                # Reference the loaded module, which owns the variables read
+                # by the function. `end_token_id` is fixed when exporting.
+                return lambda x, **kwargs: getattr(module, name)(x)
+
+        for spec in index["functions"]:
+            shape = tuple(tuple(x) for x in spec["shapes"])
+            key = (shape, False, 1)
+            self._add_generate_function(key, load(spec["name"]))
+
+    def _make_warmup_inputs(self, batch_size, sequence_length):
+        """Build a dummy batch of generate inputs, padded to the buckets."""
+        if self.preprocessor is not None:
+            inputs = self.preprocessor.generate_preprocess(
+                tf.constant([""] * batch_size),
+                sequence_length=sequence_length,
+            )
+        elif hasattr(self, "call_with_cache"):
+            shape = (batch_size, sequence_length)
+            positions = ops.arange(sequence_length)[None, :]
+            inputs = {
+                "token_ids": ops.zeros(shape, dtype="int32"),
+                "padding_mask": ops.repeat(positions < 1, batch_size, axis=0),
+            }
+        else:
+            raise ValueError(
+                "Models which are not decoder-only need an attached "
+                "`preprocessor` to build warmup inputs. Received: "
+                f"{self.__class__.__name__} with preprocessor=None"
+            )
+        inputs, _ = self._pad_to_buckets(inputs)
+        return inputs
+
+    def generate_stream(
+        self,
+        inputs,
+        max_length=None,
+    ):
+        """Generate text given prompt `inputs`, one token at a time.
+
+        Unlike `generate()`, which returns once generation has finished, this
+        method returns a generator yielding the tokens of each decoding step
+        as soon as they are sampled. The prompt is processed with a single
+        compiled forward pass, after which each step runs a compiled function
+        sampling one token for every sequence, see `stream_step()`.
+
+        If a `preprocessor` is attached to the model, each step yields the
+        text decoded since the previous step, with one string per sequence
+        (empty for finished sequences). The prompt followed by all yielded
+        text matches the output of `generate()`. If a `preprocessor` is not
+        attached, each step yields a dictionary with keys `"token_ids"` and
+        `"padding_mask"` of shape `(batch_size, 1)`, holding the new token of
+        each sequence, masked out for finished sequences.
+
+        Only supported for decoder-only models, and samplers which sample
+        each token independently (e.g. not `"beam"`).
+
+        Args:
+            inputs: python data, tensor data, or a `tf.data.Dataset`, as for
+                `generate()`. A dataset is streamed batch by batch.
+            max_length: Optional. int. The max length of the generated
+                sequence. See `generate()`.
+
+        Examples:
+        ```python
+        gpt2_lm = keras_nlp.models.GPT2CausalLM.from_preset("gpt2_base_en")
+        for text in gpt2_lm.generate_stream("I want to say", max_length=30):
+            print(text, end="")
+        ```
+        """
+        self._check_streaming()
+        prefill_function = self.make_prefill_function()
+        step_function = self.make_stream_step_function()
+        end_token_id = None
+        if self.preprocessor is not None:
+            end_token_id = self.preprocessor.tokenizer.end_token_id
+
+        def preprocess(x):
+            return self.preprocessor.generate_preprocess(
+                x, sequence_length=max_length
+            )
+
+        def detokenize(token_ids, rows, start, end):
+            """Detokenize `token_ids[i, start[i]:end[i]]` for each of `rows`."""
+            width = max(int(np.max(end[rows] - start[rows])), 1)
+            positions = start[rows, None] + np.arange(width)[None, :]
+            padding_mask = positions < end[rows, None]
+            positions = np.minimum(positions, token_ids.shape[1] - 1)
+            x = {
+                "token_ids": token_ids[rows[:, None], positions],
+                "padding_mask": padding_mask,
+            }
+            return tensor_to_list(self.preprocessor.generate_postprocess(x))
+
+        def stream(x):
+            token_ids = ops.convert_to_tensor(x["token_ids"])
+            token_ids_numpy = ops.convert_to_numpy(x["token_ids"]).copy()
+            padding_mask = ops.convert_to_numpy(x["padding_mask"])
+            _, cache = prefill_function(token_ids)
+            max_length = padding_mask.shape[1]
+            rows = np.arange(padding_mask.shape[0])
+            index = np.sum(padding_mask.astype("int32"), axis=-1)
+            done = index >= max_length
+            # Only the tokens after `read_index` are new. Each step decodes
+            # them along with a few previous tokens from `prefix_index`, so
+            # that text spanning token boundaries decodes as in the full
+            # sequence, and only yields the text after those previous tokens.
+            read_index = index.copy()
+            prefix_index = np.maximum(index - 5, 0)
+            while not np.all(done):
+                outputs = step_function(
+                    token_ids,
+                    cache,
+                    ops.convert_to_tensor(index, "int32"),
+                    ops.convert_to_tensor(done),
+                    end_token_id=end_token_id,
+                )
+                token_ids, cache, next_index, next_done, new_tokens = outputs
+                # Mirror the new tokens on the host, rather than copying all
+                # token ids back each step.
+                updated = ~done
+                positions = np.minimum(index, max_length - 1)
+                new_tokens = np.where(
+                    updated,
+                    ops.convert_to_numpy(new_tokens),
+                    token_ids_numpy[rows, positions],
+                )
+                token_ids_numpy[rows, positions] = new_tokens
+                index = ops.convert_to_numpy(next_index)
+                done = ops.convert_to_numpy(next_done)
+                if self.preprocessor is None:
+                    yield {
+                        "token_ids": new_tokens[:, None],
+                        "padding_mask": updated[:, None],
+                    }
+                    continue
+                chunks = [""] * len(rows)
+                updated_rows = rows[updated]
+                text = detokenize(
+                    token_ids_numpy, updated_rows, prefix_index, read_index
+                )
+                new_text = detokenize(
+                    token_ids_numpy, updated_rows, prefix_index, index
+                )
+                for i, x, y in zip(updated_rows, text, new_text):
+                    # Hold back incomplete multi-byte characters until the
+                    # tokens completing them are sampled.
+                    if y.endswith("\ufffd") and not done[i]:
+                        continue
+                    chunks[i] = y[len(x) :]
+                    prefix_index[i] = read_index[i]
+                    read_index[i] = index[i]
+                yield tf.constant(chunks)
+
+        inputs, input_is_scalar = self._normalize_generate_inputs(inputs)
+        if self.preprocessor is not None:
+            if isinstance(inputs, tf.data.Dataset):
+                inputs = inputs.map(preprocess, tf.data.AUTOTUNE)
+                inputs = inputs.prefetch(tf.data.AUTOTUNE)
+            else:
+                inputs = [preprocess(x) for x in inputs]
+
+        def generator():
+            for x in inputs:
+                for outputs in stream(x):
+                    yield self._normalize_generate_outputs(
+                        [outputs], input_is_scalar
+                    )
+
+        return generator()
+
+    def _prefill_with_prefix_cache(self, inputs, prefix_cache):
+        """Build the prompt cache of a batch, reusing stored prompt prefixes.
+
+        Each row reuses the longest prefix it shares with a stored prompt, and
+        the prefill pass computes the same number of positions in each row,
+        padded to a power of two so that the prefill function is only traced
+        once per bucket. Only the new positions of prompts which are not
+        stored yet are copied back to the host.
+
+        Returns the `(cache, hidden_states, row_lengths)` of the whole batch,
+        to be passed as `cached_prefix` to `generate_step()`.
+        """
+        token_ids = ops.convert_to_numpy(inputs["token_ids"])
+        padding_mask = ops.convert_to_numpy(inputs["padding_mask"])
+        batch_size, max_length = token_ids.shape
+        row_lengths = np.sum(padding_mask.astype("int32"), axis=-1)
+        prompts = [x[:n] for x, n in zip(token_ids, row_lengths)]
+
+        matches = [prefix_cache.lookup(x) for x in prompts]
+        match_lengths = np.array([length for length, _ in matches])
+        start_index = np.zeros_like(row_lengths)
+        cached_prefix = None
+        if np.any(match_lengths > 0):
+            num_new = int(np.max(row_lengths - match_lengths))
+            if num_new > 0:
+                num_new = min(2 ** (num_new - 1).bit_length(), max_length)
+            prefix_length = max_length - num_new
+            start_index = np.minimum(match_lengths, prefix_length)
+            # Gather the stored states of each row into a single batch.
+            layers, hidden = next(states for _, states in matches if states)
+            prefix = tuple(
+                np.zeros((batch_size, 2, prefix_length) + x.shape[2:], x.dtype)
+                for x in layers
+            )
+            prefix_hidden_states = np.zeros(
+                (batch_size, prefix_length) + hidden.shape[1:], hidden.dtype
+            )
+            for i, (_, states) in enumerate(matches):
+                n = start_index[i]
+                if n == 0:
+                    continue
+                for x, y in zip(prefix, states[0]):
+                    x[i, :, :n] = y[:, :n]
+                prefix_hidden_states[i, :n] = states[1][:n]
+            cached_prefix = (prefix, prefix_hidden_states, start_index)
+
+        prefill_function = self.make_prefill_function()
+        hidden_states, cache = prefill_function(
+            inputs["token_ids"], cached_prefix
+        )
+
+        # Store the states of new prompts for later calls. Only the positions
+        # computed by the prefill pass are copied back to the host.
+        new_rows = {}
+        for i, prompt in enumerate(prompts):
+            if prompt not in prefix_cache:
+                new_rows.setdefault(tuple(prompt), i)
+        rows = np.array(list(new_rows.values()), dtype="int32")
+        if len(rows) > 0:
+            begin = int(np.min(start_index[rows]))
+            end = int(np.max(row_lengths[rows]))
+            new_cache = [
+                ops.convert_to_numpy(ops.take(x, rows, axis=0)[:, :, begin:end])
+                for x in cache
+            ]
+            new_hidden_states = ops.convert_to_numpy(
+                ops.take(hidden_states, rows, axis=0)[:, begin:end]
+            )
+            for j, i in enumerate(rows):
+                n = start_index[i]
+                positions = slice(n - begin, row_lengths[i] - begin)
+                row_cache = [x[j, :, positions] for x in new_cache]
+                row_hidden_states = new_hidden_states[j, positions]
+                if n > 0:
+                    row_cache = [
+                        np.concatenate([x[i, :, :n], y], axis=1)
+                        for x, y in zip(prefix, row_cache)
+                    ]
+                    row_hidden_states = np.concatenate(
+                        [prefix_hidden_states[i, :n], row_hidden_states]
+                    )
+                prefix_cache.insert(
+                    prompts[i], tuple(row_cache), row_hidden_states
+                )
+        return cache, hidden_states, row_lengths
+
+    def _check_generate_export(self):
+        if config.backend() not in ("jax", "tensorflow"):
+            raise ValueError(
+                "Exporting generation functions is only supported with the "
+                "JAX and TensorFlow backends. Received: "
+                f"backend={config.backend()}"
+            )
+
+    def _check_streaming(self):
+        if not hasattr(self, "call_with_cache"):
+            raise ValueError(
+                "`generate_stream()` requires decoder-only models with a "
+                "`call_with_cache()` method. Received: "
+                f"{self.__class__.__name__}"
+            )
+        if self._sampler.__class__.__call__ is not Sampler.__call__:
+            raise ValueError(
+                "`generate_stream()` only supports samplers which sample each "
+                "token independently, via `get_next_token()`. Received: "
+                f"sampler={self._sampler.__class__.__name__}"
+            )
+        if self._sampler.constraint is not None or self._sampler.has_penalties:
+            raise ValueError(
+                "`generate_stream()` does not support samplers with a "
+                "`constraint` or repetition penalties."
+            )
+
+    def _check_num_samples(self, num_samples, draft_model):
+        if not isinstance(num_samples, int) or num_samples < 1:
+            raise ValueError(
+                "`num_samples` must be a positive integer. Received: "
+                f"num_samples={num_samples}"
+            )
+        if draft_model is not None:
+            raise ValueError(
+                "`num_samples` is not supported with speculative decoding. "
+                "Received: `num_samples` and `draft_model`."
+            )
+        if self._sampler.__class__.__call__ is not Sampler.__call__:
+            raise ValueError(
+                "`num_samples` only supports samplers which sample each token "
+                "independently, via `get_next_token()`. Received: "
+                f"sampler={self._sampler.__class__.__name__}"
+            )
+
+    def _check_prefix_caching(self, draft_model):
+        if not hasattr(self, "call_with_cache"):
+            raise ValueError(
+                "Prefix caching requires decoder-only models with a "
+                "`call_with_cache()` method. Received: "
+                f"{self.__class__.__name__}"
+            )
+        if draft_model is not None:
+            raise ValueError(
+                "Prefix caching is not supported with speculative decoding. "
+                "Received: `prefix_cache` and `draft_model`."
+            )
+
+    def _check_speculative_decoding(self, draft_model, num_draft_tokens):
+        for model in (self, draft_model):
+            if not hasattr(model, "call_with_cache"):
+                raise ValueError(
+                    "Speculative decoding requires decoder-only models with a "
+                    "`call_with_cache()` method. Received: "
+                    f"{model.__class__.__name__}"
+                )
+        if self._sampler.__class__.__call__ is not Sampler.__call__:
+            raise ValueError(
+                "Speculative decoding only supports samplers which sample "
+                "each token independently, via `get_next_token()`. Received: "
+                f"sampler={self._sampler.__class__.__name__}"
+            )
+        if self._sampler.constraint is not None or self._sampler.has_penalties:
+            raise ValueError(
+                "Speculative decoding does not support samplers with a "
+                "`constraint` or repetition penalties."
+            )
+        if num_draft_tokens < 1:
+            raise ValueError(
+                "`num_draft_tokens` must be a positive integer. Received: "
+                f"num_draft_tokens={num_draft_tokens}"
+            )
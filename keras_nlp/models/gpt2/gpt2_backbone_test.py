@@ -85,6 +85,25 @@ class GPT2Test(TestCase):
         restored_output = restored_model(self.input_batch)
         self.assertAllClose(model_output, restored_output)
 
+    @pytest.mark.large
+    def test_quantize(self):
+        model_output = self.backbone(self.input_batch)
+        quantized = self.backbone.quantize("int8")
+        self.assertIsNone(self.backbone.quantization_mode)
+        self.assertEqual(quantized.quantization_mode, "int8")
+        self.assertEqual(quantized.token_embedding.embeddings.dtype, "int8")
+        quantized_output = quantized(self.input_batch)
+        self.assertAllClose(quantized_output, model_output, atol=0.1)
+        with self.assertRaises(ValueError):
+            quantized.quantize("int8")
+
+        # Quantized weights are kept when saving and loading the backbone.
+        path = os.path.join(self.get_temp_dir(), "model.keras")
+        quantized.save(path, save_format="keras_v3")
+        restored_model = keras.models.load_model(path)
+        self.assertEqual(restored_model.quantization_mode, "int8")
+        self.assertAllClose(restored_model(self.input_batch), quantized_output)
+
     def test_create_layout_map(self):
         mesh = tf.experimental.dtensor.create_mesh([("batch", 1), ("model", 1)])
         with GPT2Backbone.create_layout_map(mesh).scope():
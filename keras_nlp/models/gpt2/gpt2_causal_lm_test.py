@@ -15,9 +15,12 @@
 import os
 from unittest.mock import patch
 
+import numpy as np
 import pytest
 import tensorflow as tf
+from absl.testing import parameterized
 
+from keras_nlp.backend import config
 from keras_nlp.backend import keras
 from keras_nlp.backend import ops
 from keras_nlp.models.gpt2.gpt2_backbone import GPT2Backbone
@@ -26,6 +29,12 @@ from keras_nlp.models.gpt2.gpt2_causal_lm_preprocessor import (
     GPT2CausalLMPreprocessor,
 )
 from keras_nlp.models.gpt2.gpt2_tokenizer import GPT2Tokenizer
+from keras_nlp.models.prefix_cache import PrefixCache
+from keras_nlp.samplers.beam_sampler import BeamSampler
+from keras_nlp.samplers.contrastive_sampler import ContrastiveSampler
+from keras_nlp.samplers.finite_state_constraint import FiniteStateConstraint
+from keras_nlp.samplers.greedy_sampler import GreedySampler
+from keras_nlp.samplers.top_k_sampler import TopKSampler
 from keras_nlp.tests.test_case import TestCase
 
 
@@ -113,6 +122,174 @@ class GPT2CausalLMTest(TestCase):
             self.preprocessed_batch["padding_mask"][:, :5],
         )
 
+    def test_generate_mixed_prompt_lengths(self):
+        self.causal_lm.compile(sampler="greedy")
+        prompts = [" airplane at airport", " airplane"]
+        outputs = self.causal_lm.generate(prompts)
+        # Each row should decode exactly as if it was generated on its own.
+        for prompt, output in zip(prompts, outputs):
+            self.assertEqual(self.causal_lm.generate(prompt), output)
+
+    def test_generate_compact_batch(self):
+        prompts = [" airplane at airport", " airplane", " airport"]
+        self.causal_lm.compile(sampler="greedy")
+        expected = self.causal_lm.generate(prompts)
+        self.causal_lm.compile(sampler=GreedySampler(compact_batch=True))
+        self.assertEqual(self.causal_lm.generate(prompts), expected)
+
+    @parameterized.named_parameters(
+        # One block per position of each beam.
+        ("beam", "beam", 2 * 5 * 8, 8),
+        # One block per position of each row, and a scratch block for each
+        # candidate token, also listed in the block table of its row.
+        ("contrastive", "contrastive", 2 * 8 + 2 * 5, 8 + 5),
+    )
+    def test_generate_shared_cache(self, sampler, num_blocks, num_columns):
+        self.causal_lm.compile(sampler=sampler)
+        token_ids = self.preprocessed_batch["token_ids"]
+        _, cache = self.causal_lm._build_cache(token_ids)
+        cache, block_table = self.causal_lm._build_shared_cache(cache)
+        self.assertEqual(tuple(cache[0].shape), (num_blocks, 2, 1, 2, 2))
+        self.assertEqual(tuple(block_table.shape), (2, num_columns))
+
+        prompts = [" airplane at airport", " airplane"]
+        outputs = self.causal_lm.generate(prompts)
+        # Sharing the cache through block tables should match copying the
+        # cache of each row.
+        self.causal_lm.compile(sampler=sampler)
+        with patch.object(
+            GPT2CausalLM, "_build_shared_cache", lambda self, x: (x, None)
+        ):
+            self.assertEqual(self.causal_lm.generate(prompts), outputs)
+
+    def test_generate_stream(self):
+        self.causal_lm.compile(sampler="greedy")
+        prompts = [" airplane at airport", " airplane"]
+        expected = self.causal_lm.generate(prompts)
+        chunks = list(self.causal_lm.generate_stream(prompts))
+        for i, (prompt, output) in enumerate(zip(prompts, expected)):
+            self.assertEqual(prompt + "".join(x[i] for x in chunks), output)
+        # Each step only detokenizes the new tokens, and a few previous ones.
+        postprocess = self.preprocessor.generate_postprocess
+        with patch.object(
+            self.preprocessor, "generate_postprocess", wraps=postprocess
+        ) as call:
+            list(self.causal_lm.generate_stream(prompts))
+        for args, _ in call.call_args_list:
+            self.assertLessEqual(args[0]["token_ids"].shape[1], 6)
+        # String input.
+        chunks = list(self.causal_lm.generate_stream(prompts[1]))
+        self.assertIsInstance(chunks[0], str)
+        self.assertEqual(prompts[1] + "".join(chunks), expected[1])
+        # Int tensor input.
+        self.causal_lm.preprocessor = None
+        expected = self.causal_lm.generate(self.preprocessed_batch)
+        chunks = list(self.causal_lm.generate_stream(self.preprocessed_batch))
+        padding_mask = self.preprocessed_batch["padding_mask"]
+        prompt_length = int(ops.sum(ops.cast(padding_mask[0], "int32")))
+        self.assertEqual(len(chunks), 8 - prompt_length)
+        token_ids = np.concatenate([x["token_ids"] for x in chunks], axis=1)
+        self.assertAllEqual(token_ids, expected["token_ids"][:, prompt_length:])
+
+    def test_generate_stream_errors(self):
+        self.causal_lm.compile(sampler="beam")
+        with self.assertRaises(ValueError):
+            self.causal_lm.generate_stream(" airplane")
+
+    def test_speculative_generate(self):
+        draft_backbone = GPT2Backbone(
+            vocabulary_size=self.preprocessor.tokenizer.vocabulary_size(),
+            num_layers=1,
+            num_heads=1,
+            hidden_dim=4,
+            intermediate_dim=4,
+            max_sequence_length=self.preprocessor.packer.sequence_length,
+        )
+        draft_lm = GPT2CausalLM(backbone=draft_backbone)
+        self.causal_lm.compile(sampler="greedy")
+        prompts = [" airplane at airport", " airplane"]
+        outputs = self.causal_lm.generate(
+            prompts, draft_model=draft_lm, num_draft_tokens=2
+        )
+        # Greedy speculative decoding should match plain greedy decoding.
+        self.assertEqual(self.causal_lm.generate(prompts), outputs)
+        # A self-drafting model should accept all proposals.
+        outputs = self.causal_lm.generate(
+            prompts, draft_model=self.causal_lm, num_draft_tokens=3
+        )
+        self.assertEqual(self.causal_lm.generate(prompts), outputs)
+        # Random samplers should generate within the prompt.
+        self.causal_lm.compile(sampler="top_k")
+        output = self.causal_lm.generate(prompts[0], draft_model=draft_lm)
+        self.assertTrue(prompts[0] in output)
+
+    def test_speculative_generate_errors(self):
+        draft_lm = GPT2CausalLM(backbone=self.backbone)
+        with self.assertRaisesRegex(ValueError, "num_draft_tokens"):
+            self.causal_lm.generate(
+                self.raw_batch, draft_model=draft_lm, num_draft_tokens=0
+            )
+        with self.assertRaisesRegex(ValueError, "max_length"):
+            self.causal_lm.generate(
+                self.raw_batch, draft_model=draft_lm, num_draft_tokens=8
+            )
+        self.causal_lm.compile(sampler="beam")
+        with self.assertRaisesRegex(ValueError, "BeamSampler"):
+            self.causal_lm.generate(self.raw_batch, draft_model=draft_lm)
+
+    def test_generate_with_prefix_cache(self):
+        self.causal_lm.compile(sampler="greedy")
+        prefix_cache = PrefixCache()
+        prompts = [" airplane at airport", " airplane at"]
+        expected = self.causal_lm.generate(prompts)
+        outputs = self.causal_lm.generate(prompts, prefix_cache=prefix_cache)
+        self.assertEqual(outputs, expected)
+        self.assertEqual(len(prefix_cache), 2)
+        # Reusing the stored states should not change outputs.
+        call_backbone = self.causal_lm._call_backbone_with_cache
+        with patch.object(
+            self.causal_lm, "_call_backbone_with_cache", wraps=call_backbone
+        ) as call:
+            outputs = self.causal_lm.generate(
+                prompts, prefix_cache=prefix_cache
+            )
+        self.assertEqual(outputs, expected)
+        # All prompts are stored, so no prefill forward pass runs.
+        for args, _ in call.call_args_list:
+            self.assertEqual(tuple(args[0].shape), (2, 1))
+
+    def test_generate_with_prefix_cache_per_row(self):
+        self.causal_lm.compile(sampler="greedy")
+        prefix_cache = PrefixCache(min_length=2)
+        self.causal_lm.generate(
+            " airplane at airport", prefix_cache=prefix_cache
+        )
+        # A prompt without a stored prefix does not stop other rows from
+        # reusing theirs.
+        prompts = [" airplane at airport airplane", " at"]
+        expected = self.causal_lm.generate(prompts)
+        call_backbone = self.causal_lm._call_backbone_with_cache
+        with patch.object(
+            self.causal_lm, "_call_backbone_with_cache", wraps=call_backbone
+        ) as call:
+            outputs = self.causal_lm.generate(
+                prompts, prefix_cache=prefix_cache
+            )
+        self.assertEqual(outputs, expected)
+        # The prefill only computes the longest span of new tokens of any row,
+        # rounded up to a power of two.
+        prefill_token_ids = call.call_args_list[0][0][0]
+        self.assertEqual(tuple(prefill_token_ids.shape), (2, 2))
+        self.assertEqual(len(prefix_cache), 3)
+
+    def test_build_cache_skips_logits(self):
+        token_ids = self.preprocessed_batch["token_ids"]
+        with patch.object(self.causal_lm, "call_with_cache") as call:
+            hidden_states, _ = self.causal_lm._build_cache(token_ids)
+        # The prefill should not project onto the vocabulary.
+        call.assert_not_called()
+        self.assertEqual(ops.shape(hidden_states), (2, 8, 4))
+
     def test_early_stopping(self):
         call_with_cache = self.causal_lm.call_with_cache
 
@@ -131,6 +308,146 @@ class GPT2CausalLMTest(TestCase):
             # We should immediately abort and output the prompt.
             self.assertEqual(prompt, output)
 
+    def test_generate_buckets(self):
+        inputs = self.preprocessor.generate_preprocess(
+            [" airplane", " airport"], sequence_length=5
+        )
+        self.causal_lm.compile(sampler="greedy")
+        self.causal_lm.preprocessor = None
+        expected = self.causal_lm.generate(inputs)
+        self.causal_lm.compile(
+            sampler="greedy",
+            batch_size_buckets=[4],
+            sequence_length_buckets=[8],
+            max_compiled_functions=1,
+        )
+        outputs = self.causal_lm.generate(inputs)
+        # Outputs are truncated back to the shape of the inputs.
+        self.assertAllEqual(outputs["token_ids"], expected["token_ids"])
+        self.assertAllEqual(outputs["padding_mask"], expected["padding_mask"])
+        # A single row pads to the same bucket, and reuses the function.
+        self.causal_lm.generate({k: v[:1] for k, v in inputs.items()})
+        stats = self.causal_lm.generate_cache_stats
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertGreater(stats["first_call_time"], 0.0)
+        # Shapes larger than all buckets are not padded.
+        large_batch = {
+            k: ops.concatenate([v, v, v], axis=0) for k, v in inputs.items()
+        }
+        self.causal_lm.generate(large_batch)
+        self.assertEqual(self.causal_lm.generate_cache_stats["misses"], 2)
+        self.assertEqual(len(self.causal_lm._generate_functions), 1)
+
+    def test_generate_buckets_errors(self):
+        with self.assertRaises(ValueError):
+            self.causal_lm.compile(batch_size_buckets=[])
+        with self.assertRaises(ValueError):
+            self.causal_lm.compile(sequence_length_buckets=[0, 8])
+        with self.assertRaises(ValueError):
+            self.causal_lm.compile(max_compiled_functions=0)
+
+    def test_warmup(self):
+        self.causal_lm.compile(sampler="greedy")
+        self.causal_lm.warmup([(2, 8)])
+        self.assertEqual(self.causal_lm.generate_cache_stats["misses"], 1)
+        self.causal_lm.generate([" airplane", " airport"])
+        self.assertEqual(self.causal_lm.generate_cache_stats["hits"], 1)
+        # Without a preprocessor, dummy token ids are used.
+        self.causal_lm.preprocessor = None
+        self.causal_lm.warmup([(3, 5)])
+        self.assertEqual(self.causal_lm.generate_cache_stats["misses"], 2)
+
+    @pytest.mark.skipif(
+        config.backend() == "torch",
+        reason="Exporting generation is not supported with torch.",
+    )
+    def test_export_generate_functions(self):
+        self.causal_lm.compile(sampler="greedy")
+        expected = self.causal_lm.generate([" airplane", " airport"])
+        path = os.path.join(self.get_temp_dir(), "generate")
+        self.causal_lm.export_generate_functions(path, [(2, 8)])
+        causal_lm = GPT2CausalLM(
+            backbone=self.backbone,
+            preprocessor=self.preprocessor,
+        )
+        causal_lm.compile(sampler="greedy")
+        causal_lm.load_generate_functions(path)
+        outputs = causal_lm.generate([" airplane", " airport"])
+        self.assertEqual(outputs, expected)
+        # The loaded function is used, and nothing is compiled.
+        stats = causal_lm.generate_cache_stats
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 0))
+
+    def test_generate_num_samples(self):
+        self.causal_lm.compile(sampler="greedy")
+        prompts = [" airplane", " airport"]
+        expected = self.causal_lm.generate(prompts)
+        build_cache = self.causal_lm._build_cache
+        with patch.object(
+            self.causal_lm, "_build_cache", wraps=build_cache
+        ) as mock:
+            outputs = self.causal_lm.generate(prompts, num_samples=3)
+        # The prompts are processed once, and each is decoded three times.
+        self.assertEqual(mock.call_args[0][0].shape[0], 2)
+        self.assertEqual(outputs, [expected[0]] * 3 + [expected[1]] * 3)
+        # A scalar input returns a list of samples.
+        self.causal_lm.compile(sampler="top_k")
+        outputs = self.causal_lm.generate(" airplane", num_samples=4)
+        self.assertEqual(len(outputs), 4)
+        for output in outputs:
+            self.assertTrue(output.startswith(" airplane"))
+
+    def test_generate_num_samples_errors(self):
+        with self.assertRaises(ValueError):
+            self.causal_lm.generate(" airplane", num_samples=0)
+        self.causal_lm.compile(sampler="beam")
+        with self.assertRaises(ValueError):
+            self.causal_lm.generate(" airplane", num_samples=2)
+
+    def test_generate_constraint(self):
+        # Only generate " airplane" or " airport", then the end token.
+        constraint = FiniteStateConstraint.from_sequences(
+            [[2, 3], [2, 5]],
+            vocabulary_size=self.preprocessor.tokenizer.vocabulary_size(),
+            end_token_id=self.preprocessor.tokenizer.end_token_id,
+        )
+        self.causal_lm.compile(sampler=TopKSampler(constraint=constraint))
+        outputs = self.causal_lm.generate([" airplane at"] * 4)
+        for output in outputs:
+            self.assertIn(
+                output, [" airplane at airplane", " airplane at airport"]
+            )
+        with self.assertRaises(ValueError):
+            self.causal_lm.generate_stream(" airplane")
+
+    @parameterized.named_parameters(
+        ("top_k", TopKSampler),
+        ("beam", BeamSampler),
+        ("contrastive", ContrastiveSampler),
+    )
+    def test_generate_penalties(self, sampler_cls):
+        self.causal_lm.compile(
+            sampler=sampler_cls(
+                repetition_penalty=1.5,
+                presence_penalty=0.5,
+                frequency_penalty=0.5,
+            )
+        )
+        outputs = self.causal_lm.generate([" airplane at", " airport"])
+        self.assertTrue(outputs[0].startswith(" airplane at"))
+        self.assertTrue(outputs[1].startswith(" airport"))
+
+    def test_generate_quantized(self):
+        self.causal_lm.compile(sampler="greedy")
+        prompt = " airplane at airport"
+        output = self.causal_lm.generate(prompt)
+        causal_lm = GPT2CausalLM(
+            backbone=self.causal_lm.backbone.quantize("int8"),
+            preprocessor=self.preprocessor,
+        )
+        causal_lm.compile(sampler="greedy")
+        self.assertEqual(causal_lm.generate(prompt), output)
+
     def test_generate_compilation(self):
         # Assert we do not recompile with successive calls.
         self.causal_lm.generate(self.raw_batch)
@@ -14,7 +14,13 @@
 
 from keras_nlp.backend import keras
 from keras_nlp.backend import ops
+from keras_nlp.layers.modeling.quantized_dense import build_dense
+from keras_nlp.layers.modeling.quantized_dense import get_quantization_mode
+from keras_nlp.layers.modeling.quantized_dense import quantize_sublayers_from
 from keras_nlp.layers.modeling.rotary_embedding import RotaryEmbedding
+from keras_nlp.layers.modeling.transformer_layer_utils import gather_paged_cache
+from keras_nlp.layers.modeling.transformer_layer_utils import update_cache
+from keras_nlp.layers.modeling.transformer_layer_utils import update_paged_cache
 from keras_nlp.utils.keras_utils import clone_initializer
 
 
@@ -41,6 +47,9 @@ class GPTNeoXAttention(keras.layers.Layer):
         rotary_max_wavelength: int. The maximum angular wavelength of the
             sine/cosine curves, for rotary embeddings.
         max_sequence_length: int. The maximum input sequence length.
+        quantization_mode: string. If `"int8"`, the layer builds int8 dense
+            layers for inference. Defaults to `None`, or the mode of the
+            enclosing quantization scope.
     """
 
     def __init__(
@@ -53,6 +62,7 @@ class GPTNeoXAttention(keras.layers.Layer):
         rotary_percentage=0.25,
         rotary_max_wavelength=10000,
         max_sequence_length=512,
+        quantization_mode=None,
         **kwargs,
     ):
         super().__init__(**kwargs)
@@ -64,21 +74,26 @@ class GPTNeoXAttention(keras.layers.Layer):
         self.rotary_max_wavelength = rotary_max_wavelength
         self.rotary_dim = int(self.attn_head_size * rotary_percentage)
         self.rotary_embedding_layer = RotaryEmbedding(
-            max_wavelength=rotary_max_wavelength
+            max_wavelength=rotary_max_wavelength,
+            max_sequence_length=max_sequence_length,
         )
         self.kernel_initializer = keras.initializers.get(kernel_initializer)
         self.bias_initializer = keras.initializers.get(bias_initializer)
         self.max_sequence_length = max_sequence_length
+        self.quantization_mode = get_quantization_mode(quantization_mode)
 
     def build(self, input_shape):
-        self._qkv_dense = keras.layers.EinsumDense(
-            equation="abc,cde->abde",
-            output_shape=(None, self.num_heads, 3 * self.attn_head_size),
-            bias_axes="de",
-            **self._get_common_kwargs_for_sublayer(use_bias=True),
-            name="query_key_value",
+        self._qkv_dense = build_dense(
+            keras.layers.EinsumDense(
+                equation="abc,cde->abde",
+                output_shape=(None, self.num_heads, 3 * self.attn_head_size),
+                bias_axes="de",
+                **self._get_common_kwargs_for_sublayer(use_bias=True),
+                name="query_key_value",
+            ),
+            input_shape,
+            self.quantization_mode,
         )
-        self._qkv_dense.build(input_shape)
 
         self._attn_dropout_layer = keras.layers.Dropout(
             self.dropout, name="attention_dropout"
@@ -87,15 +102,17 @@ class GPTNeoXAttention(keras.layers.Layer):
         self._softmax = keras.layers.Softmax(axis=-1, name="attention_softmax")
 
         # Output.
-        self._output_dense = keras.layers.EinsumDense(
-            equation="abc,cd->abd",
-            output_shape=(None, self.hidden_dim),
-            bias_axes="d",
-            **self._get_common_kwargs_for_sublayer(use_bias=True),
-            name="attention_output",
+        self._output_dense = build_dense(
+            keras.layers.EinsumDense(
+                equation="abc,cd->abd",
+                output_shape=(None, self.hidden_dim),
+                bias_axes="d",
+                **self._get_common_kwargs_for_sublayer(use_bias=True),
+                name="attention_output",
+            ),
+            input_shape,
+            self.quantization_mode,
         )
-
-        self._output_dense.build(input_shape)
         self.built = True
 
     def _get_common_kwargs_for_sublayer(self, use_bias=True):
@@ -144,33 +161,57 @@ class GPTNeoXAttention(keras.layers.Layer):
 
         return attention_output
 
+    def _apply_rotary_embedding(self, x, start_index):
+        x_rot, x_pass = x[..., : self.rotary_dim], x[..., self.rotary_dim :]
+        x_rot = self.rotary_embedding_layer(x_rot, start_index=start_index)
+        return ops.concatenate((x_rot, x_pass), axis=-1)
+
     def call(
         self,
         hidden_states,
         attention_mask=None,
         cache=None,
         cache_update_index=None,
+        cache_block_table=None,
         training=None,
     ):
         query_key_value = self._qkv_dense(hidden_states)
 
         query = query_key_value[..., : self.attn_head_size]
+        key = query_key_value[
+            ..., self.attn_head_size : 2 * self.attn_head_size
+        ]
+        value = query_key_value[..., 2 * self.attn_head_size :]
+
+        # Rotate the new queries and keys at their positions in the sequence.
+        # The cache holds rotated keys, so cached keys are never rotated again.
+        start_index = 0 if cache_update_index is None else cache_update_index
+        query = self._apply_rotary_embedding(query, start_index)
+        key = self._apply_rotary_embedding(key, start_index)
 
         if cache is not None:
-            key_cache = cache[:, 0, ...]
-            value_cache = cache[:, 1, ...]
-            if cache_update_index is None:
-                key = key_cache
-                value = value_cache
-            else:
-                key_update = query_key_value[
-                    ..., self.attn_head_size : 2 * self.attn_head_size
-                ]
-                value_update = query_key_value[..., 2 * self.attn_head_size :]
-                start = [0, cache_update_index, 0, 0]
-                key = ops.slice_update(key_cache, start, key_update)
-                value = ops.slice_update(value_cache, start, value_update)
-                cache = ops.stack((key, value), axis=1)
+            if cache_update_index is not None:
+                # Write keys and values with a single update of the cache, so
+                # we only touch the new entries, and never restack the cache.
+                update = ops.stack((key, value), axis=1)
+                if cache_block_table is None:
+                    cache = update_cache(
+                        cache, update, cache_update_index, axis=2
+                    )
+                else:
+                    cache = update_paged_cache(
+                        cache,
+                        update,
+                        cache_update_index,
+                        cache_block_table,
+                        axis=2,
+                    )
+            key = cache[:, 0, ...]
+            value = cache[:, 1, ...]
+            if cache_block_table is not None:
+                # Gather the blocks of each sequence into a dense view.
+                key = gather_paged_cache(key, cache_block_table)
+                value = gather_paged_cache(value, cache_block_table)
         else:
             if cache_update_index is not None:
                 raise ValueError(
@@ -178,25 +219,6 @@ class GPTNeoXAttention(keras.layers.Layer):
                     f"`None`. Received: cache={cache}, "
                     f"cache_update_index={cache_update_index}"
                 )
-            key = query_key_value[
-                ..., self.attn_head_size : 2 * self.attn_head_size
-            ]
-            value = query_key_value[..., 2 * self.attn_head_size :]
-
-        query_rot, query_pass = (
-            query[..., : self.rotary_dim],
-            query[..., self.rotary_dim :],
-        )
-        key_rot, key_pass = (
-            key[..., : self.rotary_dim],
-            key[..., self.rotary_dim :],
-        )
-
-        query_rot = self.rotary_embedding_layer(query_rot)
-        key_rot = self.rotary_embedding_layer(key_rot)
-
-        query = ops.concatenate((query_rot, query_pass), axis=-1)
-        key = ops.concatenate((key_rot, key_pass), axis=-1)
 
         attention_output = self._compute_attention(
             query=query,
@@ -220,6 +242,15 @@ class GPTNeoXAttention(keras.layers.Layer):
 
         return attention_output, cache
 
+    def quantize_from(self, layer):
+        """Set the weights of the quantized layer from a float `layer`.
+
+        Args:
+            layer: A built float `GPTNeoXAttention` layer with the same config
+                as this layer.
+        """
+        quantize_sublayers_from(self, layer, ["_qkv_dense", "_output_dense"])
+
     def get_config(self):
         config = super().get_config()
         config.update(
@@ -238,4 +269,6 @@ class GPTNeoXAttention(keras.layers.Layer):
                 "max_sequence_length": self.max_sequence_length,
             }
         )
+        if self.quantization_mode is not None:
+            config["quantization_mode"] = self.quantization_mode
         return config
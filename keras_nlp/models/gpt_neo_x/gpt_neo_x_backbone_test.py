@@ -84,6 +84,12 @@ class GPTNeoXTest(TestCase):
         restored_output = restored_model(self.input_batch)
         self.assertAllClose(model_output, restored_output)
 
+    def test_quantize(self):
+        model_output = self.backbone(self.input_batch)
+        quantized = self.backbone.quantize("int8")
+        quantized_output = quantized(self.input_batch)
+        self.assertAllClose(quantized_output, model_output, atol=0.1)
+
 
 @pytest.mark.tpu
 @pytest.mark.usefixtures("tpu_test_class")
@@ -114,6 +114,26 @@ class GPTNeoXCausalLMTest(TestCase):
             self.preprocessed_batch["padding_mask"][:, :5],
         )
 
+    def test_call_with_cache(self):
+        token_ids = self.preprocessed_batch["token_ids"]
+        padding_mask = ops.ones_like(token_ids, dtype="bool")
+        logits = self.causal_lm(
+            {"token_ids": token_ids, "padding_mask": padding_mask}
+        )
+        _, cache = self.causal_lm._build_cache(token_ids)
+        for index in range(1, 8):
+            # Decode each position from the cache, indexing all rows at once
+            # or each row separately.
+            for cache_update_index in (index, ops.array([index, index])):
+                step_logits, _, _ = self.causal_lm.call_with_cache(
+                    token_ids[:, index : index + 1],
+                    cache,
+                    cache_update_index,
+                )
+                self.assertAllClose(
+                    step_logits[:, 0, :], logits[:, index, :], atol=1e-5
+                )
+
     def test_early_stopping(self):
         call_with_cache = self.causal_lm.call_with_cache
 
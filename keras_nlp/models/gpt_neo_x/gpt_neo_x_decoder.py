@@ -14,6 +14,9 @@
 
 from keras_nlp.backend import keras
 from keras_nlp.backend import ops
+from keras_nlp.layers.modeling.quantized_dense import build_dense
+from keras_nlp.layers.modeling.quantized_dense import get_quantization_mode
+from keras_nlp.layers.modeling.quantized_dense import quantize_sublayers_from
 from keras_nlp.layers.modeling.transformer_layer_utils import (
     compute_causal_mask,
 )
@@ -54,6 +57,9 @@ class GPTNeoXDecoder(keras.layers.Layer):
              can consume. If `None`, `max_sequence_length` uses the value from
              sequence length. This determines the variable shape for positional
              embeddings.
+        quantization_mode: string. If `"int8"`, the layer builds int8
+            attention and feedforward dense layers for inference. Defaults to
+            `None`, or the mode of the enclosing quantization scope.
         name: string. The name of the layer.
     """
 
@@ -69,6 +75,7 @@ class GPTNeoXDecoder(keras.layers.Layer):
         rotary_percentage=0.25,
         rotary_max_wavelength=10000,
         max_sequence_length=512,
+        quantization_mode=None,
         **kwargs,
     ):
         super().__init__(**kwargs)
@@ -84,6 +91,7 @@ class GPTNeoXDecoder(keras.layers.Layer):
         self.bias_initializer = keras.initializers.get(bias_initializer)
         self.supports_masking = True
         self.rotary_percentage = rotary_percentage
+        self.quantization_mode = get_quantization_mode(quantization_mode)
         self._decoder_sequence_shape = None
 
     def build(self, decoder_sequence_shape):
@@ -99,6 +107,7 @@ class GPTNeoXDecoder(keras.layers.Layer):
             max_sequence_length=self.max_sequence_length,
             kernel_initializer=clone_initializer(self.kernel_initializer),
             bias_initializer=clone_initializer(self.bias_initializer),
+            quantization_mode=self.quantization_mode,
             name="self_attention",
         )
         self._self_attention_layer.build(decoder_sequence_shape)
@@ -115,25 +124,30 @@ class GPTNeoXDecoder(keras.layers.Layer):
         )
 
         # Feedforward layers.
-        self._feedforward_intermediate_dense = keras.layers.Dense(
-            self.intermediate_dim,
-            activation=self.activation,
-            kernel_initializer=clone_initializer(self.kernel_initializer),
-            bias_initializer=clone_initializer(self.bias_initializer),
-            name="feedforward_intermediate_dense",
-        )
-        self._feedforward_intermediate_dense.build(decoder_sequence_shape)
-
-        self._feedforward_output_dense = keras.layers.Dense(
-            hidden_dim,
-            kernel_initializer=clone_initializer(self.kernel_initializer),
-            bias_initializer=clone_initializer(self.bias_initializer),
-            name="feedforward_output_dense",
+        self._feedforward_intermediate_dense = build_dense(
+            keras.layers.Dense(
+                self.intermediate_dim,
+                activation=self.activation,
+                kernel_initializer=clone_initializer(self.kernel_initializer),
+                bias_initializer=clone_initializer(self.bias_initializer),
+                name="feedforward_intermediate_dense",
+            ),
+            decoder_sequence_shape,
+            self.quantization_mode,
         )
 
         intermediate_shape = list(decoder_sequence_shape)
         intermediate_shape[-1] = self.intermediate_dim
-        self._feedforward_output_dense.build(tuple(intermediate_shape))
+        self._feedforward_output_dense = build_dense(
+            keras.layers.Dense(
+                hidden_dim,
+                kernel_initializer=clone_initializer(self.kernel_initializer),
+                bias_initializer=clone_initializer(self.bias_initializer),
+                name="feedforward_output_dense",
+            ),
+            tuple(intermediate_shape),
+            self.quantization_mode,
+        )
 
         self._feedforward_layer_norm = keras.layers.LayerNormalization(
             epsilon=self.layer_norm_epsilon,
@@ -154,6 +168,7 @@ class GPTNeoXDecoder(keras.layers.Layer):
         decoder_attention_mask=None,
         self_attention_cache=None,
         self_attention_cache_update_index=None,
+        self_attention_cache_block_table=None,
     ):
         self_attention_mask = self._compute_self_attention_mask(
             decoder_sequence=decoder_sequence,
@@ -161,6 +176,7 @@ class GPTNeoXDecoder(keras.layers.Layer):
             decoder_attention_mask=decoder_attention_mask,
             self_attention_cache=self_attention_cache,
             self_attention_cache_update_index=self_attention_cache_update_index,
+            self_attention_cache_block_table=self_attention_cache_block_table,
         )
 
         residual = decoder_sequence
@@ -173,6 +189,7 @@ class GPTNeoXDecoder(keras.layers.Layer):
             attention_mask=self_attention_mask,
             cache=self_attention_cache,
             cache_update_index=self_attention_cache_update_index,
+            cache_block_table=self_attention_cache_block_table,
         )
         x = self._self_attention_dropout(x)
         attention_output = x
@@ -195,6 +212,7 @@ class GPTNeoXDecoder(keras.layers.Layer):
         decoder_attention_mask,
         self_attention_cache=None,
         self_attention_cache_update_index=None,
+        self_attention_cache_block_table=None,
     ):
         decoder_mask = merge_padding_and_attention_mask(
             decoder_sequence, decoder_padding_mask, decoder_attention_mask
@@ -206,6 +224,10 @@ class GPTNeoXDecoder(keras.layers.Layer):
         # generally be length 1, and `cache` will be the full generation length.
         if self_attention_cache is not None:
             input_length = ops.shape(self_attention_cache)[2]
+            if self_attention_cache_block_table is not None:
+                # A paged cache has one block of positions per table entry.
+                num_blocks = ops.shape(self_attention_cache_block_table)[1]
+                input_length = input_length * num_blocks
 
         causal_mask = compute_causal_mask(
             batch_size,
@@ -221,6 +243,23 @@ class GPTNeoXDecoder(keras.layers.Layer):
             else causal_mask
         )
 
+    def quantize_from(self, layer):
+        """Set the weights of the quantized layer from a float `layer`.
+
+        Args:
+            layer: A built float `GPTNeoXDecoder` layer with the same config
+                as this layer.
+        """
+        quantize_sublayers_from(
+            self,
+            layer,
+            [
+                "_self_attention_layer",
+                "_feedforward_intermediate_dense",
+                "_feedforward_output_dense",
+            ],
+        )
+
     def get_config(self):
         config = super().get_config()
         config.update(
@@ -242,6 +281,8 @@ class GPTNeoXDecoder(keras.layers.Layer):
                 "decoder_sequence_shape": self._decoder_sequence_shape,
             }
         )
+        if self.quantization_mode is not None:
+            config["quantization_mode"] = self.quantization_mode
         return config
 
     def compute_output_shape(self, decoder_sequence_shape):
@@ -24,6 +24,7 @@ from keras_nlp.models.opt.opt_causal_lm_preprocessor import (
 )
 from keras_nlp.models.opt.opt_presets import backbone_presets
 from keras_nlp.utils.python_utils import classproperty
+from keras_nlp.utils.tensor_utils import shift_sequences
 
 
 @keras_nlp_export("keras_nlp.models.OPTCausalLM")
@@ -196,6 +197,7 @@ class OPTCausalLM(GenerativeTask):
         token_ids,
         cache,
         cache_update_index,
+        cache_block_table=None,
     ):
         """Forward pass of `OPTCausalLM` with cache.
 
@@ -206,9 +208,17 @@ class OPTCausalLM(GenerativeTask):
 
         Args:
             token_ids: a dense int Tensor with shape `(batch_size, max_length)`.
-            cache: a dense float Tensor, the cache of key and value.
-            cache_update_index: int, or int Tensor. The index of current inputs in the
-                whole sequence.
+            cache: a tuple of dense float Tensors, the key/value cache of
+                each decoder layer, with shape
+                `(batch_size, 2, max_length, num_heads, head_dim)`.
+            cache_update_index: int, or int Tensor. The index of current inputs
+                in the whole sequence. An int Tensor of shape `(batch_size,)`
+                will index each sequence in the batch separately.
+            cache_block_table: an optional int Tensor with shape
+                `(batch_size, max_num_blocks)`. If set, `cache` is a paged
+                cache, a pool of fixed size blocks shared by all sequences,
+                and `cache_block_table` holds the blocks of each sequence. See
+                `keras_nlp.layers.CachedMultiHeadAttention`.
 
         Returns:
             A (logits, hidden_states, cache) tuple. Where `logits` is the
@@ -216,42 +226,107 @@ class OPTCausalLM(GenerativeTask):
             the final hidden representation of the input tokens, and `cache` is
             the decoding cache.
         """
+        hidden_states, cache = self._call_backbone_with_cache(
+            token_ids,
+            cache,
+            cache_update_index,
+            cache_block_table,
+        )
+        logits = self.backbone.token_embedding(hidden_states, reverse=True)
+        return logits, hidden_states, cache
+
+    def _call_backbone_with_cache(
+        self,
+        token_ids,
+        cache,
+        cache_update_index,
+        cache_block_table=None,
+    ):
+        """Forward pass with cache, without the language modeling head."""
         x = self.backbone.get_layer("embeddings")(
             token_ids, start_index=cache_update_index
         )
-        # Each decoder layer has a cache; we update them separately.
+        # Each decoder layer has a separate cache buffer, which is updated in
+        # place without copying the caches of other layers.
         caches = []
         for i in range(self.backbone.num_layers):
-            current_cache = cache[:, i, ...]
+            current_cache = cache[i]
             x, next_cache = self.backbone.get_layer(f"transformer_layer_{i}")(
                 x,
                 self_attention_cache=current_cache,
                 self_attention_cache_update_index=cache_update_index,
+                self_attention_cache_block_table=cache_block_table,
             )
             caches.append(next_cache)
-        cache = ops.stack(caches, axis=1)
-        x = self.backbone.get_layer("layer_norm")(x)
-        hidden_states = x
-        logits = self.backbone.token_embedding(hidden_states, reverse=True)
-        return logits, hidden_states, cache
+        cache = tuple(caches)
+        hidden_states = self.backbone.get_layer("layer_norm")(x)
+        return hidden_states, cache
 
-    def _build_cache(self, token_ids):
-        """Build an empty cache for use with `call_with_cache()`."""
+    def _build_cache(self, token_ids, cached_prefix=None):
+        """Build an empty cache for use with `call_with_cache()`.
+
+        If `cached_prefix` is set, it should be a
+        `(cache, hidden_states, start_index)` tuple holding the first
+        positions of a previously built cache, with shapes
+        `(batch_size, 2, prefix_length, num_heads, head_dim)` for each layer
+        and `(batch_size, prefix_length, hidden_dim)`. Only the first
+        `start_index` positions of each row are valid, with
+        `start_index <= prefix_length`. The next
+        `max_length - prefix_length` positions of each row are computed.
+        """
         batch_size = ops.shape(token_ids)[0]
         max_length = ops.shape(token_ids)[1]
         num_layers = self.backbone.num_layers
         num_heads = self.backbone.num_heads
         head_dim = self.backbone.hidden_dim // self.backbone.num_heads
-        shape = [batch_size, num_layers, 2, max_length, num_heads, head_dim]
-        cache = ops.zeros(shape, dtype=self.compute_dtype)
-        # Seed the cache.
-        _, hidden_states, cache = self.call_with_cache(token_ids, cache, 0)
+        shape = [batch_size, 2, max_length, num_heads, head_dim]
+        cache = tuple(
+            ops.zeros(shape, dtype=self.compute_dtype)
+            for _ in range(num_layers)
+        )
+        start_index = 0
+        if cached_prefix is not None:
+            prefix_cache, prefix_hidden_states, start_index = cached_prefix
+            prefix_length = ops.shape(prefix_hidden_states)[1]
+            cache = tuple(
+                ops.slice_update(x, [0, 0, 0, 0, 0], ops.cast(y, x.dtype))
+                for x, y in zip(cache, prefix_cache)
+            )
+            prefix_hidden_states = ops.cast(
+                prefix_hidden_states, self.compute_dtype
+            )
+            if prefix_length == max_length:
+                return prefix_hidden_states, cache
+            # Compute the same number of positions in each row, starting at
+            # the first position not stored for the row.
+            start_index = ops.cast(start_index, "int32")
+            token_ids = shift_sequences(token_ids, start_index)
+            token_ids = token_ids[:, : max_length - prefix_length]
+        # Seed the cache. We skip the vocabulary projection, as the prompt
+        # logits are never used.
+        hidden_states, cache = self._call_backbone_with_cache(
+            token_ids, cache, start_index
+        )
+        if cached_prefix is not None:
+            # Place the computed states of each row after its stored states.
+            padding = [[0, 0], [0, prefix_length], [0, 0]]
+            hidden_states = ops.pad(hidden_states, padding)
+            hidden_states = shift_sequences(hidden_states, -start_index)
+            padding = [[0, 0], [0, max_length - prefix_length], [0, 0]]
+            prefix_hidden_states = ops.pad(prefix_hidden_states, padding)
+            positions = ops.arange(max_length, dtype="int32")[None, :, None]
+            is_stored = positions < start_index[:, None, None]
+            hidden_states = ops.where(
+                is_stored, prefix_hidden_states, hidden_states
+            )
         return hidden_states, cache
 
     def generate_step(
         self,
         inputs,
         end_token_id=None,
+        cached_prefix=None,
+        num_samples=1,
     ):
         """A compilable generation function for a single batch of inputs.
 
@@ -265,40 +340,110 @@ class OPTCausalLM(GenerativeTask):
             end_token_id: The id of the end token to stop on. If all
                 sequences have produced a new `end_token_id`, generation
                 will stop.
+            cached_prefix: Optional. The states of the first positions of
+                the cache, computed by a previous call to `_build_cache()`.
+            num_samples: int. The number of sequences to generate for each
+                input, decoded from the cache of a single forward pass over
+                the inputs. The outputs hold the sequences of each input in
+                consecutive rows.
         """
         token_ids, padding_mask = inputs["token_ids"], inputs["padding_mask"]
         # Create and seed cache with a single forward pass.
-        hidden_states, cache = self._build_cache(token_ids)
+        hidden_states, cache = self._build_cache(token_ids, cached_prefix)
         # Compute the lengths of all user inputted tokens ids.
         row_lengths = ops.sum(ops.cast(padding_mask, "int32"), axis=-1)
         # Start at the first index that has no user inputted id.
         index = ops.min(row_lengths)
+        # The whole prompt of each row is already in the cache. Shift rows with
+        # longer prompts to the left, so the first generated position of every
+        # row lines up with `index`, and offset their cache index instead.
+        max_length = ops.shape(token_ids)[1]
+        offsets = ops.cast(row_lengths - index, "int32")
+        prompt = shift_sequences(token_ids, offsets)
+        mask = shift_sequences(padding_mask, offsets, fill_value=True)
+        hidden_states = shift_sequences(hidden_states, offsets)
+        # Decode each prompt `num_samples` times from the same prompt cache.
+        (
+            token_ids,
+            padding_mask,
+            prompt,
+            mask,
+            hidden_states,
+            offsets,
+            cache,
+        ) = self._repeat_samples(
+            (
+                token_ids,
+                padding_mask,
+                prompt,
+                mask,
+                hidden_states,
+                offsets,
+                cache,
+            ),
+            num_samples,
+        )
+        # Beam and contrastive search repeat and reorder rows through a block
+        # table, instead of copying the cache of each row.
+        batch_size = ops.shape(token_ids)[0]
+        cache, block_table = self._build_shared_cache(cache)
+        use_block_table = block_table is not None
 
         def next(prompt, cache, index):
-            # The cache index is the index of our previous token.
-            cache_update_index = index - 1
-            batch_size = ops.shape(prompt)[0]
-            prompt = ops.slice(prompt, [0, cache_update_index], [batch_size, 1])
+            # Per-row state is passed through the cache, as samplers may
+            # repeat or drop rows along the batch axis (e.g. for beams). A
+            # shared pool of cache blocks is passed along with it.
+            if use_block_table:
+                (row_offsets, block_table), cache = cache
+            else:
+                cache, row_offsets = cache
+                block_table = None
+            num_samples = ops.shape(prompt)[0]
+            # The cache index is the index of our previous token in each row.
+            cache_update_index = ops.minimum(
+                index - 1 + row_offsets, max_length - 1
+            )
+            prompt = ops.slice(prompt, [0, index - 1], [num_samples, 1])
+            if use_block_table:
+                block_table = self._update_block_table(
+                    block_table, cache_update_index, batch_size
+                )
             logits, hidden_states, cache = self.call_with_cache(
                 prompt,
                 cache,
                 cache_update_index,
+                None if block_table is None else block_table[:, :max_length],
             )
+            if use_block_table:
+                cache = ((row_offsets, block_table), cache)
+            else:
+                cache = (cache, row_offsets)
             return (
                 ops.squeeze(logits, axis=1),
                 ops.squeeze(hidden_states, axis=1),
                 cache,
             )
 
-        token_ids = self._sampler(
+        if use_block_table:
+            # The pool is shared by all rows, which only own block tables.
+            sampler_kwargs = {
+                "cache": (offsets, block_table),
+                "shared_cache": cache,
+            }
+        else:
+            sampler_kwargs = {"cache": (cache, offsets)}
+        prompt = self._sampler(
             next=next,
-            prompt=token_ids,
-            cache=cache,
+            prompt=prompt,
             index=index,
-            mask=padding_mask,
+            mask=mask,
             end_token_id=end_token_id,
             hidden_states=hidden_states,
+            **sampler_kwargs,
         )
+        # Shift the generated tokens back after each row's prompt.
+        generated = shift_sequences(prompt, -offsets)
+        token_ids = ops.where(padding_mask, token_ids, generated)
 
         # Compute an output padding mask with the token ids we updated.
         if end_token_id is not None:
@@ -0,0 +1,136 @@
+# Copyright 2023 The KerasNLP Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+
+import numpy as np
+
+from keras_nlp.api_export import keras_nlp_export
+
+
+@keras_nlp_export("keras_nlp.models.PrefixCache")
+class PrefixCache:
+    """A least recently used cache of prompt key/value states.
+
+    Prompts often share a long common prefix, such as a system prompt or a
+    few-shot template. When passed to `GenerativeTask.generate()`, this cache
+    stores the key/value cache of every prompt after its prefill pass. Later
+    prompts sharing a prefix with a stored prompt copy the stored key/value
+    states of the shared tokens, and only run the prefill forward pass on their
+    remaining tokens.
+
+    As attention is causal, the key/value states of the first `n` tokens of a
+    prompt only depend on those `n` tokens. A stored prompt can therefore seed
+    any prompt it shares a prefix with, not only prompts it is a prefix of.
+    States are stored on the host as numpy arrays. Once the stored states
+    exceed `max_bytes`, the least recently used prompts are evicted.
+
+    Args:
+        max_bytes: int. The maximum total size of all stored states, in bytes.
+            Defaults to `2**30` (1 GiB).
+        min_length: int. The minimum number of shared tokens to reuse a stored
+            prompt. Defaults to `1`.
+
+    Examples:
+    ```python
+    gpt2_lm = keras_nlp.models.GPT2CausalLM.from_preset("gpt2_base_en")
+    prefix_cache = keras_nlp.models.PrefixCache(max_bytes=2**28)
+    system_prompt = "You are a helpful assistant. "
+    gpt2_lm.generate(system_prompt + "Hello!", prefix_cache=prefix_cache)
+    # Only the tokens after the system prompt are prefilled.
+    gpt2_lm.generate(system_prompt + "Bonjour!", prefix_cache=prefix_cache)
+    ```
+    """
+
+    def __init__(
+        self,
+        max_bytes=2**30,
+        min_length=1,
+    ):
+        self.max_bytes = max_bytes
+        self.min_length = min_length
+        self._entries = collections.OrderedDict()
+        self._num_bytes = 0
+
+    @property
+    def num_bytes(self):
+        """The total size of all stored states, in bytes."""
+        return self._num_bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, token_ids):
+        key = tuple(int(x) for x in np.asarray(token_ids))
+        return key in self._entries
+
+    def lookup(self, token_ids):
+        """Find the stored prompt sharing the longest prefix with `token_ids`.
+
+        Args:
+            token_ids: A 1D int array, the unpadded token ids of a prompt.
+
+        Returns:
+            A `(length, states)` tuple. `length` is the number of leading
+            tokens shared with the best stored prompt, or `0` if no stored
+            prompt shares at least `min_length` tokens. `states` is the
+            `(cache, hidden_states)` tuple stored for that prompt, or `None`.
+            Only the first `length` positions of `states` are valid for
+            `token_ids`.
+        """
+        token_ids = np.asarray(token_ids)
+        best_length, best_key = 0, None
+        for key in self._entries:
+            length = min(len(key), len(token_ids))
+            mismatches = np.asarray(key[:length]) != token_ids[:length]
+            if np.any(mismatches):
+                length = int(np.argmax(mismatches))
+            if length > best_length:
+                best_length, best_key = length, key
+        if best_length < self.min_length:
+            return 0, None
+        # Mark the entry as most recently used.
+        self._entries.move_to_end(best_key)
+        return best_length, self._entries[best_key]
+
+    def insert(self, token_ids, cache, hidden_states):
+        """Store the states of a prompt.
+
+        Args:
+            token_ids: A 1D int array, the unpadded token ids of a prompt.
+            cache: A tuple with the key/value cache of each decoder layer,
+                each with shape `(2, prompt_length, num_heads, head_dim)`.
+            hidden_states: The final hidden states of the prompt, with shape
+                `(prompt_length, hidden_dim)`.
+        """
+        key = tuple(int(x) for x in np.asarray(token_ids))
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+        cache = tuple(np.asarray(x) for x in cache)
+        hidden_states = np.asarray(hidden_states)
+        num_bytes = sum(x.nbytes for x in cache) + hidden_states.nbytes
+        if num_bytes > self.max_bytes:
+            return
+        self._entries[key] = (cache, hidden_states)
+        self._num_bytes += num_bytes
+        while self._num_bytes > self.max_bytes:
+            _, (cache, hidden_states) = self._entries.popitem(last=False)
+            self._num_bytes -= sum(x.nbytes for x in cache)
+            self._num_bytes -= hidden_states.nbytes
+
+    def clear(self):
+        """Remove all stored prompts."""
+        self._entries.clear()
+        self._num_bytes = 0
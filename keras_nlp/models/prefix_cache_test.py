@@ -0,0 +1,63 @@
+# Copyright 2023 The KerasNLP Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+
+from keras_nlp.models.prefix_cache import PrefixCache
+from keras_nlp.tests.test_case import TestCase
+
+
+class PrefixCacheTest(TestCase):
+    def states(self, length):
+        # Two layers of key/value states, and the final hidden states.
+        cache = tuple(np.ones((2, length, 2, 4), "float32") for _ in range(2))
+        hidden_states = np.ones((length, 8), "float32")
+        return cache, hidden_states
+
+    def test_lookup_longest_prefix(self):
+        prefix_cache = PrefixCache()
+        prefix_cache.insert([1, 2, 3], *self.states(3))
+        prefix_cache.insert([1, 2, 3, 4, 5], *self.states(5))
+        # A stored prompt seeds prompts it shares a prefix with.
+        length, (cache, _) = prefix_cache.lookup([1, 2, 3, 4, 6, 7])
+        self.assertEqual(length, 4)
+        self.assertEqual(cache[0].shape, (2, 5, 2, 4))
+        length, _ = prefix_cache.lookup([1, 2])
+        self.assertEqual(length, 2)
+        self.assertEqual(prefix_cache.lookup([2, 3]), (0, None))
+
+    def test_min_length(self):
+        prefix_cache = PrefixCache(min_length=3)
+        prefix_cache.insert([1, 2, 3], *self.states(3))
+        self.assertEqual(prefix_cache.lookup([1, 2, 4]), (0, None))
+        self.assertEqual(prefix_cache.lookup([1, 2, 3])[0], 3)
+
+    def test_evict_least_recently_used(self):
+        # Each prompt of length 2 takes 320 bytes.
+        prefix_cache = PrefixCache(max_bytes=700)
+        prefix_cache.insert([1, 2], *self.states(2))
+        prefix_cache.insert([3, 4], *self.states(2))
+        self.assertEqual(prefix_cache.num_bytes, 640)
+        # Use the first prompt, so the second prompt is evicted.
+        prefix_cache.lookup([1, 2])
+        prefix_cache.insert([5, 6], *self.states(2))
+        self.assertEqual(len(prefix_cache), 2)
+        self.assertEqual(prefix_cache.lookup([3, 4]), (0, None))
+        self.assertEqual(prefix_cache.lookup([1, 2])[0], 2)
+        # States larger than the budget are never stored.
+        prefix_cache.insert([7] * 8, *self.states(8))
+        self.assertEqual(prefix_cache.lookup([7] * 8), (0, None))
+        prefix_cache.clear()
+        self.assertEqual(len(prefix_cache), 0)
+        self.assertEqual(prefix_cache.num_bytes, 0)
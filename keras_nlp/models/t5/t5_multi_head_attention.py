@@ -13,9 +13,9 @@
 # limitations under the License.
 
 import tensorflow as tf
-from tensorflow.compiler.tf2xla.python.xla import dynamic_slice
 
 from keras_nlp.backend import keras
+from keras_nlp.layers.modeling.transformer_layer_utils import update_cache
 
 
 def shape_list(tensor):
@@ -179,42 +179,19 @@ class T5MultiHeadAttention(keras.layers.Layer):
         mask=None,
         key_value_states=None,
         position_bias=None,
-        past_key_value=None,
+        cache=None,
+        cache_update_index=None,
         layer_head_mask=None,
-        query_length=None,
         training=False,
     ):
         # Input is (batch_size, query_length, dim)
-        # past_key_value[0] is (batch_size, num_heads, q_len - 1, dim_per_head)
+        # cache is (batch_size, 2, key_length, num_heads, dim_per_head)
         batch_size, seq_length = shape_list(hidden_states)[:2]
 
-        real_seq_length = seq_length
-
-        if past_key_value is not None:
-            if len(past_key_value) != 2:
-                raise ValueError(
-                    f"Argument `past_key_value` should have 2 past states: "
-                    f"keys and values. Got {len(past_key_value)} past states."
-                )
-            real_seq_length += (
-                shape_list(past_key_value[0])[2]
-                if query_length is None
-                else query_length
-            )
-
-        key_length = (
-            real_seq_length
-            if key_value_states is None
-            else shape_list(key_value_states)[1]
-        )
-
         def shape(hidden_states):
-            return tf.transpose(
-                tf.reshape(
-                    hidden_states,
-                    (batch_size, -1, self.num_heads, self.key_value_dim),
-                ),
-                perm=(0, 2, 1, 3),
+            return tf.reshape(
+                hidden_states,
+                (batch_size, -1, self.num_heads, self.key_value_dim),
             )
 
         def unshape(hidden_states):
@@ -223,80 +200,54 @@ class T5MultiHeadAttention(keras.layers.Layer):
                 (batch_size, -1, self.inner_dim),
             )
 
-        def project(
-            hidden_states, proj_layer, key_value_states, past_key_value
-        ):
-            """projects hidden states correctly to key/query states"""
-            if key_value_states is None:
-                # self-attention
-                # (batch_size, num_heads, seq_length, dim_per_head)
-                hidden_states = shape(proj_layer(hidden_states))
-            elif past_key_value is None:
-                # cross-attention
-                # (batch_size, num_heads, seq_length, dim_per_head)
-                hidden_states = shape(proj_layer(key_value_states))
-
-            if past_key_value is not None:
-                if key_value_states is None:
-                    # self-attention
-                    # (batch_size, num_heads, key_length, dim_per_head)
-                    hidden_states = tf.concat(
-                        [past_key_value, hidden_states], axis=2
-                    )
-                else:
-                    # cross-attention
-                    hidden_states = past_key_value
-            return hidden_states
-
         # get query
-        query_states = shape(
-            self.query_projector(hidden_states)
+        query_states = tf.transpose(
+            shape(self.query_projector(hidden_states)), perm=(0, 2, 1, 3)
         )  # (batch_size, num_heads, query_length, dim_per_head)
 
         # get key/value
-        key_states = project(
-            hidden_states,
-            self.key_projector,
-            key_value_states,
-            past_key_value[0] if past_key_value is not None else None,
-        )
-        value_states = project(
-            hidden_states,
-            self.value_projector,
-            key_value_states,
-            past_key_value[1] if past_key_value is not None else None,
-        )
+        # (batch_size, key_length, num_heads, dim_per_head)
+        if cache is not None and cache_update_index is None:
+            # Reuse a previously computed cache, e.g. the cross-attention
+            # keys and values of the encoder outputs.
+            key_states = cache[:, 0, ...]
+            value_states = cache[:, 1, ...]
+        else:
+            if key_value_states is None:
+                key_value_states = hidden_states
+            key_states = shape(self.key_projector(key_value_states))
+            value_states = shape(self.value_projector(key_value_states))
+            if cache is not None:
+                cache = update_cache(
+                    cache,
+                    tf.stack((key_states, value_states), axis=1),
+                    cache_update_index,
+                    axis=2,
+                )
+                key_states = cache[:, 0, ...]
+                value_states = cache[:, 1, ...]
+        key_length = shape_list(key_states)[1]
 
         scores = tf.einsum(
-            "bnqd,bnkd->bnqk", query_states, key_states
+            "bnqd,bknd->bnqk", query_states, key_states
         )  # (batch_size, num_heads, query_length, key_length)
 
         if position_bias is None:
             if not self.use_relative_attention_bias:
                 position_bias = tf.zeros(
-                    (1, self.num_heads, real_seq_length, key_length),
+                    (1, self.num_heads, seq_length, key_length),
                     self.compute_dtype,
                 )
+            elif cache_update_index is None:
+                position_bias = self.compute_bias(seq_length, key_length)
             else:
-                position_bias = self.compute_bias(real_seq_length, key_length)
-
-            # if key and values are already calculated we want only
-            # the last query position bias
-            if past_key_value is not None:
-                if not self.use_relative_attention_bias:
-                    position_bias = position_bias[:, :, -seq_length:, :]
-                else:
-                    # we might have a padded past structure,
-                    # in which case we want to fetch the position bias slice
-                    # right after the most recently filled past index
-                    most_recently_filled_past_index = tf.reduce_max(
-                        tf.where(past_key_value[0][0, 0, :, 0] != 0.0)
-                    )
-                    position_bias = dynamic_slice(
-                        position_bias,
-                        (0, 0, most_recently_filled_past_index + 1, 0),
-                        (1, self.num_heads, seq_length, real_seq_length),
-                    )
+                # Queries start at `cache_update_index`, so we slice their
+                # rows out of the bias of all positions in the cache.
+                position_bias = tf.slice(
+                    self.compute_bias(key_length, key_length),
+                    (0, 0, cache_update_index, 0),
+                    (1, self.num_heads, seq_length, key_length),
+                )
 
             if mask is not None:
                 # Add a new mask axis for the head dim.
@@ -317,9 +268,11 @@ class T5MultiHeadAttention(keras.layers.Layer):
         if layer_head_mask is not None:
             weights = tf.reshape(layer_head_mask, (1, -1, 1, 1)) * weights
 
-        attention_output = tf.matmul(
-            weights, value_states
+        attention_output = tf.einsum(
+            "bnqk,bknd->bnqd", weights, value_states
         )  # (batch_size, num_heads, query_length, dim_per_head)
 
         attention_output = self.output_projector(unshape(attention_output))
+        if cache is not None:
+            return (attention_output, position_bias, cache)
         return (attention_output, position_bias)
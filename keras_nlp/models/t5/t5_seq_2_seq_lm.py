@@ -0,0 +1,517 @@
+# Copyright 2023 The KerasNLP Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from keras_nlp.api_export import keras_nlp_export
+from keras_nlp.backend import keras
+from keras_nlp.backend import ops
+from keras_nlp.layers.modeling.transformer_layer_utils import (
+    compute_causal_mask,
+)
+from keras_nlp.models.generative_task import GenerativeTask
+from keras_nlp.models.t5.t5_backbone import T5Backbone
+from keras_nlp.utils.python_utils import classproperty
+
+
+@keras_nlp_export("keras_nlp.models.T5Seq2SeqLM")
+class T5Seq2SeqLM(GenerativeTask):
+    """An end-to-end T5 model for seq2seq language modeling.
+
+    A seq2seq language model (LM) is an encoder-decoder model which is used for
+    conditional text generation. The encoder is given a "context" text (fed to
+    the encoder), and the decoder predicts the next token based on both the
+    encoder inputs and the previous tokens. You can finetune `T5Seq2SeqLM` to
+    generate text for any seq2seq task (e.g., translation or summarization).
+
+    This model has a `generate()` method, which generates text based on
+    encoder inputs and an optional prompt for the decoder. The generation
+    strategy used is controlled by an additional `sampler` argument passed to
+    `compile()`. You can recompile the model with different `keras_nlp.samplers`
+    objects to control the generation. By default, `"top_k"` sampling will be
+    used.
+
+    Generation is done with key/value caches. The keys and values of the
+    encoder outputs are projected once for each decoder layer, and the
+    relative position bias of the decoder is computed once for the maximum
+    decoder length, then sliced for each generated token.
+
+    This model does not come with a preprocessor yet, so inputs should be
+    tokenized, e.g. with `keras_nlp.models.T5Tokenizer`, before calling the
+    model, and `generate()` fills the whole decoder sequence. T5 starts
+    decoding from the padding token (id `0`).
+
+    Args:
+        backbone: A `keras_nlp.models.T5Backbone` instance.
+        preprocessor: A preprocessor layer or `None`. If `None`, this model
+            will not apply preprocessing, and inputs should be preprocessed
+            before calling the model.
+
+    Examples:
+
+    Use `generate()` on token ids, with encoder inputs and a decoder prompt
+    holding the start token. Use `"decoder_padding_mask"` to indicate values
+    that should not be overridden.
+    ```python
+    prompt = {
+        "encoder_token_ids": np.array([[21603, 10, 37, 1704, 1]]),
+        "encoder_padding_mask": np.array([[1, 1, 1, 1, 1]]),
+        "decoder_token_ids": np.array([[0, 0, 0, 0, 0, 0, 0, 0]]),
+        "decoder_padding_mask": np.array([[1, 0, 0, 0, 0, 0, 0, 0]]),
+    }
+    backbone = keras_nlp.models.T5Backbone(
+        vocabulary_size=32128,
+        num_layers=6,
+        num_heads=8,
+        hidden_dim=512,
+        intermediate_dim=2048,
+    )
+    t5_lm = keras_nlp.models.T5Seq2SeqLM(backbone=backbone)
+    t5_lm.generate(prompt)
+    ```
+
+    Call `fit()` on a single batch.
+    ```python
+    x = {
+        "encoder_token_ids": np.array([[21603, 10, 37, 1704, 1]] * 2),
+        "encoder_padding_mask": np.array([[1, 1, 1, 1, 1]] * 2),
+        "decoder_token_ids": np.array([[0, 37, 1704, 1, 0]] * 2),
+        "decoder_padding_mask": np.array([[1, 1, 1, 1, 0]] * 2),
+    }
+    y = np.array([[37, 1704, 1, 0, 0]] * 2)
+    sw = np.array([[1, 1, 1, 0, 0]] * 2)
+
+    t5_lm = keras_nlp.models.T5Seq2SeqLM(backbone=backbone)
+    t5_lm.fit(x=x, y=y, sample_weight=sw, batch_size=2)
+    ```
+    """
+
+    def __init__(
+        self,
+        backbone,
+        preprocessor=None,
+        **kwargs,
+    ):
+        inputs = backbone.input
+        hidden_states = backbone(inputs)["decoder_sequence_output"]
+        outputs = backbone.token_embedding(hidden_states, reverse=True)
+
+        # Instantiate using Functional API Model constructor.
+        super().__init__(
+            inputs=inputs,
+            outputs=outputs,
+            include_preprocessing=preprocessor is not None,
+            **kwargs,
+        )
+
+        self.backbone = backbone
+        self.preprocessor = preprocessor
+        self.generate_function = None
+        self._sampler = None
+
+        # Default compilation
+        self.compile(
+            loss=keras.losses.SparseCategoricalCrossentropy(from_logits=True),
+            optimizer=keras.optimizers.Adam(2e-5),
+            metrics=[keras.metrics.SparseCategoricalAccuracy()],
+            jit_compile=True,
+        )
+
+    @classproperty
+    def backbone_cls(cls):
+        return T5Backbone
+
+    def compute_decoder_position_bias(self, length):
+        """Computes the relative position bias of the decoder.
+
+        T5 shares the relative position bias of the first decoder layer
+        across all decoder layers. The bias only depends on the query and key
+        positions, so for generation it is computed once for all positions,
+        and the rows of the positions being decoded are sliced out at each
+        step.
+
+        Args:
+            length: an int or int Tensor. The maximum decoder length.
+
+        Returns:
+            A dense float Tensor of shape `(1, num_heads, length, length)`.
+        """
+        layer = self.backbone.get_layer("transformer_decoder_layer_0")
+        return layer.self_attention.compute_bias(length, length)
+
+    def call_decoder_with_cache(
+        self,
+        encoder_hidden_states,
+        encoder_padding_mask,
+        decoder_token_ids,
+        self_attention_cache=None,
+        self_attention_cache_update_index=None,
+        cross_attention_cache=None,
+        cross_attention_cache_update_index=None,
+        position_bias=None,
+    ):
+        """Forward pass with a key/value caches for generative decoding.
+
+        `call_decoder_with_cache` adds an additional inference-time forward pass
+        for the model for seq2seq text generation. Unlike calling the model
+        directly, this method does two things to optimize text generation:
+
+        - Allows caching previous key/value tensors in the decoder's
+          self-attention layer to avoid recomputing the outputs of seen tokens.
+        - Allows caching key/value tensors in the decoder's cross-attention
+          layer to avoid recomputing the encoder outputs.
+
+        Args:
+            encoder_hidden_states: a dense float Tensor of shape
+                `(batch_size, encoder_sequence_length, hidden_dim)`. The
+                sequence of hidden states at the output of the encoder's last
+                layer.
+            encoder_padding_mask: a dense int Tensor of shape
+                `(batch_size, encoder_sequence_length)`. The padding mask for
+                the encoder input.
+            decoder_token_ids: a dense int Tensor of shape
+                `(batch_size, max_length)`. Input token ids to be fed to
+                the decoder.
+            self_attention_cache: a tuple of `num_layers` dense float Tensors
+                of shape `(batch_size, 2, max_length, num_heads, key_dims)`.
+                The cached key/value tensors of previously seen tokens in the
+                decoder's self-attention layers.
+            self_attention_cache_update_index: an int or int Tensor, the index
+                at which to update the `self_attention_cache`. Usually, this is
+                the index of the current token being processed during decoding.
+            cross_attention_cache: a tuple of `num_layers` dense float Tensors
+                of shape
+                `(batch_size, 2, encoder_sequence_length, num_heads, key_dims)`.
+                The cached key/value tensors of the encoder outputs in the
+                decoder's cross-attention layers.
+            cross_attention_cache_update_index: an int or int Tensor, the index
+                at which to update the `cross_attention_cache`. Usually, this is
+                either `0` (compute the entire `cross_attention_cache`), or
+                `None` (reuse a previously computed `cross_attention_cache`).
+            position_bias: a dense float Tensor of shape
+                `(1, num_heads, max_length, max_length)`, as returned by
+                `compute_decoder_position_bias()`. If `None`, the bias is
+                computed on the fly.
+
+        Returns:
+            A `(logits, hidden_states, self_attention_cache, cross_attention_cache)`
+            tuple, where `logits` is the language model logits for the input
+            `decoder_token_ids`, `hidden_states` is the final hidden
+            representation of the input tokens, `self_attention_cache` is the
+            key/value cache in the decoder's self-attention layer and
+            `cross_attention_cache` is the key/value cache in the decoder's
+            cross-attention layer.
+        """
+        x = self.backbone.get_layer("token_embedding")(decoder_token_ids)
+        x = self.backbone.get_layer("decoder_embedding_dropout")(x)
+
+        batch_size = ops.shape(decoder_token_ids)[0]
+        length = ops.shape(decoder_token_ids)[1]
+        max_length = ops.shape(self_attention_cache[0])[2]
+        if position_bias is None:
+            position_bias = self.compute_decoder_position_bias(max_length)
+        # Slice out the bias of the positions being decoded, and mask the
+        # positions after them.
+        position_bias = ops.slice(
+            position_bias,
+            [0, 0, self_attention_cache_update_index, 0],
+            [1, self.backbone.num_heads, length, max_length],
+        )
+        causal_mask = compute_causal_mask(
+            batch_size, max_length, length, self_attention_cache_update_index
+        )
+        causal_mask = ops.cast(causal_mask[:, None, :, :], position_bias.dtype)
+        position_bias = position_bias + (1.0 - causal_mask) * -1e9
+        encoder_attention_mask = encoder_padding_mask[:, None, :]
+
+        # Every decoder layer has a separate cache for the self-attention layer
+        # and the cross-attention layer. We update all of them separately, in
+        # place, without copying the caches of other layers.
+        self_attention_caches = []
+        cross_attention_caches = []
+        for i in range(self.backbone.num_layers):
+            (
+                x,
+                _,
+                next_self_attention_cache,
+                next_cross_attention_cache,
+            ) = self.backbone.get_layer(f"transformer_decoder_layer_{i}")(
+                x,
+                position_bias=position_bias,
+                encoder_hidden_states=encoder_hidden_states,
+                encoder_attention_mask=encoder_attention_mask,
+                self_attention_cache=self_attention_cache[i],
+                self_attention_cache_update_index=self_attention_cache_update_index,
+                cross_attention_cache=cross_attention_cache[i],
+                cross_attention_cache_update_index=cross_attention_cache_update_index,
+            )
+            self_attention_caches.append(next_self_attention_cache)
+            if cross_attention_cache_update_index is not None:
+                cross_attention_caches.append(next_cross_attention_cache)
+
+        self_attention_cache = tuple(self_attention_caches)
+        if cross_attention_cache_update_index is not None:
+            cross_attention_cache = tuple(cross_attention_caches)
+
+        x = self.backbone.get_layer("decoder_output_layer_norm")(x)
+        hidden_states = self.backbone.get_layer("decoder_output_dropout")(x)
+        logits = self.backbone.token_embedding(hidden_states, reverse=True)
+        return (
+            logits,
+            hidden_states,
+            self_attention_cache,
+            cross_attention_cache,
+        )
+
+    def call_encoder(self, token_ids, padding_mask):
+        """Does a forward pass on the encoder and returns the encoder output."""
+        x = self.backbone.get_layer("token_embedding")(token_ids)
+        x = self.backbone.get_layer("encoder_embedding_dropout")(x)
+
+        attention_mask = padding_mask[:, None, :]
+        position_bias = None
+        for i in range(self.backbone.num_layers):
+            x, position_bias = self.backbone.get_layer(
+                f"transformer_encoder_layer_{i}"
+            )(
+                x,
+                attention_mask=attention_mask,
+                position_bias=position_bias,
+            )
+
+        x = self.backbone.get_layer("encoder_output_layer_norm")(x)
+        x = self.backbone.get_layer("encoder_output_dropout")(x)
+        return x
+
+    def _initialize_cache(self, encoder_token_ids, decoder_token_ids):
+        """Initializes empty self-attention cache and cross-attention cache."""
+        batch_size = ops.shape(encoder_token_ids)[0]
+        encoder_max_length = ops.shape(encoder_token_ids)[1]
+        decoder_max_length = ops.shape(decoder_token_ids)[1]
+
+        num_layers = self.backbone.num_layers
+        num_heads = self.backbone.num_heads
+        head_dim = self.backbone.hidden_dim // self.backbone.num_heads
+
+        shape = [batch_size, 2, decoder_max_length, num_heads, head_dim]
+        self_attention_cache = tuple(
+            ops.zeros(shape, dtype=self.compute_dtype)
+            for _ in range(num_layers)
+        )
+
+        shape[2] = encoder_max_length
+        cross_attention_cache = tuple(
+            ops.zeros(shape, dtype=self.compute_dtype)
+            for _ in range(num_layers)
+        )
+
+        return (self_attention_cache, cross_attention_cache)
+
+    def _build_cache(
+        self,
+        encoder_token_ids,
+        encoder_padding_mask,
+        decoder_token_ids,
+        position_bias=None,
+    ):
+        """Builds the self-attention cache and the cross-attention cache (key/value pairs)."""
+        encoder_hidden_states = self.call_encoder(
+            token_ids=encoder_token_ids, padding_mask=encoder_padding_mask
+        )
+        self_attention_cache, cross_attention_cache = self._initialize_cache(
+            encoder_token_ids, decoder_token_ids
+        )
+
+        # Seed the self-attention cache and the cross-attention cache.
+        (
+            _,
+            hidden_states,
+            self_attention_cache,
+            cross_attention_cache,
+        ) = self.call_decoder_with_cache(
+            encoder_hidden_states=encoder_hidden_states,
+            encoder_padding_mask=encoder_padding_mask,
+            decoder_token_ids=decoder_token_ids,
+            self_attention_cache=self_attention_cache,
+            self_attention_cache_update_index=0,
+            cross_attention_cache=cross_attention_cache,
+            cross_attention_cache_update_index=0,
+            position_bias=position_bias,
+        )
+        return (
+            hidden_states,
+            encoder_hidden_states,
+            self_attention_cache,
+            cross_attention_cache,
+        )
+
+    def generate_step(
+        self,
+        inputs,
+        end_token_id=None,
+        num_samples=1,
+    ):
+        """A compilable generation function for a batch of inputs.
+
+        This function represents the inner, XLA-compilable, generation function
+        for a single batch of inputs. Inputs should have the same structure as
+        model inputs, a dictionary with keys `"encoder_token_ids"`,
+        `"encoder_padding_mask"`, `"decoder_token_ids"` and
+        `"decoder_padding_mask"`.
+
+        Args:
+            inputs: A dictionary with four keys - `"encoder_token_ids"`,
+                `"encoder_padding_mask"`, `"decoder_token_ids"` and
+                `"decoder_padding_mask"`, with batched tensor values.
+            end_token_id: The id of the end token to stop on. If all
+                sequences have produced a new `end_token_id`, generation
+                will stop.
+            num_samples: int. The number of sequences to generate for each
+                input, decoded from the caches of a single forward pass over
+                the inputs. The outputs hold the sequences of each input in
+                consecutive rows.
+        """
+        (
+            encoder_token_ids,
+            encoder_padding_mask,
+            decoder_token_ids,
+            decoder_padding_mask,
+        ) = (
+            inputs["encoder_token_ids"],
+            inputs["encoder_padding_mask"],
+            inputs["decoder_token_ids"],
+            inputs["decoder_padding_mask"],
+        )
+
+        # The position bias is shared by all rows and steps, so we compute it
+        # once for the full decoder length.
+        position_bias = self.compute_decoder_position_bias(
+            ops.shape(decoder_token_ids)[1]
+        )
+        # Create and seed cache with a single forward pass.
+        (
+            hidden_states,
+            encoder_hidden_states,
+            self_attention_cache,
+            cross_attention_cache,
+        ) = self._build_cache(
+            encoder_token_ids,
+            encoder_padding_mask,
+            decoder_token_ids,
+            position_bias=position_bias,
+        )
+        # Decode each input `num_samples` times from the same caches.
+        (
+            hidden_states,
+            encoder_hidden_states,
+            encoder_padding_mask,
+            self_attention_cache,
+            cross_attention_cache,
+            decoder_token_ids,
+            decoder_padding_mask,
+        ) = self._repeat_samples(
+            (
+                hidden_states,
+                encoder_hidden_states,
+                encoder_padding_mask,
+                self_attention_cache,
+                cross_attention_cache,
+                decoder_token_ids,
+                decoder_padding_mask,
+            ),
+            num_samples,
+        )
+        # Compute the lengths of all user inputted tokens ids.
+        row_lengths = ops.sum(ops.cast(decoder_padding_mask, "int32"), axis=-1)
+        # Start at the first index that has no user inputted id.
+        index = ops.min(row_lengths)
+
+        def next(prompt, cache, index):
+            # Per-row encoder state is passed through the cache, as samplers
+            # may repeat or drop rows along the batch axis (e.g. for beams).
+            (
+                self_attention_cache,
+                cross_attention_cache,
+                encoder_hidden_states,
+                encoder_padding_mask,
+            ) = cache
+            # The cache index is the index of our previous token.
+            cache_index = index - 1
+            num_samples = ops.shape(prompt)[0]
+            prompt = ops.slice(prompt, [0, cache_index], [num_samples, 1])
+
+            (
+                logits,
+                hidden_states,
+                self_attention_cache,
+                _,
+            ) = self.call_decoder_with_cache(
+                encoder_hidden_states=encoder_hidden_states,
+                encoder_padding_mask=encoder_padding_mask,
+                decoder_token_ids=prompt,
+                self_attention_cache=self_attention_cache,
+                self_attention_cache_update_index=cache_index,
+                cross_attention_cache=cross_attention_cache,
+                cross_attention_cache_update_index=None,
+                position_bias=position_bias,
+            )
+            cache = (
+                self_attention_cache,
+                cross_attention_cache,
+                encoder_hidden_states,
+                encoder_padding_mask,
+            )
+            return (
+                ops.squeeze(logits, axis=1),
+                ops.squeeze(hidden_states, axis=1),
+                cache,
+            )
+
+        decoder_token_ids = self._sampler(
+            next=next,
+            prompt=decoder_token_ids,
+            cache=(
+                self_attention_cache,
+                cross_attention_cache,
+                encoder_hidden_states,
+                encoder_padding_mask,
+            ),
+            index=index,
+            mask=decoder_padding_mask,
+            end_token_id=end_token_id,
+            hidden_states=hidden_states,
+        )
+
+        # Compute an output padding mask with the token ids we updated.
+        if end_token_id is not None:
+            # Build a mask of `end_token_id` locations not in the original
+            # prompt (not in locations where `decoder_padding_mask` is True).
+            end_locations = ops.logical_and(
+                ops.equal(decoder_token_ids, end_token_id),
+                ops.logical_not(decoder_padding_mask),
+            )
+            end_locations = ops.cast(end_locations, "int32")
+            # Use cumsum to get ones in all locations after `end_locations`.
+            cumsum = ops.cast(ops.cumsum(end_locations, axis=-1), "int32")
+            overflow = cumsum - end_locations
+            # Our padding mask is the inverse of these overflow locations.
+            decoder_padding_mask = ops.logical_not(ops.cast(overflow, "bool"))
+        else:
+            # Without early stopping, all locations will have been updated.
+            decoder_padding_mask = ops.ones_like(
+                decoder_token_ids, dtype="bool"
+            )
+
+        return {
+            "decoder_token_ids": decoder_token_ids,
+            "decoder_padding_mask": decoder_padding_mask,
+        }
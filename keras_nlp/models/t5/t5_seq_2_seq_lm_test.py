@@ -0,0 +1,143 @@
+# Copyright 2023 The KerasNLP Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import pytest
+import tensorflow as tf
+
+from keras_nlp.backend import keras
+from keras_nlp.backend import ops
+from keras_nlp.models.t5.t5_backbone import T5Backbone
+from keras_nlp.models.t5.t5_seq_2_seq_lm import T5Seq2SeqLM
+from keras_nlp.tests.test_case import TestCase
+
+
+@pytest.mark.tf_only
+class T5Seq2SeqLMTest(TestCase):
+    def setUp(self):
+        self.backbone = T5Backbone(
+            vocabulary_size=10,
+            num_layers=2,
+            num_heads=2,
+            hidden_dim=8,
+            intermediate_dim=16,
+        )
+        self.seq_2_seq_lm = T5Seq2SeqLM(backbone=self.backbone)
+        self.batch = {
+            "encoder_token_ids": np.array(
+                [[5, 6, 7, 1, 0], [8, 3, 1, 0, 0]], dtype="int32"
+            ),
+            "encoder_padding_mask": np.array(
+                [[1, 1, 1, 1, 0], [1, 1, 1, 0, 0]], dtype="int32"
+            ),
+            "decoder_token_ids": np.array(
+                [[0, 4, 2, 9, 1, 0], [0, 3, 5, 6, 1, 0]], dtype="int32"
+            ),
+            "decoder_padding_mask": np.array(
+                [[1, 1, 1, 1, 1, 1], [1, 1, 1, 1, 1, 1]], dtype="int32"
+            ),
+        }
+        self.dataset = tf.data.Dataset.from_tensor_slices(
+            (self.batch, self.batch["decoder_token_ids"])
+        ).batch(2)
+
+    def test_valid_call_seq_2_seq_lm(self):
+        outputs = self.seq_2_seq_lm(self.batch)
+        self.assertEqual(outputs.shape, (2, 6, 10))
+
+    def test_fit(self):
+        self.seq_2_seq_lm.fit(self.dataset)
+
+    def test_call_with_cache(self):
+        # Decoding token by token from the caches matches a full forward pass.
+        expected = self.seq_2_seq_lm(self.batch)
+        token_ids = self.batch["decoder_token_ids"]
+        encoder_hidden_states = self.seq_2_seq_lm.call_encoder(
+            self.batch["encoder_token_ids"],
+            self.batch["encoder_padding_mask"],
+        )
+        (
+            self_attention_cache,
+            cross_attention_cache,
+        ) = self.seq_2_seq_lm._initialize_cache(
+            self.batch["encoder_token_ids"], token_ids
+        )
+        position_bias = self.seq_2_seq_lm.compute_decoder_position_bias(6)
+        for index in range(6):
+            # The cross-attention cache is computed once, on the first step.
+            (
+                logits,
+                _,
+                self_attention_cache,
+                cross_attention_cache,
+            ) = self.seq_2_seq_lm.call_decoder_with_cache(
+                encoder_hidden_states=encoder_hidden_states,
+                encoder_padding_mask=self.batch["encoder_padding_mask"],
+                decoder_token_ids=token_ids[:, index : index + 1],
+                self_attention_cache=self_attention_cache,
+                self_attention_cache_update_index=index,
+                cross_attention_cache=cross_attention_cache,
+                cross_attention_cache_update_index=0 if index == 0 else None,
+                position_bias=position_bias,
+            )
+            self.assertAllClose(logits[:, 0], expected[:, index], atol=1e-5)
+
+    def test_generate(self):
+        inputs = {
+            "encoder_token_ids": self.batch["encoder_token_ids"],
+            "encoder_padding_mask": self.batch["encoder_padding_mask"],
+            "decoder_token_ids": np.zeros((2, 6), dtype="int32"),
+            "decoder_padding_mask": np.array(
+                [[1, 0, 0, 0, 0, 0], [1, 1, 0, 0, 0, 0]], dtype="bool"
+            ),
+        }
+        self.seq_2_seq_lm.compile(sampler="greedy")
+        outputs = self.seq_2_seq_lm.generate(inputs)
+        token_ids = outputs["decoder_token_ids"]
+        self.assertEqual(token_ids.shape, (2, 6))
+        # Prompts are kept as is.
+        self.assertAllEqual(token_ids[:, 0], [0, 0])
+        self.assertAllEqual(token_ids[1, 1], 0)
+
+        # Greedy decoding from the caches matches picking the best token of a
+        # full forward pass over the decoded sequence.
+        logits = self.seq_2_seq_lm({**inputs, "decoder_token_ids": token_ids})
+        next_token_ids = ops.argmax(logits[:, :-1], axis=-1)
+        self.assertAllEqual(next_token_ids[0], token_ids[0, 1:])
+        self.assertAllEqual(next_token_ids[1, 1:], token_ids[1, 2:])
+
+    def test_generate_num_samples(self):
+        inputs = {
+            "encoder_token_ids": self.batch["encoder_token_ids"],
+            "encoder_padding_mask": self.batch["encoder_padding_mask"],
+            "decoder_token_ids": np.zeros((2, 6), dtype="int32"),
+            "decoder_padding_mask": np.array(
+                [[1, 0, 0, 0, 0, 0], [1, 0, 0, 0, 0, 0]], dtype="bool"
+            ),
+        }
+        self.seq_2_seq_lm.compile(sampler="greedy")
+        expected = self.seq_2_seq_lm.generate(inputs)
+        outputs = self.seq_2_seq_lm.generate(inputs, num_samples=2)
+        self.assertAllEqual(
+            outputs["decoder_token_ids"],
+            np.repeat(expected["decoder_token_ids"], 2, axis=0),
+        )
+
+    def test_serialization(self):
+        new_seq_2_seq_lm = keras.saving.deserialize_keras_object(
+            keras.saving.serialize_keras_object(self.seq_2_seq_lm)
+        )
+        self.assertEqual(
+            new_seq_2_seq_lm.get_config(), self.seq_2_seq_lm.get_config()
+        )
@@ -100,6 +100,10 @@ class T5TransformerLayer(keras.layers.Layer):
         encoder_hidden_states=None,
         encoder_attention_mask=None,
         use_causal_mask=False,
+        self_attention_cache=None,
+        self_attention_cache_update_index=None,
+        cross_attention_cache=None,
+        cross_attention_cache_update_index=None,
         training=False,
     ):
         if use_causal_mask:
@@ -113,24 +117,44 @@ class T5TransformerLayer(keras.layers.Layer):
 
         residual = x
         x = self.self_attention_layer_norm(x)
-        x, position_bias = self.self_attention(
-            x,
-            mask=attention_mask,
-            position_bias=position_bias,
-            training=training,
-        )
+        if self_attention_cache is None:
+            x, position_bias = self.self_attention(
+                x,
+                mask=attention_mask,
+                position_bias=position_bias,
+                training=training,
+            )
+        else:
+            x, position_bias, self_attention_cache = self.self_attention(
+                x,
+                mask=attention_mask,
+                position_bias=position_bias,
+                cache=self_attention_cache,
+                cache_update_index=self_attention_cache_update_index,
+                training=training,
+            )
         x = self.self_attention_dropout(x, training=training)
         x = x + residual
 
         if self.is_decoder:
             residual = x
             x = self.cross_attention_layer_norm(x)
-            x, _ = self.cross_attention(
-                x,
-                key_value_states=encoder_hidden_states,
-                mask=encoder_attention_mask,
-                training=training,
-            )
+            if cross_attention_cache is None:
+                x, _ = self.cross_attention(
+                    x,
+                    key_value_states=encoder_hidden_states,
+                    mask=encoder_attention_mask,
+                    training=training,
+                )
+            else:
+                x, _, cross_attention_cache = self.cross_attention(
+                    x,
+                    key_value_states=encoder_hidden_states,
+                    mask=encoder_attention_mask,
+                    cache=cross_attention_cache,
+                    cache_update_index=cross_attention_cache_update_index,
+                    training=training,
+                )
             x = self.cross_attention_dropout(x, training=training)
             x = x + residual
 
@@ -147,4 +171,11 @@ class T5TransformerLayer(keras.layers.Layer):
         x = self.dropout_layer(x, training=training)
         x = x + residual
 
+        if self_attention_cache is not None:
+            return (
+                x,
+                position_bias,
+                self_attention_cache,
+                cross_attention_cache,
+            )
         return x, position_bias
@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import copy
+import functools
 
 import numpy as np
 import tensorflow as tf
@@ -24,6 +25,60 @@ from keras_nlp.utils.python_utils import classproperty
 from keras_nlp.utils.python_utils import format_docstring
 
 
+@functools.lru_cache(maxsize=None)
+def _get_mel_filters(sampling_rate, num_fft_bins, num_mels):
+    """Computes a mel filter bank of shape `(num_fft_bins // 2 + 1, num_mels)`.
+
+    Adapted from Hugging Face
+    (https://github.com/huggingface/transformers/blob/v4.27.1/src/transformers/models/whisper/feature_extraction_whisper.py#L86)
+
+    Filter banks are cached for each `(sampling_rate, num_fft_bins, num_mels)`,
+    so they are only computed once for all layers sharing a configuration. The
+    returned array is read-only.
+    """
+    # Center freqs of each FFT bin
+    fftfreqs = np.fft.rfftfreq(n=num_fft_bins, d=1.0 / sampling_rate)
+
+    # 'Center freqs' of mel bands - uniformly spaced between limits
+    min_mel = 0.0
+    max_mel = 45.245640471924965
+
+    mels = np.linspace(min_mel, max_mel, num_mels + 2)
+
+    # Fill in the linear scale
+    f_min = 0.0
+    f_sp = 200.0 / 3
+    freqs = f_min + f_sp * mels
+
+    # And now the nonlinear scale
+    min_log_hz = 1000.0  # beginning of log region (Hz)
+    min_log_mel = (min_log_hz - f_min) / f_sp  # same (Mels)
+    logstep = np.log(6.4) / 27.0  # step size for log region
+
+    # If we have vector data, vectorize
+    log_t = mels >= min_log_mel
+    freqs[log_t] = min_log_hz * np.exp(logstep * (mels[log_t] - min_log_mel))
+
+    mel_f = freqs
+
+    fdiff = np.diff(mel_f)
+    ramps = np.subtract.outer(mel_f, fftfreqs)
+
+    # Lower and upper slopes for all bins of all filters, intersected with
+    # each other and zero.
+    lower = -ramps[:num_mels] / fdiff[:num_mels, np.newaxis]
+    upper = ramps[2 : num_mels + 2] / fdiff[1 : num_mels + 1, np.newaxis]
+    weights = np.maximum(0, np.minimum(lower, upper))
+
+    # Slaney-style mel is scaled to be approx constant energy per channel
+    enorm = 2.0 / (mel_f[2 : num_mels + 2] - mel_f[:num_mels])
+    weights *= enorm[:, np.newaxis]
+
+    weights = np.transpose(weights).astype("float32")
+    weights.setflags(write=False)
+    return weights
+
+
 @keras_nlp_export("keras_nlp.models.WhisperAudioFeatureExtractor")
 class WhisperAudioFeatureExtractor(keras.layers.Layer):
     """
@@ -37,6 +92,11 @@ class WhisperAudioFeatureExtractor(keras.layers.Layer):
     `(batch_size, num_frames, num_mels)`, where `num_frames` is
     `(max_audio_length * sampling_rate) / stride`.
 
+    Audio longer than `max_audio_length` is truncated by `call()`. Use
+    `call_long_form()` to compute the features of overlapping windows covering
+    long audio, and `call_streaming()` to compute features incrementally as
+    audio arrives.
+
     Args:
         num_mels: int. The number of mel-frequency filters. Defaults to `80`.
         num_fft_bins: int. The size of the Fourier Transform in STFT.
@@ -63,6 +123,20 @@ class WhisperAudioFeatureExtractor(keras.layers.Layer):
     audio_tensor_2 = tf.ones((10000,), dtype="float32"
     audio_tensor = tf.ragged.stack([audio_tensor_1, audio_tensor_2], axis=0)
     whisper_audio_feature_extractor(audio_tensor)
+
+    # Compute the log-mel spectrograms of 30 second windows covering long
+    # audio, with 5 seconds of overlap.
+    audio_tensor = tf.ones((16000 * 70,), dtype="float32")
+    features, offsets = whisper_audio_feature_extractor.call_long_form(
+        audio_tensor, overlap=5
+    )
+
+    # Compute the log-mel spectrogram incrementally.
+    state = None
+    for chunk in tf.split(tf.ones((16000 * 4,), dtype="float32"), 4):
+        features, state = whisper_audio_feature_extractor.call_streaming(
+            chunk, state
+        )
     ```
     """
 
@@ -98,82 +172,20 @@ class WhisperAudioFeatureExtractor(keras.layers.Layer):
         self.max_audio_length = max_audio_length
         self.num_samples = self.sampling_rate * self.max_audio_length
 
-        # After transposition, `self.mel_filters`'s shape is
-        # `(num_fft_bins // 2 + 1, num_mels).`
-        self.mel_filters = self._get_mel_filters()
-
-    def _get_mel_filters(self):
-        """
-        Adapted from Hugging Face
-        (https://github.com/huggingface/transformers/blob/v4.27.1/src/transformers/models/whisper/feature_extraction_whisper.py#L86)
-        """
-
-        # TODO: Convert to TensorFlow ops (if possible).
-
-        dtype = np.float32
-        # Initialize the weights
-        weights = np.zeros(
-            (self.num_mels, int(1 + self.num_fft_bins // 2)), dtype=dtype
-        )
-
-        # Center freqs of each FFT bin
-        fftfreqs = np.fft.rfftfreq(
-            n=self.num_fft_bins, d=1.0 / self.sampling_rate
+        # `self.mel_filters`'s shape is `(num_fft_bins // 2 + 1, num_mels).`
+        self.mel_filters = tf.constant(
+            _get_mel_filters(
+                self.sampling_rate, self.num_fft_bins, self.num_mels
+            ),
+            dtype=self.dtype,
         )
 
-        # 'Center freqs' of mel bands - uniformly spaced between limits
-        min_mel = 0.0
-        max_mel = 45.245640471924965
-
-        mels = np.linspace(min_mel, max_mel, self.num_mels + 2)
-
-        mels = np.asanyarray(mels)
-
-        # Fill in the linear scale
-        f_min = 0.0
-        f_sp = 200.0 / 3
-        freqs = f_min + f_sp * mels
-
-        # And now the nonlinear scale
-        min_log_hz = 1000.0  # beginning of log region (Hz)
-        min_log_mel = (min_log_hz - f_min) / f_sp  # same (Mels)
-        logstep = np.log(6.4) / 27.0  # step size for log region
-
-        # If we have vector data, vectorize
-        log_t = mels >= min_log_mel
-        freqs[log_t] = min_log_hz * np.exp(
-            logstep * (mels[log_t] - min_log_mel)
-        )
-
-        mel_f = freqs
-
-        fdiff = np.diff(mel_f)
-        ramps = np.subtract.outer(mel_f, fftfreqs)
-
-        for i in range(self.num_mels):
-            # lower and upper slopes for all bins
-            lower = -ramps[i] / fdiff[i]
-            upper = ramps[i + 2] / fdiff[i + 1]
-
-            # .. then intersect them with each other and zero
-            weights[i] = np.maximum(0, np.minimum(lower, upper))
-
-        # Slaney-style mel is scaled to be approx constant energy per channel
-        enorm = 2.0 / (mel_f[2 : self.num_mels + 2] - mel_f[: self.num_mels])
-        weights *= enorm[:, np.newaxis]
-
-        weights = np.transpose(weights)
-        return tf.constant(weights, dtype=self.dtype)
-
-    def _extract_audio_features(self, audio):
-        # Use "reflection" padding - `tf.signal.stft` uses symmetric padding
-        # internally.
-        audio = tf.pad(
-            audio,
-            paddings=[[0, 0], [self.num_fft_bins // 2, self.num_fft_bins // 2]],
-            mode="REFLECT",
-        )
+    def _log_mel_spectrogram(self, audio):
+        """Computes the log-mel spectrogram of `audio`, without normalization.
 
+        `audio` should already be padded, and has one STFT frame every
+        `stride` samples, starting at the first sample.
+        """
         # Compute the mel spectrogram.
         stft = tf.signal.stft(
             audio,
@@ -181,51 +193,41 @@ class WhisperAudioFeatureExtractor(keras.layers.Layer):
             frame_step=self.stride,
             fft_length=self.num_fft_bins,
         )
-        magnitudes = tf.square(tf.abs(stft[:, :-1, :]))
+        magnitudes = tf.square(tf.abs(stft))
 
         mel_spec = tf.matmul(
             magnitudes,
             self.mel_filters,
         )
 
-        def tf_log10(x):
-            """
-            Computes log base 10 of input tensor using TensorFlow's natural log operator.
-            """
-            numerator = tf.math.log(x)
-            denominator = tf.math.log(tf.constant(10, dtype=numerator.dtype))
-            return numerator / denominator
-
         # Clamp the values to a minimum value of 1e-10. This is done to avoid
         # taking the log of 0, i.e., for numerical stability.
         mel_spec = tf.maximum(mel_spec, 1e-10)
 
-        # Calculate the log mel spectrogram.
-        log_spec = tf_log10(mel_spec)
-        # Dynamic range compression.
-        log_spec_shape = tf.shape(log_spec)
-        max_value_minus_eight = tf.math.subtract(
-            tf.math.reduce_max(log_spec, axis=[1, 2]),
-            tf.cast(8, dtype=log_spec.dtype),
-        )
-        max_value_minus_eight = tf.expand_dims(max_value_minus_eight, axis=1)
-        max_value_minus_eight = tf.repeat(
-            max_value_minus_eight,
-            repeats=log_spec_shape[1] * log_spec_shape[2],
-            axis=1,
-        )
-        max_value_minus_eight = tf.reshape(
-            max_value_minus_eight, shape=log_spec_shape
-        )
-        log_spec = tf.maximum(log_spec, max_value_minus_eight)
+        # Calculate the log mel spectrogram, in base 10.
+        return tf.math.log(mel_spec) * (1.0 / np.log(10.0))
+
+    def _normalize_log_spec(self, log_spec):
+        """Applies dynamic range compression and scaling to a log-mel spectrogram."""
+        # Dynamic range compression, clamping each example to at most 8 below
+        # its maximum.
+        max_value = tf.reduce_max(log_spec, axis=[1, 2], keepdims=True)
+        log_spec = tf.maximum(log_spec, max_value - 8.0)
         # Normalization.
-        type_cast_four = tf.cast(4, dtype=log_spec.dtype)
-        log_spec = tf.math.divide(
-            tf.math.add(log_spec, type_cast_four),
-            type_cast_four,
-        )
+        return (log_spec + 4.0) / 4.0
 
-        return log_spec
+    def _extract_audio_features(self, audio):
+        # Use "reflection" padding - `tf.signal.stft` uses symmetric padding
+        # internally.
+        audio = tf.pad(
+            audio,
+            paddings=[[0, 0], [self.num_fft_bins // 2, self.num_fft_bins // 2]],
+            mode="REFLECT",
+        )
+        # The last frame is centered on the padding after the audio, so we
+        # drop it.
+        log_spec = self._log_mel_spectrogram(audio)[:, :-1, :]
+        return self._normalize_log_spec(log_spec)
 
     def call(self, audio):
         if not isinstance(audio, (tf.Tensor, tf.RaggedTensor)):
@@ -248,6 +250,187 @@ class WhisperAudioFeatureExtractor(keras.layers.Layer):
         log_spec = self._extract_audio_features(audio)
         return log_spec
 
+    def call_long_form(self, audio, overlap=5):
+        """Computes features of audio longer than `max_audio_length`.
+
+        The audio is split into windows of `max_audio_length` seconds, each
+        window starting `overlap` seconds before the end of the previous one,
+        and the last window is padded with zeros. The features of all windows
+        are computed with a single batched STFT, and each window is normalized
+        on its own, as if it was passed to `call()`.
+
+        Args:
+            audio: A dense tensor of shape `(length_of_audio,)` or
+                `(batch_size, length_of_audio)`.
+            overlap: int or float. The overlap of consecutive windows, in
+                seconds. Must be less than `max_audio_length`. Defaults to
+                `5`.
+
+        Returns:
+            A `(features, offsets)` tuple. For unbatched audio, `features` has
+            shape `(num_windows, num_frames, num_mels)`, and for batched audio
+            `(batch_size, num_windows, num_frames, num_mels)`. `offsets` is an
+            int tensor of shape `(num_windows,)`, the index of the first audio
+            sample of each window. Divide offsets by `sampling_rate` to get the
+            start time of each window in seconds.
+        """
+        overlap_samples = int(overlap * self.sampling_rate)
+        if not 0 <= overlap_samples < self.num_samples:
+            raise ValueError(
+                "`overlap` must be non-negative and less than "
+                f"`max_audio_length={self.max_audio_length}`. "
+                f"Received: overlap={overlap}"
+            )
+        if not isinstance(audio, tf.Tensor):
+            audio = tf.convert_to_tensor(audio)
+        audio = tf.cast(audio, self.compute_dtype)
+
+        rank_1_input = audio.shape.rank == 1
+        if rank_1_input:
+            audio = tf.expand_dims(audio, 0)
+
+        # Use as many windows as needed to cover the audio.
+        step = self.num_samples - overlap_samples
+        length = tf.shape(audio)[-1]
+        remainder = tf.maximum(length - self.num_samples, 0)
+        num_windows = 1 + (remainder + step - 1) // step
+        padded_length = (num_windows - 1) * step + self.num_samples
+        audio = tf.pad(audio, [[0, 0], [0, padded_length - length]])
+        # Shape `(batch_size, num_windows, num_samples)`.
+        windows = tf.signal.frame(audio, self.num_samples, step)
+
+        # Compute the features of all windows at once.
+        batch_size = tf.shape(windows)[0]
+        features = self._extract_audio_features(
+            tf.reshape(windows, (-1, self.num_samples))
+        )
+        num_frames = tf.shape(features)[1]
+        features = tf.reshape(
+            features, (batch_size, num_windows, num_frames, self.num_mels)
+        )
+        if rank_1_input:
+            features = tf.squeeze(features, axis=0)
+        offsets = tf.range(num_windows) * step
+        return features, offsets
+
+    def call_streaming(self, audio, state=None):
+        """Computes features incrementally, as audio arrives in chunks.
+
+        Each call takes the next chunk of audio and the state returned by the
+        previous call, and returns the features of all audio received so far,
+        i.e. the output of `call()` on the concatenated chunks. The log-mel
+        spectrogram of every STFT frame which only covers received audio is
+        kept in the state, so only the few frames overlapping the end of the
+        received audio are recomputed by the next call. Audio past
+        `max_audio_length` seconds is ignored, as in `call()`.
+
+        Streaming is meant to be run eagerly, one call per chunk.
+
+        Args:
+            audio: A dense tensor of shape `(chunk_length,)` or
+                `(batch_size, chunk_length)`. The first chunk must hold more
+                than `num_fft_bins // 2` samples.
+            state: The state returned by the previous call, or `None` for the
+                first chunk.
+
+        Returns:
+            A `(features, state)` tuple, where `features` has shape
+            `(batch_size, num_frames, num_mels)`.
+        """
+        if not isinstance(audio, tf.Tensor):
+            audio = tf.convert_to_tensor(audio)
+        audio = tf.cast(audio, self.compute_dtype)
+        if audio.shape.rank == 1:
+            audio = tf.expand_dims(audio, 0)
+
+        half_window = self.num_fft_bins // 2
+        total_frames = self.num_samples // self.stride
+        if state is None:
+            if audio.shape[1] <= half_window:
+                raise ValueError(
+                    "The first chunk of audio must have more than "
+                    f"`num_fft_bins // 2 = {half_window}` samples. "
+                    f"Received: audio.shape={audio.shape}"
+                )
+            # The buffer holds the audio from the start of the first frame
+            # which is not computed yet, including the reflection padding.
+            state = {
+                "buffer": tf.reverse(audio[:, 1 : half_window + 1], axis=[1]),
+                "log_spec": tf.zeros(
+                    (audio.shape[0], 0, self.num_mels), self.compute_dtype
+                ),
+                "num_received": 0,
+            }
+        buffer = state["buffer"]
+        log_spec = state["log_spec"]
+        num_received = state["num_received"]
+
+        # Ignore audio after `num_samples`.
+        audio = audio[:, : self.num_samples - num_received]
+        buffer = tf.concat([buffer, audio], axis=1)
+        num_received += audio.shape[1]
+        num_frames = log_spec.shape[1]
+
+        if num_received == self.num_samples and num_frames < total_frames:
+            # All audio is received, pad the end as in `call()`.
+            buffer = tf.pad(buffer, [[0, 0], [0, half_window]], mode="REFLECT")
+            new_log_spec = self._log_mel_spectrogram(buffer)
+            log_spec = tf.concat(
+                [log_spec, new_log_spec[:, : total_frames - num_frames]],
+                axis=1,
+            )
+            buffer = buffer[:, :0]
+            num_frames = total_frames
+
+        # Compute and keep the frames which only cover received audio.
+        num_new_frames = (buffer.shape[1] - self.num_fft_bins) // self.stride
+        num_new_frames = min(num_new_frames + 1, total_frames - num_frames)
+        if num_new_frames > 0:
+            end = (num_new_frames - 1) * self.stride + self.num_fft_bins
+            new_log_spec = self._log_mel_spectrogram(buffer[:, :end])
+            log_spec = tf.concat([log_spec, new_log_spec], axis=1)
+            buffer = buffer[:, num_new_frames * self.stride :]
+            num_frames += num_new_frames
+
+        # Frames overlapping the end of the received audio see zeros after
+        # it, as `call()` pads audio with zeros to `num_samples`, and all
+        # later frames only see zeros.
+        num_partial_frames = -(-buffer.shape[1] // self.stride)
+        num_partial_frames = min(num_partial_frames, total_frames - num_frames)
+        partial_log_spec = log_spec[:, :0]
+        if num_partial_frames > 0:
+            end = (num_partial_frames - 1) * self.stride + self.num_fft_bins
+            # The end of the zero padded audio, relative to the buffer. The
+            # last frames also see the reflection padding after it.
+            audio_end = (
+                half_window + self.num_samples - num_frames * self.stride
+            )
+            partial = tf.pad(
+                buffer, [[0, 0], [0, min(end, audio_end) - buffer.shape[1]]]
+            )
+            if end > audio_end:
+                partial = tf.pad(
+                    partial, [[0, 0], [0, end - audio_end]], mode="REFLECT"
+                )
+            partial_log_spec = self._log_mel_spectrogram(partial)
+        num_silent_frames = total_frames - num_frames - num_partial_frames
+        silent_log_spec = self._log_mel_spectrogram(
+            tf.zeros((1, self.num_fft_bins), self.compute_dtype)
+        )
+        silent_log_spec = tf.tile(
+            silent_log_spec, [tf.shape(buffer)[0], num_silent_frames, 1]
+        )
+
+        features = self._normalize_log_spec(
+            tf.concat([log_spec, partial_log_spec, silent_log_spec], axis=1)
+        )
+        state = {
+            "buffer": buffer,
+            "log_spec": log_spec,
+            "num_received": num_received,
+        }
+        return features, state
+
     def get_config(self):
         config = super().get_config()
         config.update(
@@ -18,6 +18,9 @@ from keras_nlp.backend import keras
 from keras_nlp.models.whisper.whisper_audio_feature_extractor import (
     WhisperAudioFeatureExtractor,
 )
+from keras_nlp.models.whisper.whisper_audio_feature_extractor import (
+    _get_mel_filters,
+)
 from keras_nlp.tests.test_case import TestCase
 
 
@@ -36,6 +39,23 @@ class WhisperAudioFeatureExtractorTest(TestCase):
             max_audio_length=self.max_audio_length,
         )
 
+    def test_mel_filters(self):
+        self.assertEqual(
+            self.audio_feature_extractor.mel_filters.shape,
+            (self.num_fft_bins // 2 + 1, self.num_mels),
+        )
+        # Filter banks are computed once for each configuration.
+        filters = _get_mel_filters(
+            self.sampling_rate, self.num_fft_bins, self.num_mels
+        )
+        self.assertIs(
+            filters,
+            _get_mel_filters(
+                self.sampling_rate, self.num_fft_bins, self.num_mels
+            ),
+        )
+        self.assertAllClose(self.audio_feature_extractor.mel_filters, filters)
+
     def test_unbatched_inputs(self):
         audio_tensor = tf.ones((2,), dtype="float32")
 
@@ -73,3 +93,42 @@ class WhisperAudioFeatureExtractorTest(TestCase):
             new_audio_feature_extractor.get_config(),
             self.audio_feature_extractor.get_config(),
         )
+
+    def test_long_form(self):
+        audio = tf.random.uniform((1200,))
+        features, offsets = self.audio_feature_extractor.call_long_form(
+            audio, overlap=1
+        )
+        # Windows of 500 samples, starting every 400 samples.
+        self.assertEqual(features.shape, (3, 5, self.num_mels))
+        self.assertAllEqual(offsets, [0, 400, 800])
+        for i, offset in enumerate(offsets):
+            expected = self.audio_feature_extractor(
+                audio[offset : offset + 500]
+            )
+            self.assertAllClose(features[i], expected[0], atol=1e-5)
+
+        # Batched audio, shorter than a window.
+        features, offsets = self.audio_feature_extractor.call_long_form(
+            tf.random.uniform((2, 300)), overlap=1
+        )
+        self.assertEqual(features.shape, (2, 1, 5, self.num_mels))
+        self.assertAllEqual(offsets, [0])
+
+        with self.assertRaises(ValueError):
+            self.audio_feature_extractor.call_long_form(audio, overlap=5)
+
+    def test_streaming(self):
+        audio = tf.random.uniform((2, 600))
+        state = None
+        start = 0
+        for end in (210, 260, 270, 420, 499, 600):
+            features, state = self.audio_feature_extractor.call_streaming(
+                audio[:, start:end], state
+            )
+            expected = self.audio_feature_extractor(audio[:, :end])
+            self.assertAllClose(features, expected, atol=1e-5)
+            start = end
+
+        with self.assertRaises(ValueError):
+            self.audio_feature_extractor.call_streaming(audio[:, :100])
@@ -0,0 +1,213 @@
+# Copyright 2023 The KerasNLP Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import tensorflow as tf
+from absl import logging
+
+from keras_nlp.api_export import keras_nlp_export
+from keras_nlp.backend import ops
+from keras_nlp.models.whisper.whisper_preprocessor import WhisperPreprocessor
+from keras_nlp.utils.keras_utils import (
+    convert_inputs_to_list_of_tensor_segments,
+)
+from keras_nlp.utils.keras_utils import pack_x_y_sample_weight
+
+
+@keras_nlp_export("keras_nlp.models.WhisperSeq2SeqLMPreprocessor")
+class WhisperSeq2SeqLMPreprocessor(WhisperPreprocessor):
+    """Whisper Seq2Seq LM preprocessor.
+
+    This layer is used as preprocessor for speech-to-text tasks using the
+    Whisper model. This class subclasses `keras_nlp.models.WhisperPreprocessor`
+    and keeps most of its functionality. It has two changes from the
+    superclass:
+
+     1. Sets the `y` (label) and `sample_weights` fields by shifting the
+        decoder input sequence one step towards the left. Both these fields are
+        inferred internally, and any passed values will be ignored.
+     2. Drops the last token from the decoder input sequence as it does not
+        have a successor.
+
+    Args:
+        audio_feature_extractor: A `keras_nlp.models.WhisperAudioFeatureExtractor`
+            instance.
+        tokenizer: A `keras_nlp.models.WhisperTokenizer` instance.
+        decoder_sequence_length: The length of the packed decoder inputs.
+        language: string, language token. Should only be passed if your
+            tokenizer is multilingual.
+        task: string, task name. One of `"transcribe"`, `"translate"`. Should
+            only be passed if your tokenizer is multilingual.
+        no_timestamps: bool. If True, `"<|no_timestamps|>"` will be added as a
+            special token to your input.
+
+    Call arguments:
+        x: A dictionary with `"encoder_audio"` and `"decoder_text"` as its keys.
+            `"encoder_audio"` should correspond to the input audio tensor.
+            `"decoder_text"` should be a tensor of single string sequences.
+            Inputs may be batched or unbatched. Raw python inputs will be
+            converted to tensors.
+        y: Label data. Should always be `None` as the layer generates labels by
+            shifting the decoder input sequence one step to the left.
+        sample_weight: Label weights. Should always be `None` as the layer
+            generates label weights by shifting the padding mask one step to the
+            left.
+
+    Examples:
+
+    Directly calling the layer on data.
+    ```python
+    preprocessor = keras_nlp.models.WhisperSeq2SeqLMPreprocessor.from_preset(
+        "whisper_tiny_en",
+    )
+
+    # Preprocess batched inputs.
+    input_data = {
+        "encoder_audio": tf.ones((2, 200)),
+        "decoder_text": ["The quick brown fox jumped.", "Call me Ishmael."],
+    }
+    x, y, sample_weight = preprocessor(input_data)
+
+    # Prepare audio for generation, and detokenize generated token ids.
+    x = preprocessor.generate_preprocess(tf.ones((2, 200)))
+    preprocessor.generate_postprocess(x)
+    ```
+
+    Mapping with `tf.data.Dataset`.
+    ```python
+    preprocessor = keras_nlp.models.WhisperSeq2SeqLMPreprocessor.from_preset(
+        "whisper_tiny_en",
+    )
+    features = {
+        "encoder_audio": tf.ones((2, 200)),
+        "decoder_text": ["The quick brown fox jumped.", "Call me Ishmael."],
+    }
+    ds = tf.data.Dataset.from_tensor_slices(features)
+    ds = ds.map(preprocessor, num_parallel_calls=tf.data.AUTOTUNE)
+    ```
+    """
+
+    def call(self, x, y=None, sample_weight=None):
+        if y is not None or sample_weight is not None:
+            logging.warning(
+                "`WhisperSeq2SeqLMPreprocessor` infers `y` and `sample_weight` "
+                "from the provided input data, i.e., `x`. However, non-`None`"
+                "values have been passed for `y` or `sample_weight` or both. "
+                "These values will be ignored."
+            )
+
+        x = super().call(x)
+        decoder_token_ids = x.pop("decoder_token_ids")
+        decoder_padding_mask = x.pop("decoder_padding_mask")
+
+        # The last token does not have a next token. Hence, we truncate it.
+        x = {
+            **x,
+            "decoder_token_ids": decoder_token_ids[..., :-1],
+            "decoder_padding_mask": decoder_padding_mask[..., :-1],
+        }
+        # Target `y` will be the decoder input sequence shifted one step to the
+        # left (i.e., the next token).
+        y = decoder_token_ids[..., 1:]
+        sample_weight = decoder_padding_mask[..., 1:]
+        return pack_x_y_sample_weight(x, y, sample_weight)
+
+    def generate_preprocess(
+        self,
+        x,
+        sequence_length=None,
+    ):
+        """Convert audio and decoder prompt strings to inputs for generation.
+
+        This method takes in either a batch of audio, or a dict containing
+        `"encoder_audio"` and an optional `"decoder_text"` prompt. It computes
+        the log-mel features of the audio, and tokenizes and packs the decoder
+        prompt after the start tokens (start of transcript, language, task and
+        no timestamps tokens), with a padding mask masking all inputs not
+        filled in with a padded value.
+
+        Unlike calling the layer for training, this method does not compute
+        labels and will never append a tokenizer.end_token_id to the end of
+        the decoder sequence (as generation is expected to continue at the end
+        of the inputted decoder prompt).
+        """
+        # If `sequence_length` is not provided, we use the default value.
+        if sequence_length is None:
+            sequence_length = self.decoder_sequence_length
+
+        if isinstance(x, dict):
+            encoder_audio = x["encoder_audio"]
+            decoder_text = x.get("decoder_text", None)
+        else:
+            encoder_audio = x
+            decoder_text = None
+
+        # TODO: Remove `[0]` once we have shifted to `MultiSegmentPacker`.
+        encoder_audio = convert_inputs_to_list_of_tensor_segments(
+            encoder_audio
+        )[0]
+        encoder_features = self.audio_feature_extractor(encoder_audio)
+
+        if decoder_text is None:
+            # Initialize empty prompt for the decoder.
+            decoder_text = tf.fill((tf.shape(encoder_features)[0],), "")
+        decoder_text = convert_inputs_to_list_of_tensor_segments(decoder_text)[
+            0
+        ]
+        decoder_token_ids = self.tokenizer(decoder_text)
+        decoder_token_ids, decoder_padding_mask = self.decoder_packer(
+            decoder_token_ids,
+            sequence_length=sequence_length,
+            add_end_value=False,
+        )
+
+        return {
+            "encoder_features": encoder_features,
+            "decoder_token_ids": decoder_token_ids,
+            "decoder_padding_mask": decoder_padding_mask,
+        }
+
+    def generate_postprocess(
+        self,
+        x,
+    ):
+        """Convert integer token output to strings for generation.
+
+        This method reverses `generate_preprocess()`, by first removing all
+        padding and special tokens (start, language, task, timestamp and end
+        tokens), and then converting the integer sequence back to a string.
+        """
+        decoder_token_ids, decoder_padding_mask = (
+            x["decoder_token_ids"],
+            x["decoder_padding_mask"],
+        )
+        if not isinstance(decoder_token_ids, tf.Tensor):
+            decoder_token_ids = ops.convert_to_numpy(decoder_token_ids)
+        if not isinstance(decoder_padding_mask, tf.Tensor):
+            decoder_padding_mask = ops.convert_to_numpy(decoder_padding_mask)
+        # Strip all special tokens during detokenization.
+        special_token_ids = list(self.tokenizer.special_tokens.values())
+        if self.tokenizer.language_tokens is not None:
+            special_token_ids += list(self.tokenizer.language_tokens.values())
+        is_special_token = tf.reduce_any(
+            tf.equal(decoder_token_ids[..., None], special_token_ids),
+            axis=-1,
+        )
+        decoder_padding_mask = tf.logical_and(
+            tf.cast(decoder_padding_mask, "bool"),
+            tf.logical_not(is_special_token),
+        )
+        decoder_token_ids = tf.ragged.boolean_mask(
+            decoder_token_ids, decoder_padding_mask
+        )
+        return self.tokenizer.detokenize(decoder_token_ids)
@@ -0,0 +1,144 @@
+# Copyright 2023 The KerasNLP Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import tensorflow as tf
+
+from keras_nlp.backend import keras
+from keras_nlp.models.whisper.whisper_audio_feature_extractor import (
+    WhisperAudioFeatureExtractor,
+)
+from keras_nlp.models.whisper.whisper_seq_2_seq_lm_preprocessor import (
+    WhisperSeq2SeqLMPreprocessor,
+)
+from keras_nlp.models.whisper.whisper_tokenizer import WhisperTokenizer
+from keras_nlp.tests.test_case import TestCase
+
+
+class WhisperSeq2SeqLMPreprocessorTest(TestCase):
+    def setUp(self):
+        self.audio_feature_extractor = WhisperAudioFeatureExtractor(
+            num_mels=80,
+            num_fft_bins=400,
+            stride=100,
+            sampling_rate=100,
+            max_audio_length=5,
+        )
+        vocab = {
+            "Ġair": 0,
+            "plane": 1,
+            "Ġat": 2,
+            "port": 3,
+            "Ġkoh": 4,
+            "li": 5,
+            "Ġis": 6,
+            "Ġthe": 7,
+            "Ġbest": 8,
+        }
+        merges = ["Ġ a", "Ġ t", "Ġ k", "Ġ i", "Ġ b", "Ġa i", "p l", "n e"]
+        merges += ["Ġa t", "p o", "r t", "o h", "l i", "Ġi s", "Ġb e", "s t"]
+        merges += ["Ġt h", "Ġai r", "pl a", "Ġk oh", "Ġth e", "Ġbe st", "po rt"]
+        merges += ["pla ne"]
+        special_tokens = {
+            "<|startoftranscript|>": 9,
+            "<|endoftext|>": 10,
+            "<|notimestamps|>": 11,
+            "<|transcribe|>": 12,
+            "<|translate|>": 13,
+        }
+        language_tokens = {
+            "<|en|>": 14,
+            "<|fr|>": 15,
+        }
+        self.preprocessor = WhisperSeq2SeqLMPreprocessor(
+            audio_feature_extractor=self.audio_feature_extractor,
+            tokenizer=WhisperTokenizer(
+                vocabulary=vocab,
+                merges=merges,
+                special_tokens=special_tokens,
+                language_tokens=language_tokens,
+            ),
+            decoder_sequence_length=12,
+            language="<|en|>",
+            task="transcribe",
+        )
+
+    def test_preprocess_batch(self):
+        input_data = {
+            "encoder_audio": tf.ones((2, 200)),
+            "decoder_text": tf.constant([" airplane at airport"] * 2),
+        }
+
+        x_out, y_out, sw_out = self.preprocessor(input_data)
+        self.assertAllEqual(x_out["encoder_features"].shape, [2, 5, 80])
+        self.assertAllEqual(
+            x_out["decoder_token_ids"],
+            [[9, 14, 12, 11, 0, 1, 2, 0, 3, 10, 10]] * 2,
+        )
+        self.assertAllEqual(
+            x_out["decoder_padding_mask"],
+            [[1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0]] * 2,
+        )
+        self.assertAllEqual(
+            y_out, [[14, 12, 11, 0, 1, 2, 0, 3, 10, 10, 10]] * 2
+        )
+        self.assertAllEqual(sw_out, [[1, 1, 1, 1, 1, 1, 1, 1, 1, 0, 0]] * 2)
+
+    def test_generate_preprocess(self):
+        x = self.preprocessor.generate_preprocess(
+            {
+                "encoder_audio": tf.ones((2, 200)),
+                "decoder_text": tf.constant([" airplane", " kohli"]),
+            }
+        )
+        self.assertAllEqual(x["encoder_features"].shape, [2, 5, 80])
+        self.assertAllEqual(
+            x["decoder_token_ids"],
+            [
+                [9, 14, 12, 11, 0, 1, 10, 10, 10, 10, 10, 10],
+                [9, 14, 12, 11, 4, 5, 10, 10, 10, 10, 10, 10],
+            ],
+        )
+        self.assertAllEqual(
+            x["decoder_padding_mask"],
+            [[1, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0, 0]] * 2,
+        )
+
+        # Audio only inputs are prompted with the start tokens.
+        x = self.preprocessor.generate_preprocess(
+            tf.ones((2, 200)), sequence_length=6
+        )
+        self.assertAllEqual(
+            x["decoder_token_ids"], [[9, 14, 12, 11, 10, 10]] * 2
+        )
+        self.assertAllEqual(x["decoder_padding_mask"], [[1, 1, 1, 1, 0, 0]] * 2)
+
+    def test_generate_postprocess(self):
+        input_data = {
+            "decoder_token_ids": tf.constant(
+                [[9, 14, 12, 11, 0, 1, 10, 10], [9, 14, 12, 11, 4, 5, 6, 10]]
+            ),
+            "decoder_padding_mask": tf.constant(
+                [[1, 1, 1, 1, 1, 1, 1, 0], [1, 1, 1, 1, 1, 1, 1, 1]]
+            ),
+        }
+        x = self.preprocessor.generate_postprocess(input_data)
+        self.assertAllEqual(x, [" airplane", " kohli is"])
+
+    def test_serialization(self):
+        config = keras.saving.serialize_keras_object(self.preprocessor)
+        new_preprocessor = keras.saving.deserialize_keras_object(config)
+        self.assertEqual(
+            new_preprocessor.get_config(),
+            self.preprocessor.get_config(),
+        )
@@ -0,0 +1,214 @@
+# Copyright 2023 The KerasNLP Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+import tensorflow as tf
+
+from keras_nlp.backend import keras
+from keras_nlp.backend import ops
+from keras_nlp.models.whisper.whisper_audio_feature_extractor import (
+    WhisperAudioFeatureExtractor,
+)
+from keras_nlp.models.whisper.whisper_backbone import WhisperBackbone
+from keras_nlp.models.whisper.whisper_seq_2_seq_lm import WhisperSeq2SeqLM
+from keras_nlp.models.whisper.whisper_seq_2_seq_lm_preprocessor import (
+    WhisperSeq2SeqLMPreprocessor,
+)
+from keras_nlp.models.whisper.whisper_tokenizer import WhisperTokenizer
+from keras_nlp.tests.test_case import TestCase
+
+
+@pytest.mark.tf_only
+class WhisperSeq2SeqLMTest(TestCase):
+    def setUp(self):
+        vocab = {
+            "Ġair": 0,
+            "plane": 1,
+            "Ġat": 2,
+            "port": 3,
+            "Ġkoh": 4,
+            "li": 5,
+            "Ġis": 6,
+            "Ġthe": 7,
+            "Ġbest": 8,
+        }
+        merges = ["Ġ a", "Ġ t", "Ġ k", "Ġ i", "Ġ b", "Ġa i", "p l", "n e"]
+        merges += ["Ġa t", "p o", "r t", "o h", "l i", "Ġi s", "Ġb e", "s t"]
+        merges += ["Ġt h", "Ġai r", "pl a", "Ġk oh", "Ġth e", "Ġbe st", "po rt"]
+        merges += ["pla ne"]
+        special_tokens = {
+            "<|startoftranscript|>": 9,
+            "<|endoftext|>": 10,
+            "<|notimestamps|>": 11,
+            "<|transcribe|>": 12,
+            "<|translate|>": 13,
+        }
+        self.preprocessor = WhisperSeq2SeqLMPreprocessor(
+            audio_feature_extractor=WhisperAudioFeatureExtractor(
+                num_mels=80,
+                num_fft_bins=400,
+                stride=100,
+                sampling_rate=100,
+                max_audio_length=5,
+            ),
+            tokenizer=WhisperTokenizer(
+                vocabulary=vocab,
+                merges=merges,
+                special_tokens=special_tokens,
+            ),
+            decoder_sequence_length=8,
+        )
+        self.backbone = WhisperBackbone(
+            vocabulary_size=self.preprocessor.tokenizer.vocabulary_size(),
+            num_layers=2,
+            num_heads=2,
+            hidden_dim=4,
+            intermediate_dim=8,
+            max_encoder_sequence_length=6,
+            max_decoder_sequence_length=8,
+        )
+        self.seq_2_seq_lm = WhisperSeq2SeqLM(
+            backbone=self.backbone,
+            preprocessor=self.preprocessor,
+        )
+
+        self.raw_batch = {
+            "encoder_audio": np.random.uniform(size=(2, 300)).astype("float32"),
+            "decoder_text": [" airplane at airport", " kohli is the best"],
+        }
+        self.preprocessed_batch = self.preprocessor(self.raw_batch)[0]
+        self.raw_dataset = tf.data.Dataset.from_tensor_slices(
+            self.raw_batch
+        ).batch(2)
+
+    def test_valid_call_seq_2_seq_lm(self):
+        self.seq_2_seq_lm(self.preprocessed_batch)
+
+    def test_fit(self):
+        self.seq_2_seq_lm.fit(self.raw_dataset)
+
+    def test_call_with_cache(self):
+        # Decoding token by token from the caches matches a full forward pass.
+        x = {
+            **self.preprocessed_batch,
+            "decoder_padding_mask": np.ones((2, 7), dtype="int32"),
+        }
+        expected = self.seq_2_seq_lm(x)
+        token_ids = x["decoder_token_ids"]
+        encoder_hidden_states = self.seq_2_seq_lm.call_encoder(
+            x["encoder_features"]
+        )
+        self.assertAllClose(
+            encoder_hidden_states,
+            self.backbone(x)["encoder_sequence_output"],
+        )
+        (
+            self_attention_cache,
+            cross_attention_cache,
+        ) = self.seq_2_seq_lm._initialize_cache(
+            encoder_hidden_states, token_ids
+        )
+        for index in range(7):
+            # The cross-attention cache is computed once, on the first step.
+            (
+                logits,
+                _,
+                self_attention_cache,
+                cross_attention_cache,
+            ) = self.seq_2_seq_lm.call_decoder_with_cache(
+                encoder_hidden_states=encoder_hidden_states,
+                decoder_token_ids=token_ids[:, index : index + 1],
+                self_attention_cache=self_attention_cache,
+                self_attention_cache_update_index=index,
+                cross_attention_cache=cross_attention_cache,
+                cross_attention_cache_update_index=0 if index == 0 else None,
+            )
+            self.assertAllClose(logits[:, 0], expected[:, index], atol=1e-5)
+
+    def test_generate(self):
+        # Audio input.
+        outputs = self.seq_2_seq_lm.generate(self.raw_batch["encoder_audio"])
+        self.assertIsInstance(outputs[0], str)
+        # Audio and prompt input.
+        self.assertIsInstance(
+            self.seq_2_seq_lm.generate(self.raw_batch)[0], str
+        )
+        # Dataset input.
+        self.assertIsInstance(
+            self.seq_2_seq_lm.generate(self.raw_dataset)[0], str
+        )
+
+        # Int tensor input.
+        self.seq_2_seq_lm.preprocessor = None
+        preprocessed_batch = self.preprocessor.generate_preprocess(
+            self.raw_batch
+        )
+        outputs = self.seq_2_seq_lm.generate(preprocessed_batch)
+        # Assert prompt is in output in token id space.
+        self.assertAllEqual(
+            outputs["decoder_token_ids"][:, :3],
+            preprocessed_batch["decoder_token_ids"][:, :3],
+        )
+
+    def test_generate_num_samples(self):
+        self.seq_2_seq_lm.compile(sampler="greedy")
+        audio = self.raw_batch["encoder_audio"]
+        expected = self.seq_2_seq_lm.generate(audio)
+        outputs = self.seq_2_seq_lm.generate(audio, num_samples=2)
+        self.assertEqual(outputs, [expected[0]] * 2 + [expected[1]] * 2)
+
+    def test_early_stopping(self):
+        call_decoder_with_cache = self.seq_2_seq_lm.call_decoder_with_cache
+
+        def wrapper(*args, **kwargs):
+            """Modify output logits to always favor end_token_id"""
+            (
+                logits,
+                hidden_states,
+                self_attention_cache,
+                cross_attention_cache,
+            ) = call_decoder_with_cache(*args, **kwargs)
+            index = self.preprocessor.tokenizer.end_token_id
+            update = ops.ones_like(logits)[:, :, index] * 1.0e9
+            update = ops.expand_dims(update, axis=-1)
+            logits = ops.slice_update(logits, (0, 0, index), update)
+            return (
+                logits,
+                hidden_states,
+                self_attention_cache,
+                cross_attention_cache,
+            )
+
+        with patch.object(
+            self.seq_2_seq_lm, "call_decoder_with_cache", wraps=wrapper
+        ):
+            inputs = {
+                "encoder_audio": self.raw_batch["encoder_audio"],
+                "decoder_text": [" airplane at", " kohli"],
+            }
+            output = self.seq_2_seq_lm.generate(inputs)
+
+            # We should immediately abort and output the prompt.
+            self.assertAllEqual(inputs["decoder_text"], output)
+
+    def test_serialization(self):
+        new_seq_2_seq_lm = keras.saving.deserialize_keras_object(
+            keras.saving.serialize_keras_object(self.seq_2_seq_lm)
+        )
+        self.assertEqual(
+            new_seq_2_seq_lm.get_config(), self.seq_2_seq_lm.get_config()
+        )
@@ -111,6 +111,9 @@ class WhisperTokenizer(BytePairTokenizer):
         self.no_timestamps_token_id = special_tokens[no_timestamps_token]
         self.translate_token_id = special_tokens[translate_token]
         self.transcribe_token_id = special_tokens[transcribe_token]
+        # Generic names of the start and end tokens, used for generation.
+        self.start_token_id = self.bos_token_id
+        self.end_token_id = self.eos_token_id
 
         # TODO: Add language tokens to `unsplittable_tokens` once we figure
         # out the performance issue with a large list.
@@ -93,6 +93,8 @@ class WhisperTokenizerTest(TestCase):
         self.assertEqual(self.tokenizer.no_timestamps_token_id, 11)
         self.assertEqual(self.tokenizer.translate_token_id, 13)
         self.assertEqual(self.tokenizer.transcribe_token_id, 12)
+        self.assertEqual(self.tokenizer.start_token_id, 9)
+        self.assertEqual(self.tokenizer.end_token_id, 10)
 
     def test_errors_missing_special_tokens(self):
         with self.assertRaises(ValueError):
@@ -15,6 +15,7 @@
 from keras_nlp.backend import keras
 from keras_nlp.samplers.beam_sampler import BeamSampler
 from keras_nlp.samplers.contrastive_sampler import ContrastiveSampler
+from keras_nlp.samplers.finite_state_constraint import FiniteStateConstraint
 from keras_nlp.samplers.greedy_sampler import GreedySampler
 from keras_nlp.samplers.random_sampler import RandomSampler
 from keras_nlp.samplers.sampler import Sampler
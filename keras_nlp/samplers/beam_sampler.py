@@ -37,7 +37,33 @@ class BeamSampler(Sampler):
         num_beams: int. The number of beams that should be kept at each
             time-step. `num_beams` should be strictly positive.
         return_all_beams: bool. When set to `True`, the sampler will return all
-            beams and their respective probabilities score.
+            beams and their respective scores, sorted by score.
+        length_penalty: float. The exponent of the length normalization of
+            beam scores. Each sequence is scored by its log probability
+            divided by `length ** length_penalty`, where `length` is the
+            number of generated tokens. Values above `0.0` favor longer
+            sequences, and values below `0.0` favor shorter sequences.
+            Defaults to `1.0`.
+        early_stopping: bool. Controls when generation stops for each batch
+            row, if `end_token_id` is set. If `True`, a row stops as soon as
+            `num_beams` sequences have produced `end_token_id`. If `False`,
+            a row stops once no unfinished beam can still outscore the
+            finished sequences, which gives the same output as never stopping
+            early. Defaults to `False`.
+
+    Each beam which produces `end_token_id` is moved into a pool of finished
+    sequences for its batch row, holding the `num_beams` best scoring finished
+    sequences, and is replaced by the next best unfinished candidate. Once
+    generation stops, the pool is filled with the best unfinished beams.
+
+    Every step, the `cache` of each beam is replaced with the cache of the
+    beam it was extended from. `__call__` also takes an optional
+    `shared_cache`, a tensor or nested structure of tensors shared by all
+    beams, which is neither repeated nor reordered. If set, `next` is passed
+    a `(cache, shared_cache)` tuple as its cache, and should return it
+    updated. This lets models hold the cache of all beams in a shared pool,
+    and only reorder a small per-beam table indexing into it, held in
+    `cache`.
 
     Call arguments:
         {{call_args}}
@@ -99,11 +125,21 @@ class BeamSampler(Sampler):
         self,
         num_beams=5,
         return_all_beams=False,
+        length_penalty=1.0,
+        early_stopping=False,
         **kwargs,
     ):
         super().__init__(**kwargs)
+        if self.compact_batch:
+            raise ValueError(
+                "`BeamSampler` does not support `compact_batch=True`."
+            )
+        if self.constraint is not None:
+            raise ValueError("`BeamSampler` does not support `constraint`.")
         self.num_beams = num_beams
         self.return_all_beams = return_all_beams
+        self.length_penalty = length_penalty
+        self.early_stopping = early_stopping
 
     def __call__(
         self,
@@ -114,9 +150,11 @@ class BeamSampler(Sampler):
         mask=None,
         end_token_id=None,
         hidden_states=None,
+        shared_cache=None,
     ):
         batch_size, max_length = ops.shape(prompt)[0], ops.shape(prompt)[1]
         index = ops.cast(index, "int32")
+        start_index = index
 
         def create_beams(x):
             """Add initial beam state."""
@@ -132,35 +170,97 @@ class BeamSampler(Sampler):
             unflat_shape = (batch_size, self.num_beams) + tuple(x.shape)[1:]
             return ops.reshape(x, unflat_shape)
 
+        def take_beams(x, indices):
+            """Take beams of `x` along axis 1, `x` having the beam dim."""
+            for axis in range(2, len(x.shape)):
+                indices = ops.expand_dims(indices, axis=axis)
+            return ops.take_along_axis(x, indices, axis=1)
+
+        def score(log_probs, length):
+            """Normalize log-likelihoods by the number of generated tokens."""
+            length = ops.cast(ops.maximum(length, 1), "float32")
+            return log_probs / ops.power(length, self.length_penalty)
+
         if mask is None:
             mask = ops.zeros_like(prompt, dtype="bool")
         else:
             mask = ops.cast(mask, dtype="bool")
         # `ops.while_loop` will not accept `None` as a value for `loop_vars`.
-        has_cache = cache is not None
-        cache = cache if has_cache else ()
+        has_cache = cache is not None or shared_cache is not None
+        cache = cache if cache is not None else ()
+        # Only `cache` holds per-beam state, `shared_cache` is left as is.
+        is_shared = tree.map_structure(lambda _: False, cache)
+        if shared_cache is not None:
+            cache = (cache, shared_cache)
+            is_shared = (
+                is_shared,
+                tree.map_structure(lambda _: True, shared_cache),
+            )
+
+        def map_beams(fn, cache):
+            return tree.map_structure(
+                lambda x, shared: x if shared else fn(x), cache, is_shared
+            )
+
         # Add extra sequences for each beam.
         prompt, mask = create_beams(prompt), create_beams(mask)
-        cache = tree.map_structure(create_beams, cache)
+        cache = map_beams(create_beams, cache)
         # Setup the initial beam log-likelihoods.
         # On the first loop, make sure only the original beam is considered.
         log_probs = ops.array(
             [[0.0] + [-1e9] * (self.num_beams - 1)], dtype="float32"
         )
         log_probs = flatten_beams(ops.repeat(log_probs, batch_size, axis=0))
+        # Setup an empty pool of finished sequences for each batch row.
+        finished_prompts = unflatten_beams(prompt)
+        finished_scores = ops.full(
+            (batch_size, self.num_beams), -1e9, dtype="float32"
+        )
 
-        def cond(prompt, cache, index, log_probs):
+        def is_done(index, log_probs, finished_scores):
+            """Check which batch rows can stop generating."""
+            # The pool is sorted, with the worst score last.
+            pool_is_full = finished_scores[:, -1] > -1e9
+            if self.early_stopping:
+                return pool_is_full
+            # Log-likelihoods only decrease as beams grow, so the best score
+            # any beam can reach is bounded by its current log-likelihood,
+            # normalized by the length favored by `length_penalty`.
+            if self.length_penalty > 0:
+                length = max_length - start_index
+            else:
+                length = index - start_index
+            best_log_probs = ops.max(unflatten_beams(log_probs), axis=-1)
+            best_score = score(best_log_probs, length)
+            if self.return_all_beams:
+                # All finished sequences need to be final.
+                return pool_is_full & (best_score <= finished_scores[:, -1])
+            return best_score <= finished_scores[:, 0]
+
+        def cond(prompt, cache, index, log_probs, *finished):
             if end_token_id is None:
                 return True
-            # Stop if all sequences have produced a *new* end_token_id.
-            end_tokens = (prompt == end_token_id) & (~mask)
-            prompt_done = ops.any(end_tokens, axis=-1)
-            return ops.logical_not(ops.all(prompt_done))
+            finished_scores = finished[1]
+            done = is_done(index, log_probs, finished_scores)
+            return ops.logical_not(ops.all(done))
 
-        def body(prompt, cache, index, log_probs):
+        def body(
+            prompt,
+            cache,
+            index,
+            log_probs,
+            finished_prompts,
+            finished_scores,
+        ):
             # Compute the softmax distribution for the next token.
             logits, _, cache = next(prompt, cache, index)
             vocab_size = ops.shape(logits)[-1]
+            logits = ops.cast(logits, "float32")
+            if self.has_penalties:
+                # Count tokens from the prompt of each beam, which is
+                # reordered along with the beams.
+                counts = self.count_tokens(prompt, index, vocab_size)
+                logits = self.apply_penalties(logits, counts)
             probs = keras.activations.softmax(logits / self.temperature)
 
             # Compute the running log-likelihood of each new candidate.
@@ -168,70 +268,134 @@ class BeamSampler(Sampler):
             # Reshape `preds` to shape `(batch_size, num_beams * vocab_size)`.
             next_log_probs = ops.reshape(next_log_probs, [batch_size, -1])
 
-            # Compute the top beam indices and next tokens.
-            next_log_probs, indices = ops.top_k(
-                next_log_probs, k=self.num_beams, sorted=False
+            # Compute the top candidates. Each beam can end with at most one
+            # candidate, so `2 * num_beams` candidates always hold at least
+            # `num_beams` unfinished ones.
+            num_candidates = 2 * self.num_beams
+            candidate_log_probs, indices = ops.top_k(
+                next_log_probs, k=num_candidates, sorted=True
             )
             beam_indices = indices // vocab_size
-            next_token = flatten_beams(indices % vocab_size)
+            next_token = ops.cast(indices % vocab_size, prompt.dtype)
+            # Don't overwrite anywhere mask is True.
+            candidate_mask = take_beams(unflatten_beams(mask), beam_indices)
+            candidate_prompts = take_beams(
+                unflatten_beams(prompt), beam_indices
+            )
+            candidate_mask = candidate_mask[:, :, index]
+            next_token = ops.where(
+                candidate_mask, candidate_prompts[:, :, index], next_token
+            )
+            # Update each candidate with the next token.
+            candidate_prompts = ops.slice_update(
+                candidate_prompts, [0, 0, index], next_token[..., None]
+            )
+
+            if end_token_id is None:
+                is_end = ops.zeros_like(candidate_mask)
+            else:
+                is_end = (next_token == end_token_id) & (~candidate_mask)
+            # Move finished candidates ranking within the top `num_beams` to
+            # the pool, keeping the best `num_beams` finished sequences.
+            rank = ops.arange(num_candidates)[None, :]
+            end_scores = ops.where(
+                is_end & (rank < self.num_beams),
+                score(candidate_log_probs, index - start_index + 1),
+                -1e9,
+            )
+            finished_scores, pool_indices = ops.top_k(
+                ops.concatenate([finished_scores, end_scores], axis=1),
+                k=self.num_beams,
+                sorted=True,
+            )
+            finished_prompts = take_beams(
+                ops.concatenate([finished_prompts, candidate_prompts], axis=1),
+                pool_indices,
+            )
+
+            # Continue with the best `num_beams` unfinished candidates.
+            candidate_log_probs = ops.where(
+                is_end,
+                ops.full_like(candidate_log_probs, float("-inf")),
+                candidate_log_probs,
+            )
+            next_log_probs, live_indices = ops.top_k(
+                candidate_log_probs, k=self.num_beams, sorted=False
+            )
+            beam_indices = ops.take_along_axis(
+                beam_indices, live_indices, axis=1
+            )
+            prompt = flatten_beams(take_beams(candidate_prompts, live_indices))
+            if has_cache:
+                cache = map_beams(
+                    lambda x: flatten_beams(
+                        take_beams(unflatten_beams(x), beam_indices)
+                    ),
+                    cache,
+                )
             # We need `ensure_shape` as `top_k` will change the static shape.
             next_log_probs = flatten_beams(next_log_probs)
             # Work around for top_k output shape on tf backend.
             if isinstance(log_probs, tf.Tensor):
                 log_probs = tf.ensure_shape(next_log_probs, log_probs.shape)
+                finished_scores = tf.ensure_shape(
+                    finished_scores, (None, self.num_beams)
+                )
             else:
                 log_probs = next_log_probs
-
-            def gather_beams(x):
-                x = unflatten_beams(x)
-                indices = beam_indices
-                for axis in range(2, len(x.shape)):
-                    indices = ops.expand_dims(indices, axis=axis)
-                x = ops.take_along_axis(x, indices, axis=1)
-                return flatten_beams(x)
-
-            prompt = gather_beams(prompt)
-            if has_cache:
-                cache = tree.map_structure(gather_beams, cache)
-
-            # Update each beam with the next token.
-            next_token = ops.cast(next_token, prompt.dtype)
-            # Don't overwrite anywhere mask is True.
-            next_token = ops.where(mask[:, index], prompt[:, index], next_token)
-            # Update the prompt with the next token.
-            next_token = next_token[:, None]
-            prompt = ops.slice_update(prompt, [0, index], next_token)
             # Return the iteration of the loop state.
-            return (prompt, cache, index + 1, log_probs)
+            return (
+                prompt,
+                cache,
+                index + 1,
+                log_probs,
+                finished_prompts,
+                finished_scores,
+            )
 
-        prompt, _, _, log_probs = self.run_loop(
+        (
+            prompt,
+            _,
+            index,
+            log_probs,
+            finished_prompts,
+            finished_scores,
+        ) = self.run_loop(
             cond=cond,
             body=body,
-            loop_vars=(prompt, cache, index, log_probs),
+            loop_vars=(
+                prompt,
+                cache,
+                index,
+                log_probs,
+                finished_prompts,
+                finished_scores,
+            ),
             maximum_iterations=(max_length - index),
         )
 
-        all_prompts = unflatten_beams(prompt)
-        all_log_probs = unflatten_beams(log_probs)
+        # Fill the pool of rows still generating with their unfinished beams.
+        live_scores = score(unflatten_beams(log_probs), index - start_index)
+        if end_token_id is not None:
+            done = is_done(index, log_probs, finished_scores)
+            live_scores = ops.where(done[:, None], -1e9, live_scores)
+        all_scores, pool_indices = ops.top_k(
+            ops.concatenate([finished_scores, live_scores], axis=1),
+            k=self.num_beams,
+            sorted=True,
+        )
+        all_prompts = take_beams(
+            ops.concatenate(
+                [finished_prompts, unflatten_beams(prompt)], axis=1
+            ),
+            pool_indices,
+        )
 
         if self.return_all_beams:
-            sorted_indices = ops.argsort(-all_log_probs, axis=-1)
-            sorted_log_probs = ops.take_along_axis(
-                all_log_probs,
-                sorted_indices,
-                axis=1,
-            )
-            sorted_prompts = ops.take_along_axis(
-                all_prompts,
-                ops.expand_dims(sorted_indices, -1),
-                axis=1,
-            )
-            return sorted_prompts, sorted_log_probs
+            return all_prompts, all_scores
         else:
-            # Gather the top beam at each batch index.
-            top_beams = ops.argmax(all_log_probs, axis=-1)[:, None, None]
-            prompt = ops.take_along_axis(all_prompts, top_beams, axis=1)
-            return ops.squeeze(prompt, axis=1)
+            # Take the top beam at each batch index.
+            return all_prompts[:, 0, :]
 
     def get_config(self):
         config = super().get_config()
@@ -239,6 +403,8 @@ class BeamSampler(Sampler):
             {
                 "num_beams": self.num_beams,
                 "return_all_beams": self.return_all_beams,
+                "length_penalty": self.length_penalty,
+                "early_stopping": self.early_stopping,
             }
         )
         return config
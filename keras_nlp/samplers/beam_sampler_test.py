@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import numpy as np
 import pytest
 import tensorflow as tf
 from absl.testing import parameterized
@@ -81,6 +82,42 @@ class BeamSamplerTest(TestCase):
         )
         self.assertEqual(self.join_as_string(output), ["sequentially"])
 
+    def test_shared_cache(self):
+        cache_chars = list("sequentially")
+        cache = ops.array([[self.char_lookup[c] for c in cache_chars]])
+        # Shared by all beams, even though its first axis matches the batch.
+        shared = ops.zeros((1, 3))
+
+        def next(prompt, cache, index):
+            cache, shared = cache
+            self.assertEqual(tuple(cache.shape), (5, self.length))
+            self.assertEqual(tuple(shared.shape), (1, 3))
+            logits, hidden_states, cache = self.next(prompt, cache, index)
+            return logits, hidden_states, (cache, shared + 1.0)
+
+        prompt = ops.full((self.batch_size, self.length), self.char_lookup["z"])
+        output = self.sampler(
+            next=next,
+            prompt=prompt,
+            cache=cache,
+            shared_cache=shared,
+        )
+        self.assertEqual(self.join_as_string(output), ["sequentially"])
+
+    def test_repetition_penalty(self):
+        def next(prompt, cache, index):
+            batch_size = ops.shape(prompt)[0]
+            hidden_states = ops.ones([batch_size, 5])
+            # Return a distribution favoring "a", then "b".
+            logits = ops.one_hot(ops.zeros(batch_size, "int32"), 26) * 2.0
+            logits += ops.one_hot(ops.ones(batch_size, "int32"), 26)
+            return logits, hidden_states, cache
+
+        sampler = BeamSampler(num_beams=3, repetition_penalty=4.0)
+        prompt = ops.full((self.batch_size, self.length), self.char_lookup["x"])
+        output = sampler(next=next, prompt=prompt, index=5)
+        self.assertEqual(self.join_as_string(output), ["xxxxxabaaaaa"])
+
     def test_return_all_beams(self):
         cache_chars = list("sequentially")
         cache = ops.array([[self.char_lookup[c] for c in cache_chars]])
@@ -114,6 +151,85 @@ class BeamSamplerTest(TestCase):
         )
         self.assertEqual(self.join_as_string(output), ["sequentzzzzz"])
 
+    def markov_next(self, counter=None):
+        # Transition probabilities from the previous token, "a" ends a
+        # sequence. The best sequences are "a", "ba" and "bca".
+        transitions = np.full((self.vocab_size, self.vocab_size), 1e-9)
+        transitions[self.char_lookup["z"], :2] = [0.6, 0.4]
+        transitions[self.char_lookup["b"], [0, 2]] = [0.5, 0.5]
+        transitions[self.char_lookup["c"], 0] = 1.0
+        transitions = ops.array(np.log(transitions), dtype="float32")
+
+        def next(prompt, cache, index):
+            if counter is not None:
+                counter.assign_add(1)
+            logits = ops.take(transitions, prompt[:, index - 1], axis=0)
+            return logits, None, cache
+
+        return next
+
+    @parameterized.named_parameters(
+        ("no_penalty", 0.0, "zaaaaaaaaaaa"),
+        ("favor_long", 2.0, "zbcaaaaaaaaa"),
+    )
+    def test_length_penalty(self, length_penalty, expected):
+        prompt = ops.array([[self.char_lookup[c] for c in "zaaaaaaaaaaa"]])
+        output = BeamSampler(num_beams=3, length_penalty=length_penalty)(
+            next=self.markov_next(),
+            prompt=prompt,
+            index=1,
+            end_token_id=self.char_lookup["a"],
+        )
+        self.assertEqual(self.join_as_string(output), [expected])
+
+    def test_finished_pool(self):
+        prompt = ops.array([[self.char_lookup[c] for c in "zaaaaaaaaaaa"]])
+        beams, scores = BeamSampler(num_beams=3, return_all_beams=True)(
+            next=self.markov_next(),
+            prompt=prompt,
+            index=1,
+            end_token_id=self.char_lookup["a"],
+        )
+        # Finished beams stay in the pool, scored by their own length.
+        self.assertEqual(
+            [s[:4] for s in self.join_as_string(beams[0])],
+            ["zaaa", "zbca", "zbaa"],
+        )
+        self.assertAllClose(
+            scores[0], [np.log(0.6), np.log(0.2) / 3, np.log(0.2) / 2]
+        )
+
+    @pytest.mark.tf_only
+    def test_early_stopping_rule(self):
+        prompt = ops.array([[self.char_lookup[c] for c in "zaaaaaaaaaaa"]])
+        counter = tf.Variable(0)
+        BeamSampler(num_beams=2, length_penalty=0.0)(
+            next=self.markov_next(counter),
+            prompt=prompt,
+            index=1,
+            end_token_id=self.char_lookup["a"],
+        )
+        # Without length normalization, no beam can outscore "a".
+        self.assertEqual(int(counter.numpy()), 1)
+        counter = tf.Variable(0)
+        BeamSampler(num_beams=2)(
+            next=self.markov_next(counter),
+            prompt=prompt,
+            index=1,
+            end_token_id=self.char_lookup["a"],
+        )
+        # Normalized by length, "bca" could still win until it finishes.
+        self.assertEqual(int(counter.numpy()), 3)
+        counter = tf.Variable(0)
+        BeamSampler(num_beams=2, early_stopping=True)(
+            next=self.markov_next(counter),
+            prompt=prompt,
+            index=1,
+            end_token_id=self.char_lookup["a"],
+        )
+        # "a" and "ba" are the first two finished sequences.
+        self.assertEqual(int(counter.numpy()), 2)
+
     @parameterized.named_parameters(
         ("jit_compile_false", False), ("jit_compile_true", True)
     )
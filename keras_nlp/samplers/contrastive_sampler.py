@@ -40,6 +40,18 @@ class ContrastiveSampler(Sampler):
             on the similarity than the token probability.
         seed: int. The random seed. Defaults to `None`.
 
+    Each step, all `k` candidate tokens are scored with a single call to
+    `next`, on `k` copies of each row. `__call__` also takes an optional
+    `shared_cache`, a tensor or nested structure of tensors shared by all
+    rows and candidates, which is not copied. If set, `next` is passed a
+    `(cache, shared_cache)` tuple as its cache, and should return it updated.
+    This lets models hold the cache of all rows in a shared pool of cache
+    blocks, indexed by a per-row block table held in `cache`. As with any
+    per-row state, the `cache` of each row is replaced with the `cache`
+    returned for its selected candidate, so candidates should write their new
+    keys and values to separate blocks of the pool, and point their block
+    table at them.
+
     Call arguments:
         {{call_args}}
 
@@ -78,6 +90,14 @@ class ContrastiveSampler(Sampler):
         **kwargs,
     ):
         super().__init__(**kwargs)
+        if self.compact_batch:
+            raise ValueError(
+                "`ContrastiveSampler` does not support `compact_batch=True`."
+            )
+        if self.constraint is not None:
+            raise ValueError(
+                "`ContrastiveSampler` does not support `constraint`."
+            )
         self.k = k
         self.alpha = alpha
         self.seed = seed
@@ -91,6 +111,7 @@ class ContrastiveSampler(Sampler):
         mask=None,
         end_token_id=None,
         hidden_states=None,
+        shared_cache=None,
     ):
         if hidden_states is None:
             raise ValueError(
@@ -116,14 +137,36 @@ class ContrastiveSampler(Sampler):
             unflat_shape = (batch_size, self.k) + tuple(x.shape)[1:]
             return ops.reshape(x, unflat_shape)
 
+        def normalize(x):
+            return x / ops.sqrt(ops.sum(x * x, axis=-1, keepdims=True))
+
         mask = ops.zeros_like(prompt, dtype="bool") if mask is None else mask
+        has_cache = cache is not None or shared_cache is not None
+        # Only `cache` holds per-row state, `shared_cache` is never copied.
+        if shared_cache is not None:
+            cache = cache if cache is not None else ()
+        is_shared = tree.map_structure(lambda _: False, cache)
+        if shared_cache is not None:
+            cache = (cache, shared_cache)
+            is_shared = (
+                is_shared,
+                tree.map_structure(lambda _: True, shared_cache),
+            )
         # Compute initial logits.
         logits, _, cache = next(prompt, cache, index)
+        # Token counts for penalties. `ops.while_loop` will not accept `None`
+        # as a value for `loop_vars`.
+        counts = ()
+        if self.has_penalties:
+            vocabulary_size = ops.shape(logits)[-1]
+            counts = self.count_tokens(prompt, index, vocabulary_size)
         # `ops.while_loop` will not accept `None` as a value for `loop_vars`.
-        has_cache = cache is not None
         cache = cache if has_cache else ()
+        # Normalize hidden states once, so each step only computes the dot
+        # products of the new candidates with all previous tokens.
+        hidden_states = normalize(hidden_states)
 
-        def cond(prompt, cache, index, logits, hidden_states):
+        def cond(prompt, cache, index, logits, hidden_states, counts):
             if end_token_id is None:
                 return True
             # Stop if all sequences have produced a *new* end_token_id.
@@ -131,18 +174,23 @@ class ContrastiveSampler(Sampler):
             prompt_done = ops.any(end_tokens, axis=-1)
             return ops.logical_not(ops.all(prompt_done))
 
-        def body(prompt, cache, index, logits, hidden_states):
+        def body(prompt, cache, index, logits, hidden_states, counts):
             # Compute the softmax distribution for the next token.
+            if self.has_penalties:
+                logits = self.apply_penalties(logits, counts)
             probabilities = keras.activations.softmax(logits / self.temperature)
 
             # Replicate for `self.k` times to find the best token in top-k
             # candidates.
             prompt_beams = create_beams(prompt)
             mask_beams = create_beams(mask)
-            hidden_states_beams = create_beams(hidden_states)
             cache_beams = None
             if has_cache:
-                cache_beams = tree.map_structure(create_beams, cache)
+                cache_beams = tree.map_structure(
+                    lambda x, shared: x if shared else create_beams(x),
+                    cache,
+                    is_shared,
+                )
 
             # Get top-k candidate tokens and their probabilities.
             top_k_probabilities, top_k_indices = ops.top_k(
@@ -168,14 +216,17 @@ class ContrastiveSampler(Sampler):
 
             # Compute the max similarity score for top-k candidate tokens
             # against previous tokens.
-            similarity_scores = self.similarity(
-                hidden_states_beams, next_hidden_states_beams
+            next_hidden_states_beams = normalize(next_hidden_states_beams)
+            similarity_scores = ops.einsum(
+                "bkh,blh->bkl",
+                unflatten_beams(next_hidden_states_beams),
+                hidden_states,
             )
             # Replace all future indices with -1, the lowest similarity score.
-            score_mask = ops.expand_dims(ops.arange(max_length) < index, 0)
+            score_mask = ops.arange(max_length)[None, None, :] < index
             similarity_scores = ops.where(score_mask, similarity_scores, -1)
             max_similarity_scores = ops.cast(
-                ops.max(similarity_scores, axis=1),
+                flatten_beams(ops.max(similarity_scores, axis=-1)),
                 dtype=next_token_probabilities.dtype,
             )
             # The final score of each candidate token is weighted sum of
@@ -212,20 +263,27 @@ class ContrastiveSampler(Sampler):
             logits = gather_best_token(unflat_next_logits)
             next_hidden_states = gather_best_token(unflat_next_hidden_states)
             if has_cache:
-                cache = tree.map_structure(unflatten_beams, cache_beams)
-                cache = tree.map_structure(gather_best_token, cache)
+                cache = tree.map_structure(
+                    lambda x, shared: (
+                        x if shared else gather_best_token(unflatten_beams(x))
+                    ),
+                    cache_beams,
+                    is_shared,
+                )
 
             hidden_states = ops.slice_update(
                 hidden_states,
                 [0, index, 0],
                 next_hidden_states[:, None, :],
             )
-            return (prompt, cache, index + 1, logits, hidden_states)
+            if self.has_penalties:
+                counts = self.update_token_counts(counts, prompt[:, index])
+            return (prompt, cache, index + 1, logits, hidden_states, counts)
 
-        prompt, _, _, _, _ = self.run_loop(
+        prompt, _, _, _, _, _ = self.run_loop(
             cond=cond,
             body=body,
-            loop_vars=(prompt, cache, index, logits, hidden_states),
+            loop_vars=(prompt, cache, index, logits, hidden_states, counts),
             maximum_iterations=(max_length - index),
         )
         return prompt
@@ -89,6 +89,54 @@ class ContrastiveSamplerTest(TestCase):
         )
         self.assertEqual(self.join_as_string(output), ["sequentially"])
 
+    def test_shared_cache(self):
+        cache_chars = list("sequentiallyy")
+        cache = ops.array([[self.char_lookup[c] for c in cache_chars]])
+        # Shared by all candidates, even though its first axis matches the batch.
+        shared = ops.zeros((1, 3))
+        num_rows = []
+
+        def next(prompt, cache, index):
+            cache, shared = cache
+            self.assertEqual(tuple(shared.shape), (1, 3))
+            num_rows.append(tuple(cache.shape)[0])
+            logits, hidden_states, cache = self.next(prompt, cache, index)
+            return logits, hidden_states, (cache, shared + 1.0)
+
+        prompt = ops.full((self.batch_size, self.length), self.char_lookup["s"])
+        output = self.sampler(
+            next=next,
+            prompt=prompt,
+            cache=cache,
+            shared_cache=shared,
+            index=1,
+            hidden_states=self.hidden_states,
+        )
+        self.assertEqual(self.join_as_string(output), ["sequentially"])
+        # After the first call, `next` is only called to score candidates, on
+        # copies of each row.
+        self.assertEqual(num_rows[0], 1)
+        self.assertEqual(set(num_rows[1:]), {5})
+
+    def test_repetition_penalty(self):
+        def next(prompt, cache, index):
+            batch_size = ops.shape(prompt)[0]
+            hidden_states = ops.ones([batch_size, self.hidden_dim])
+            # Return a distribution favoring "a", then "b".
+            logits = ops.one_hot(ops.zeros(batch_size, "int32"), 26) * 2.0
+            logits += ops.one_hot(ops.ones(batch_size, "int32"), 26)
+            return logits, hidden_states, cache
+
+        sampler = ContrastiveSampler(k=2, alpha=0.0, repetition_penalty=4.0)
+        prompt = ops.full((self.batch_size, self.length), self.char_lookup["x"])
+        output = sampler(
+            next=next,
+            prompt=prompt,
+            index=5,
+            hidden_states=self.hidden_states,
+        )
+        self.assertEqual(self.join_as_string(output), ["xxxxxabaaaaa"])
+
     def test_early_stopping(self):
         cache_chars = list("sequentiallyy")
         cache = ops.array([[self.char_lookup[c] for c in cache_chars]])
@@ -0,0 +1,160 @@
+# Copyright 2023 The KerasNLP Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+
+from keras_nlp.api_export import keras_nlp_export
+from keras_nlp.backend import ops
+
+
+@keras_nlp_export("keras_nlp.samplers.FiniteStateConstraint")
+class FiniteStateConstraint:
+    """A token level finite-state automaton constraining generated tokens.
+
+    The automaton is a dense transition table over the vocabulary. Each
+    sequence starts in `initial_state`, and at each step, only tokens with a
+    transition from the current state of the sequence can be sampled. As the
+    table is a dense tensor, the constraint is applied inside the compiled
+    sampling loop, without leaving the loop for each token. Grammars such as
+    regular expressions or JSON schemas can be compiled to a token level
+    automaton ahead of time, and passed to any sampler with the `constraint`
+    argument.
+
+    Args:
+        transitions: An int array of shape `(num_states, vocabulary_size)`.
+            `transitions[s, t]` is the state reached by sampling token `t` in
+            state `s`, or `-1` if token `t` can not be sampled in state `s`.
+            Every state must allow at least one token, e.g. states accepting
+            a complete sequence should allow the end token.
+        initial_state: int. The state of each sequence before its first
+            generated token. Defaults to `0`.
+
+    Examples:
+    ```python
+    # Only generate "yes" or "no", followed by the end token.
+    tokenizer = keras_nlp.models.GPT2Tokenizer.from_preset("gpt2_base_en")
+    constraint = keras_nlp.samplers.FiniteStateConstraint.from_sequences(
+        [tokenizer(" yes"), tokenizer(" no")],
+        vocabulary_size=tokenizer.vocabulary_size(),
+        end_token_id=tokenizer.end_token_id,
+    )
+    gpt2_lm = keras_nlp.models.GPT2CausalLM.from_preset("gpt2_base_en")
+    gpt2_lm.compile(sampler=keras_nlp.samplers.TopKSampler(
+        constraint=constraint,
+    ))
+    gpt2_lm.generate("Is the sky blue? Answer:", max_length=30)
+    ```
+    """
+
+    def __init__(
+        self,
+        transitions,
+        initial_state=0,
+    ):
+        transitions = np.asarray(transitions, dtype="int32")
+        if transitions.ndim != 2:
+            raise ValueError(
+                "`transitions` must have shape "
+                "`(num_states, vocabulary_size)`. Received: "
+                f"transitions.shape={transitions.shape}"
+            )
+        num_states = transitions.shape[0]
+        if np.any(transitions < -1) or np.any(transitions >= num_states):
+            raise ValueError(
+                "`transitions` must only hold states in "
+                f"`[0, {num_states})`, or `-1` for tokens which are not "
+                "allowed."
+            )
+        if not np.all(np.any(transitions >= 0, axis=-1)):
+            raise ValueError(
+                "Every state of `transitions` must allow at least one token. "
+                "Received states allowing no tokens: "
+                f"{np.where(~np.any(transitions >= 0, axis=-1))[0].tolist()}"
+            )
+        if not 0 <= initial_state < num_states:
+            raise ValueError(
+                f"`initial_state` must be in `[0, {num_states})`. Received: "
+                f"initial_state={initial_state}"
+            )
+        self.transitions = transitions
+        self.initial_state = initial_state
+
+    @property
+    def num_states(self):
+        return self.transitions.shape[0]
+
+    @property
+    def vocabulary_size(self):
+        return self.transitions.shape[1]
+
+    def allowed_tokens(self, states):
+        """Get a bool mask of the tokens allowed in each state.
+
+        Args:
+            states: an int Tensor of shape `(batch_size,)`.
+
+        Returns a bool Tensor of shape `(batch_size, vocabulary_size)`.
+        """
+        transitions = ops.convert_to_tensor(self.transitions)
+        return ops.take(transitions, states, axis=0) >= 0
+
+    def next_states(self, states, tokens):
+        """Get the state of each sequence after sampling a token.
+
+        Args:
+            states: an int Tensor of shape `(batch_size,)`.
+            tokens: an int Tensor of shape `(batch_size,)`.
+
+        Returns an int Tensor of shape `(batch_size,)`.
+        """
+        transitions = ops.reshape(ops.convert_to_tensor(self.transitions), -1)
+        states = ops.cast(states, "int32")
+        tokens = ops.cast(tokens, "int32")
+        return ops.take(transitions, states * self.vocabulary_size + tokens)
+
+    @classmethod
+    def from_sequences(cls, sequences, vocabulary_size, end_token_id):
+        """Build a constraint allowing only the given token sequences.
+
+        Each generated sequence is one of `sequences`, followed by
+        `end_token_id`. After the end token, only the end token is allowed.
+
+        Args:
+            sequences: A list of token id sequences.
+            vocabulary_size: int. The size of the vocabulary.
+            end_token_id: int. The token id ending each sequence.
+        """
+        # Build a trie of all sequences. State `0` is the root, and state `1`
+        # is the final state, looping on the end token.
+        transitions = [[-1] * vocabulary_size, [-1] * vocabulary_size]
+        transitions[1][end_token_id] = 1
+        for sequence in sequences:
+            state = 0
+            for token in np.asarray(sequence).tolist():
+                if transitions[state][token] == -1:
+                    transitions[state][token] = len(transitions)
+                    transitions.append([-1] * vocabulary_size)
+                state = transitions[state][token]
+            transitions[state][end_token_id] = 1
+        return cls(transitions, initial_state=0)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(**config)
+
+    def get_config(self):
+        return {
+            "transitions": self.transitions.tolist(),
+            "initial_state": self.initial_state,
+        }
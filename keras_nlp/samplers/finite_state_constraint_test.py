@@ -0,0 +1,120 @@
+# Copyright 2023 The KerasNLP Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+
+from keras_nlp.backend import ops
+from keras_nlp.samplers.beam_sampler import BeamSampler
+from keras_nlp.samplers.finite_state_constraint import FiniteStateConstraint
+from keras_nlp.samplers.greedy_sampler import GreedySampler
+from keras_nlp.samplers.random_sampler import RandomSampler
+from keras_nlp.samplers.serialization import deserialize
+from keras_nlp.samplers.serialization import serialize
+from keras_nlp.tests.test_case import TestCase
+
+
+class FiniteStateConstraintTest(TestCase):
+    def setUp(self):
+        super().setUp()
+        # Use a simple alphabet of lowercase characters to [0, 26).
+        self.int_lookup = {i: chr(i + ord("a")) for i in range(26)}
+        self.char_lookup = {v: k for k, v in self.int_lookup.items()}
+        self.length = 8
+        self.vocab_size = len(self.int_lookup)
+        # Allow "cat" or "dog", ending with "z".
+        self.constraint = FiniteStateConstraint.from_sequences(
+            [self.tokenize("cat"), self.tokenize("dog")],
+            vocabulary_size=self.vocab_size,
+            end_token_id=self.char_lookup["z"],
+        )
+
+        def next(prompt, cache, index):
+            # Dummy hidden states.
+            batch_size = ops.shape(prompt)[0]
+            hidden_states = ops.ones([batch_size, 5])
+            # Return a distribution favoring "d", then "a".
+            logits = np.zeros((self.vocab_size,), "float32")
+            logits[self.char_lookup["d"]] = 2.0
+            logits[self.char_lookup["a"]] = 1.0
+            logits = ops.repeat(ops.array(logits)[None, :], batch_size, 0)
+            return logits, hidden_states, cache
+
+        self.next = next
+
+    def tokenize(self, x):
+        return [self.char_lookup[c] for c in x]
+
+    def join_as_string(self, x):
+        x = ops.convert_to_numpy(x)
+        return ["".join([self.int_lookup[i] for i in s]) for s in x]
+
+    def test_greedy(self):
+        sampler = GreedySampler(constraint=self.constraint)
+        prompt = ops.full((2, self.length), self.char_lookup["x"])
+        output = sampler(next=self.next, prompt=prompt, index=2)
+        self.assertEqual(self.join_as_string(output), ["xxdogzzz"] * 2)
+
+    def test_mask(self):
+        # Prompt tokens do not advance the state of a row.
+        sampler = GreedySampler(constraint=self.constraint)
+        prompt = ops.array(
+            [self.tokenize("xxcxxxxx"), self.tokenize("xxxxxxxx")]
+        )
+        mask = ops.array([[True] * 3 + [False] * 5, [True] * 2 + [False] * 6])
+        output = sampler(next=self.next, prompt=prompt, mask=mask, index=2)
+        self.assertEqual(self.join_as_string(output), ["xxcdogzz", "xxdogzzz"])
+
+    def test_random_compact_batch(self):
+        sampler = RandomSampler(
+            constraint=self.constraint,
+            compact_batch=True,
+            seed=42,
+        )
+        prompt = ops.full((8, self.length), self.char_lookup["x"])
+        output = sampler(
+            next=self.next,
+            prompt=prompt,
+            index=2,
+            end_token_id=self.char_lookup["z"],
+        )
+        for x in self.join_as_string(output):
+            self.assertIn(x[2:6], ["catz", "dogz"])
+
+    def test_transitions(self):
+        states = ops.array([0, 0, 1])
+        tokens = ops.array(self.tokenize("dcz"))
+        allowed = ops.convert_to_numpy(self.constraint.allowed_tokens(states))
+        self.assertEqual(np.where(allowed[0])[0].tolist(), self.tokenize("cd"))
+        self.assertEqual(np.where(allowed[2])[0].tolist(), self.tokenize("z"))
+        next_states = self.constraint.next_states(states, tokens)
+        self.assertAllEqual(next_states, [5, 2, 1])
+
+    def test_serialization(self):
+        sampler = GreedySampler(constraint=self.constraint)
+        restored = deserialize(serialize(sampler))
+        self.assertAllEqual(
+            restored.constraint.transitions, self.constraint.transitions
+        )
+
+    def test_invalid_transitions(self):
+        with self.assertRaises(ValueError):
+            FiniteStateConstraint(np.zeros((4,), "int32"))
+        with self.assertRaises(ValueError):
+            FiniteStateConstraint([[0, 2], [0, 1]])
+        with self.assertRaises(ValueError):
+            FiniteStateConstraint([[0, 1], [-1, -1]])
+        with self.assertRaises(ValueError):
+            FiniteStateConstraint([[0, 1], [1, 0]], initial_state=2)
+        with self.assertRaises(ValueError):
+            BeamSampler(constraint=self.constraint)
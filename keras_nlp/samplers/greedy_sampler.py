@@ -61,3 +61,12 @@ class GreedySampler(Sampler):
 
     def get_next_token(self, probabilities):
         return ops.argmax(probabilities, axis=-1)
+
+    def get_next_token_from_logits(self, logits):
+        # Temperature and softmax never change the most likely token.
+        return ops.argmax(logits, axis=-1)
+
+    def filter_probabilities(self, probabilities):
+        next_token = ops.argmax(probabilities, axis=-1)
+        vocab_size = ops.shape(probabilities)[-1]
+        return ops.one_hot(next_token, vocab_size, dtype=probabilities.dtype)
@@ -90,6 +90,82 @@ class GreedySamplerTest(TestCase):
         )
         self.assertEqual(self.join_as_string(output), ["sequentzzzzz"])
 
+    def test_compact_batch(self):
+        cache_chars = ["sequentially", "abtdefghijkl", "abcdtfghijkl"]
+        cache_chars += ["abcdefghijkt"]
+        cache = ops.array(
+            [[self.char_lookup[c] for c in s] for s in cache_chars]
+        )
+        prompt = ops.full((4, self.length), self.char_lookup["z"])
+        batch_sizes = []
+
+        def next(prompt, cache, index):
+            batch_sizes.append(ops.shape(prompt)[0])
+            logits = ops.one_hot(cache[:, index], self.vocab_size) * 1e9
+            return logits, None, cache
+
+        output = GreedySampler(compact_batch=True)(
+            next=next,
+            prompt=prompt,
+            cache=cache,
+            end_token_id=self.char_lookup["t"],
+        )
+        self.assertEqual(
+            self.join_as_string(output),
+            ["sequentzzzzz", "abtdezzzzzzz", "abcdtzzzzzzz", "abcdefghijkt"],
+        )
+        # Finished rows are dropped once the rest fit in half the batch.
+        self.assertEqual(sorted(set(batch_sizes), reverse=True), [4, 2, 1])
+
+    @parameterized.named_parameters(
+        ("repetition", {"repetition_penalty": 4.0}, "xxxxxabaa", "axxxxbaa"),
+        ("presence", {"presence_penalty": 1.5}, "xxxxxabaa", "axxxxbaa"),
+        ("frequency", {"frequency_penalty": 0.6}, "xxxxxaaba", "axxxxaba"),
+    )
+    def test_penalties(self, kwargs, expected, expected_with_prompt):
+        def next(prompt, cache, index):
+            batch_size = ops.shape(prompt)[0]
+            hidden_states = ops.ones([batch_size, 5])
+            # Return a distribution favoring "a", then "b".
+            logits = ops.one_hot(ops.zeros(batch_size, "int32"), 26) * 2.0
+            logits += ops.one_hot(ops.ones(batch_size, "int32"), 26)
+            return logits, hidden_states, cache
+
+        sampler = GreedySampler(**kwargs)
+        prompt = ops.full((self.batch_size, self.length), self.char_lookup["x"])
+        output = sampler(next=next, prompt=prompt, index=5)
+        output = self.join_as_string(output)[0]
+        self.assertEqual(output[: len(expected)], expected)
+        # Prompt tokens before `index` are penalized.
+        prompt = ops.array([[self.char_lookup[c] for c in "axxxxxxxxxxx"]])
+        output = sampler(next=next, prompt=prompt, index=5)
+        output = self.join_as_string(output)[0]
+        self.assertEqual(
+            output[: len(expected_with_prompt)], expected_with_prompt
+        )
+
+    def test_penalties_compact_batch(self):
+        def next(prompt, cache, index):
+            batch_size = ops.shape(prompt)[0]
+            # Return a distribution favoring "a", then "b", then "c".
+            logits = ops.one_hot(ops.zeros(batch_size, "int32"), 26) * 3.0
+            logits += ops.one_hot(ops.ones(batch_size, "int32"), 26) * 2.0
+            logits += ops.one_hot(ops.full(batch_size, 2, "int32"), 26)
+            return logits, None, cache
+
+        sampler = GreedySampler(repetition_penalty=4.0, compact_batch=True)
+        prompt = ops.array(
+            [[self.char_lookup[c] for c in x] for x in ("axxxxx", "xxxxxx")]
+        )
+        output = sampler(
+            next=next,
+            prompt=prompt,
+            index=1,
+            end_token_id=self.char_lookup["c"],
+        )
+        # Tokens are still counted per row once finished rows are dropped.
+        self.assertEqual(self.join_as_string(output), ["abcxxx", "xabcxx"])
+
     def test_is_greedy(self):
         def next(prompt, cache, index):
             # Dummy hidden states.
@@ -107,6 +183,11 @@ class GreedySamplerTest(TestCase):
         output_ids = set(ops.convert_to_numpy(output[0]))
         self.assertContainsSubset(output_ids, [0])
 
+    def test_filter_probabilities(self):
+        probabilities = ops.array([[0.1, 0.4, 0.2, 0.3]])
+        filtered = self.sampler.filter_probabilities(probabilities)
+        self.assertAllClose(filtered, [[0.0, 1.0, 0.0, 0.0]])
+
     @parameterized.named_parameters(
         ("jit_compile_false", False), ("jit_compile_true", True)
     )
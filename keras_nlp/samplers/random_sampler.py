@@ -68,15 +68,25 @@ class RandomSampler(Sampler):
         self.seed_generator = random.SeedGenerator(seed)
 
     def get_next_token(self, probabilities):
-        # Sample the next token from the probability distribution.
+        return self.sample(ops.log(probabilities))
+
+    def get_next_token_from_logits(self, logits):
+        # Sampling from scaled logits skips the softmax over the vocab.
+        return self.sample(ops.cast(logits, "float32") / self.temperature)
+
+    def sample(self, logits):
+        # Sample the next token from the unnormalized log probabilities.
         next_token_id = random.categorical(
-            ops.log(probabilities),
+            logits,
             1,
-            seed=self.seed,
+            seed=self.seed_generator,
             dtype="int32",
         )
         return ops.squeeze(next_token_id, axis=-1)
 
+    def filter_probabilities(self, probabilities):
+        return probabilities
+
     def get_config(self):
         config = super().get_config()
         config.update(
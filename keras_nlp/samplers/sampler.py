@@ -12,11 +12,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import tree
+
 from keras_nlp.api_export import keras_nlp_export
 from keras_nlp.backend import config
 from keras_nlp.backend import keras
 from keras_nlp.backend import ops
 from keras_nlp.backend import random
+from keras_nlp.samplers.finite_state_constraint import FiniteStateConstraint
 from keras_nlp.utils.python_utils import format_docstring
 
 call_args_docstring = """next: A function which takes in the
@@ -52,6 +55,27 @@ class Sampler:
         temperature: float. optional. Used to control the
             randomness of the sampling. The higher the temperature, the
             more diverse the samples. Defaults to `1.0`.
+        compact_batch: bool. If `True`, rows which have produced an
+            `end_token_id` are dropped from the batch as sampling continues,
+            so `next` is called on smaller batches. Whenever the unfinished
+            rows fit in half of the current batch, they are gathered into a
+            batch of half the size. This requires all per-row state used by
+            `next` to be passed through `cache`, with the batch on the first
+            axis of every tensor. Only used if `end_token_id` is set, and not
+            supported by samplers overriding `__call__`. Defaults to `False`.
+        constraint: Optional. A `keras_nlp.samplers.FiniteStateConstraint`.
+            If set, the logits of tokens which are not allowed in the current
+            state of each sequence are masked out before sampling, inside the
+            sampling loop. Only generated tokens, where `mask` is `False`,
+            advance the state of a sequence. Not supported by samplers
+            overriding `__call__`. Defaults to `None`.
+        repetition_penalty: float. Divides positive logits, and multiplies
+            negative logits, of all tokens already in a sequence, including
+            its prompt. `1.0` disables the penalty. Defaults to `1.0`.
+        presence_penalty: float. Subtracted from the logits of all tokens
+            already in a sequence. Defaults to `0.0`.
+        frequency_penalty: float. Subtracted from the logits of each token,
+            once for each time it occurs in a sequence. Defaults to `0.0`.
 
     Call arguments:
         {{call_args}}
@@ -92,8 +116,25 @@ class Sampler:
     def __init__(
         self,
         temperature=1.0,
+        compact_batch=False,
+        constraint=None,
+        repetition_penalty=1.0,
+        presence_penalty=0.0,
+        frequency_penalty=0.0,
     ):
+        if repetition_penalty <= 0:
+            raise ValueError(
+                "`repetition_penalty` must be positive. Received: "
+                f"repetition_penalty={repetition_penalty}"
+            )
         self.temperature = temperature
+        self.compact_batch = compact_batch
+        if isinstance(constraint, dict):
+            constraint = FiniteStateConstraint.from_config(constraint)
+        self.constraint = constraint
+        self.repetition_penalty = repetition_penalty
+        self.presence_penalty = presence_penalty
+        self.frequency_penalty = frequency_penalty
         self._seed_generators = []
 
     def __setattr__(self, name, value):
@@ -131,6 +172,16 @@ class Sampler:
             mask = ops.cast(mask, dtype="bool")
         # `ops.while_loop` will not accept `None` as a value for `loop_vars`.
         cache = () if cache is None else cache
+        constraint = self.constraint
+        # Per-row sampler state is passed through the cache, so that it
+        # follows rows dropped by `compact_batch`.
+        state = {}
+        if constraint is not None:
+            state["constraint_states"] = ops.full(
+                (ops.shape(prompt)[0],), constraint.initial_state, "int32"
+            )
+        if state:
+            cache = (cache, state)
 
         def cond(prompt, cache, index):
             if end_token_id is None:
@@ -140,22 +191,53 @@ class Sampler:
             prompt_done = ops.any(end_tokens, axis=-1)
             return ops.logical_not(ops.all(prompt_done))
 
-        def body(prompt, cache, index):
-            # Compute the softmax distribution for the next token.
-            logits, _, cache = next(prompt, cache, index)
-            probabilities = keras.activations.softmax(logits / self.temperature)
+        def sample(prompt, cache, index, mask):
+            if state:
+                cache, row_state = cache
+                row_state = dict(row_state)
             # Compute the next token.
-            next_token = self.get_next_token(probabilities)
+            logits, _, cache = next(prompt, cache, index)
+            if self.has_penalties:
+                # Count tokens from the prompt, which already follows rows
+                # dropped by `compact_batch`.
+                vocabulary_size = ops.shape(logits)[-1]
+                counts = self.count_tokens(prompt, index, vocabulary_size)
+                logits = self.apply_penalties(logits, counts)
+            if constraint is not None:
+                # Mask out tokens not allowed in the state of each row.
+                states = row_state["constraint_states"]
+                allowed = constraint.allowed_tokens(states)
+                logits = ops.where(allowed, logits, -1e9)
+            next_token = self.get_next_token_from_logits(logits)
             # Don't overwrite anywhere mask is True.
             next_token = ops.cast(next_token, prompt.dtype)
             next_token = ops.where(mask[:, index], prompt[:, index], next_token)
+            if constraint is not None:
+                next_states = constraint.next_states(states, next_token)
+                states = ops.where(mask[:, index], states, next_states)
+                row_state["constraint_states"] = states
+            if state:
+                cache = (cache, row_state)
             # Update the prompt with the next token.
             next_token = next_token[:, None]
             prompt = ops.slice_update(prompt, [0, index], next_token)
+            return prompt, cache
 
+        def body(prompt, cache, index):
+            prompt, cache = sample(prompt, cache, index, mask)
             # Return the next prompt, cache and incremented index.
             return (prompt, cache, index + 1)
 
+        batch_size = ops.shape(prompt)[0]
+        if (
+            self.compact_batch
+            and end_token_id is not None
+            and isinstance(batch_size, int)
+        ):
+            return self.run_compacted_loop(
+                sample, prompt, cache, index, mask, end_token_id
+            )
+
         prompt, _, _ = self.run_loop(
             cond,
             body,
@@ -199,6 +281,143 @@ class Sampler:
             )
         return loop_vars
 
+    def run_compacted_loop(
+        self,
+        sample,
+        prompt,
+        cache,
+        index,
+        mask,
+        end_token_id,
+    ):
+        """Run the sampling loop, dropping finished rows from the batch.
+
+        The loop runs in stages, halving the batch size after each stage, so
+        there are at most `log2(batch_size) + 1` stages with static shapes. A
+        stage ends once the unfinished rows fit in half of its batch. Its rows
+        are then written to the output, and the unfinished rows are gathered,
+        in order, into the batch of the next stage.
+
+        Args:
+            sample: A function which takes in `prompt, cache, index, mask`,
+                and returns the `prompt` and `cache` updated with a new token
+                at `index`.
+            prompt: The initial prompt.
+            cache: The initial cache.
+            index: The first index to sample at.
+            mask: The mask of locations which are never updated.
+            end_token_id: The token marking the end of a sequence.
+        """
+        batch_size = ops.shape(prompt)[0]
+        max_length = ops.shape(prompt)[-1]
+        output = prompt
+        row_ids = ops.arange(batch_size, dtype="int32")
+
+        def is_unfinished(prompt, mask):
+            end_tokens = (prompt == end_token_id) & (~mask)
+            return ops.logical_not(ops.any(end_tokens, axis=-1))
+
+        def body(prompt, cache, index, mask):
+            prompt, cache = sample(prompt, cache, index, mask)
+            return (prompt, cache, index + 1, mask)
+
+        size = batch_size
+        while True:
+            next_size = size // 2
+
+            def cond(prompt, cache, index, mask):
+                unfinished = ops.cast(is_unfinished(prompt, mask), "int32")
+                return ops.sum(unfinished) > next_size
+
+            prompt, cache, index, mask = self.run_loop(
+                cond,
+                body,
+                loop_vars=(prompt, cache, index, mask),
+                maximum_iterations=(max_length - index),
+            )
+            output = ops.scatter_update(output, row_ids[:, None], prompt)
+            if next_size == 0:
+                return output
+
+            # Rank unfinished rows first, then by position in the batch.
+            unfinished = ops.cast(is_unfinished(prompt, mask), "int32")
+            positions = ops.arange(size, 0, -1, dtype="int32")
+            _, indices = ops.top_k(unfinished * size + positions, k=next_size)
+
+            def gather(x):
+                return ops.take(x, indices, axis=0)
+
+            prompt, mask, row_ids = (
+                gather(prompt),
+                gather(mask),
+                gather(row_ids),
+            )
+            cache = tree.map_structure(gather, cache)
+            size = next_size
+
+    @property
+    def has_penalties(self):
+        """Whether any repetition, presence or frequency penalty is set."""
+        return (
+            self.repetition_penalty != 1.0
+            or self.presence_penalty != 0.0
+            or self.frequency_penalty != 0.0
+        )
+
+    def count_tokens(self, prompt, index, vocabulary_size):
+        """Count the occurrences of each token before `index`.
+
+        Returns an int Tensor of shape `(batch_size, vocabulary_size)`. This
+        is a single scatter over the sequence, so samplers can recount tokens
+        at each step from the logits of that step, without any per-row state.
+        Counts can also be updated with `update_token_counts()` as tokens are
+        sampled.
+        """
+        batch_size, length = ops.shape(prompt)[0], ops.shape(prompt)[1]
+        rows = ops.repeat(ops.arange(batch_size, dtype="int32"), length)
+        tokens = ops.reshape(ops.cast(prompt, "int32"), (-1,))
+        positions = ops.arange(length, dtype="int32")[None, :] < index
+        counts = ops.repeat(positions, batch_size, axis=0)
+        return ops.scatter(
+            ops.stack([rows, tokens], axis=1),
+            ops.reshape(ops.cast(counts, "int32"), (-1,)),
+            (batch_size, vocabulary_size),
+        )
+
+    def update_token_counts(self, counts, tokens):
+        """Add one new token for each row to the token counts."""
+        batch_size = ops.shape(counts)[0]
+        rows = ops.arange(batch_size, dtype="int32")
+        indices = ops.stack([rows, ops.cast(tokens, "int32")], axis=1)
+        ones = ops.ones((batch_size,), dtype="int32")
+        return counts + ops.scatter(indices, ones, ops.shape(counts))
+
+    def apply_penalties(self, logits, counts):
+        """Apply the repetition, presence and frequency penalties to logits.
+
+        Args:
+            logits: a Tensor, the unnormalized log probabilities for next
+                token over all vocab tokens.
+            counts: an int Tensor with the same shape as `logits`, the counts
+                of each token in each sequence, from `count_tokens()`.
+        """
+        counts = ops.cast(counts, logits.dtype)
+        seen = counts > 0
+        if self.repetition_penalty != 1.0:
+            penalized = ops.where(
+                logits > 0,
+                logits / self.repetition_penalty,
+                logits * self.repetition_penalty,
+            )
+            logits = ops.where(seen, penalized, logits)
+        if self.presence_penalty != 0.0:
+            logits = logits - self.presence_penalty * ops.cast(
+                seen, logits.dtype
+            )
+        if self.frequency_penalty != 0.0:
+            logits = logits - self.frequency_penalty * counts
+        return logits
+
     def get_next_token(self, probabilities):
         """Get the next token.
         Args:
@@ -209,9 +428,48 @@ class Sampler:
         """
         raise NotImplementedError
 
+    def get_next_token_from_logits(self, logits):
+        """Get the next token from unnormalized logits.
+
+        Args:
+            logits: a Tensor, the unnormalized log probabilities for next
+                token over all vocab tokens, before applying `temperature`.
+
+        By default, this computes a softmax distribution with `temperature`
+        and calls `get_next_token()`. Subclasses can override this method to
+        sample directly from the logits, with a single pass over the vocab.
+        """
+        probabilities = keras.activations.softmax(logits / self.temperature)
+        return self.get_next_token(probabilities)
+
+    def filter_probabilities(self, probabilities):
+        """Get the distribution `get_next_token()` samples from.
+
+        Args:
+            probabilities: a Tensor, the probability distribution for next
+                token over all vocab tokens.
+
+        Returns a Tensor with the same shape as `probabilities`, the normalized
+        probability of sampling each vocab token as the next token. This is
+        used by speculative decoding, which needs the exact distribution of
+        the sampler to accept or reject draft tokens. Subclasses implementing
+        `get_next_token()` should implement this method.
+        """
+        raise NotImplementedError
+
     @classmethod
     def from_config(cls, config):
         return cls(**config)
 
     def get_config(self):
-        return {"temperature": self.temperature}
+        constraint = self.constraint
+        if constraint is not None:
+            constraint = constraint.get_config()
+        return {
+            "temperature": self.temperature,
+            "compact_batch": self.compact_batch,
+            "constraint": constraint,
+            "repetition_penalty": self.repetition_penalty,
+            "presence_penalty": self.presence_penalty,
+            "frequency_penalty": self.frequency_penalty,
+        }
@@ -71,17 +71,24 @@ class TopKSampler(Sampler):
         self.seed_generator = random.SeedGenerator(seed)
 
     def get_next_token(self, probabilities):
+        return self.sample(ops.log(probabilities))
+
+    def get_next_token_from_logits(self, logits):
+        # Sampling from scaled logits skips the softmax over the vocab.
+        # tf does not support half precision multinomial sampling, so make
+        # sure we have full precision here.
+        return self.sample(ops.cast(logits, "float32") / self.temperature)
+
+    def sample(self, logits):
         # Filter out top-k tokens.
-        top_k_pred, top_k_indices = ops.top_k(
-            probabilities,
+        top_k_logits, top_k_indices = ops.top_k(
+            logits,
             k=self.k,
             sorted=False,
         )
-        # Sample the next token from the probability distribution.
+        # Sample the next token from the unnormalized log probabilities.
         sample_indices = random.categorical(
-            # tf does not support half precision multinomial sampling, so make
-            # sure we have full precision here.
-            ops.cast(ops.log(top_k_pred), "float32"),
+            ops.cast(top_k_logits, "float32"),
             1,
             seed=self.seed_generator,
             dtype="int32",
@@ -91,6 +98,17 @@ class TopKSampler(Sampler):
         output = ops.take_along_axis(top_k_indices, sample_indices, axis=-1)
         return ops.squeeze(output, axis=-1)
 
+    def filter_probabilities(self, probabilities):
+        _, top_k_indices = ops.top_k(probabilities, k=self.k, sorted=False)
+        # Zero out all but the top-k tokens, and renormalize.
+        vocab_size = ops.shape(probabilities)[-1]
+        top_k_mask = ops.one_hot(top_k_indices, vocab_size, dtype="int32")
+        top_k_mask = ops.sum(top_k_mask, axis=1) > 0
+        probabilities = ops.where(
+            top_k_mask, probabilities, ops.zeros_like(probabilities)
+        )
+        return probabilities / ops.sum(probabilities, axis=-1, keepdims=True)
+
     def get_config(self):
         config = super().get_config()
         config.update(
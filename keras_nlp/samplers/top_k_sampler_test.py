@@ -107,6 +107,11 @@ class TopKSamplerTest(TestCase):
         output_ids = set(ops.convert_to_numpy(output[0]))
         self.assertContainsSubset(output_ids, range(5))
 
+    def test_filter_probabilities(self):
+        probabilities = ops.array([[0.1, 0.4, 0.2, 0.3]])
+        filtered = TopKSampler(k=2).filter_probabilities(probabilities)
+        self.assertAllClose(filtered, [[0.0, 4.0 / 7.0, 0.0, 3.0 / 7.0]])
+
     @parameterized.named_parameters(
         ("jit_compile_false", False), ("jit_compile_true", True)
     )
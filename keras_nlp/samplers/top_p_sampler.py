@@ -19,6 +19,10 @@ from keras_nlp.samplers.sampler import Sampler
 from keras_nlp.samplers.sampler import call_args_docstring
 from keras_nlp.utils.python_utils import format_docstring
 
+# The number of most likely tokens searched for the nucleus before sorting the
+# whole vocabulary.
+NUM_CANDIDATES = 1024
+
 
 @format_docstring(call_args=call_args_docstring)
 @keras_nlp_export("keras_nlp.samplers.TopPSampler")
@@ -36,9 +40,10 @@ class TopPSampler(Sampler):
         k: int. If set, this argument defines a
             heuristic "top-k" cutoff applied before the "top-p" sampling. All
             logits not in the top `k` will be discarded, and the remaining
-            logits will be sorted to find a cutoff point for `p`. Setting this
-            arg can significantly speed sampling up by reducing the number
-            of tokens to sort. Defaults to `None`.
+            logits will be sorted to find a cutoff point for `p`. If `None`,
+            the cutoff point is searched in the top 1024 tokens, and the whole
+            vocabulary is only sorted if the cutoff is not found there.
+            Defaults to `None`.
         seed: int. The random seed. Defaults to `None`.
 
     Call arguments:
@@ -81,35 +86,93 @@ class TopPSampler(Sampler):
         self.seed_generator = random.SeedGenerator(seed)
 
     def get_next_token(self, probabilities):
-        cutoff = ops.shape(probabilities)[1]
-        if self.k is not None:
-            # If `k` is set, only sample from top `k` tokens.
-            cutoff = self.k
-        sorted_preds, sorted_indices = ops.top_k(
-            probabilities, k=cutoff, sorted=True
-        )
-        # Calculate cumulative probability distribution.
-        cumulative_probabilities = ops.cumsum(sorted_preds, axis=-1)
-        # Create a mask for the tokens to keep.
-        keep_mask = cumulative_probabilities <= self.p
-        # Shift to include the last token that exceed p.
-        shifted_keep_mask = ops.concatenate(
-            [ops.ones_like(keep_mask[:, :1]), keep_mask[:, :-1]], axis=-1
-        )
-        # Filter out unmasked tokens and sample from filtered distribution.
-        probabilities = ops.where(
-            shifted_keep_mask,
-            sorted_preds,
-            ops.zeros(ops.shape(sorted_preds), dtype=sorted_preds.dtype),
+        return self.sample(ops.log(probabilities))
+
+    def get_next_token_from_logits(self, logits):
+        # Sampling from scaled logits skips the softmax over the vocab.
+        return self.sample(ops.cast(logits, "float32") / self.temperature)
+
+    def sample(self, logits):
+        # Drop all tokens outside the nucleus and sample from the rest.
+        logits = ops.cast(logits, "float32")
+        logits = ops.where(
+            self.compute_nucleus_mask(logits),
+            logits,
+            ops.full_like(logits, float("-inf")),
         )
-        sorted_next_token = random.categorical(
-            ops.log(probabilities),
+        next_token = random.categorical(
+            logits,
             1,
             seed=self.seed_generator,
             dtype="int32",
         )
-        output = ops.take_along_axis(sorted_indices, sorted_next_token, axis=-1)
-        return ops.squeeze(output, axis=-1)
+        return ops.squeeze(next_token, axis=-1)
+
+    def filter_probabilities(self, probabilities):
+        probabilities = ops.where(
+            self.compute_nucleus_mask(ops.log(probabilities)),
+            probabilities,
+            ops.zeros_like(probabilities),
+        )
+        return probabilities / ops.sum(probabilities, axis=-1, keepdims=True)
+
+    def compute_nucleus_mask(self, logits):
+        """Compute a boolean mask of the tokens in the nucleus of each row.
+
+        Rather than sorting the whole vocabulary, we first search the nucleus
+        in the top `NUM_CANDIDATES` tokens of each row, which is enough for all
+        but the flattest distributions. Only if the nucleus of some row is not
+        within these candidates do we fall back to sorting the vocabulary.
+
+        The nucleus is selected by rank, as in a full sort. Tokens tied with
+        the smallest logit of the nucleus are kept in vocabulary order, as
+        `top_k` orders ties, until the nucleus has the same number of tokens.
+        """
+        vocab_size = ops.shape(logits)[-1]
+        # Normalize over the whole vocabulary, without a full softmax.
+        log_normalizer = ops.logsumexp(logits, axis=-1, keepdims=True)
+
+        def search(num_candidates):
+            top_logits, _ = ops.top_k(logits, k=num_candidates, sorted=True)
+            probabilities = ops.exp(top_logits - log_normalizer)
+            # Keep all tokens until the cumulative probability exceeds `p`.
+            cumulative_probabilities = ops.cumsum(probabilities, axis=-1)
+            keep_mask = ops.concatenate(
+                [
+                    ops.ones_like(top_logits[:, :1], dtype="bool"),
+                    cumulative_probabilities[:, :-1] <= self.p,
+                ],
+                axis=-1,
+            )
+            num_kept = ops.sum(
+                ops.cast(keep_mask, "int32"), axis=-1, keepdims=True
+            )
+            # The kept tokens are sorted, so the last one has the smallest
+            # logit.
+            threshold = ops.take_along_axis(top_logits, num_kept - 1, axis=-1)
+            found = ops.all(cumulative_probabilities[:, -1] > self.p)
+            return threshold, num_kept, found
+
+        if self.k is not None:
+            # If `k` is set, only sample from top `k` tokens.
+            threshold, num_kept, _ = search(self.k)
+        elif vocab_size <= NUM_CANDIDATES:
+            threshold, num_kept, _ = search(vocab_size)
+        else:
+            threshold, num_kept, found = search(NUM_CANDIDATES)
+            threshold, num_kept = ops.cond(
+                found,
+                lambda: (threshold, num_kept),
+                lambda: search(vocab_size)[:2],
+            )
+        above = logits > threshold
+        tied = logits == threshold
+        # Keep only as many tied tokens as fit in the nucleus.
+        num_tied_kept = num_kept - ops.sum(
+            ops.cast(above, "int32"), axis=-1, keepdims=True
+        )
+        tied_rank = ops.cumsum(ops.cast(tied, "int32"), axis=-1)
+        return above | (tied & (tied_rank <= num_tied_kept))
 
     def get_config(self):
         config = super().get_config()
@@ -142,6 +142,72 @@ class TopPSamplerTest(TestCase):
         )
         self.assertAllEqual(output, ops.zeros_like(output))
 
+    def test_large_vocabulary(self):
+        # Peaked rows find the nucleus in the top candidates, while flat rows
+        # need to search the whole vocabulary.
+        vocab_size = 4096
+        logits = np.random.default_rng(0).normal(size=(2, vocab_size))
+        logits[0] *= 10.0
+        logits = logits.astype("float32")
+        sampler = TopPSampler(p=0.9)
+        probabilities = ops.convert_to_numpy(ops.softmax(logits))
+        for row in probabilities:
+            filtered_row = sampler.filter_probabilities(row[None, :])[0]
+            # Compare with sorting the whole vocabulary.
+            order = np.argsort(-row)
+            cumulative = np.cumsum(row[order])
+            num_kept = np.sum(cumulative[:-1] <= 0.9) + 1
+            expected = np.zeros_like(row)
+            expected[order[:num_kept]] = row[order[:num_kept]]
+            expected /= expected.sum()
+            self.assertAllClose(filtered_row, expected)
+        # Sampled tokens are always in the nucleus.
+        filtered = sampler.filter_probabilities(probabilities)
+        next_token = sampler.get_next_token_from_logits(logits)
+        self.assertAllGreater(
+            ops.take_along_axis(filtered, next_token[:, None], axis=-1), 0
+        )
+
+    def test_tied_logits(self):
+        # Tokens tied with the smallest logit of the nucleus are only kept up
+        # to the size of the nucleus, as with a full sort.
+        logits = ops.ones((self.batch_size, self.vocab_size))
+        probabilities = ops.softmax(logits)
+        filtered = TopPSampler(p=0.1).filter_probabilities(probabilities)
+        expected = np.zeros((self.batch_size, self.vocab_size))
+        expected[:, :3] = 1.0 / 3.0
+        self.assertAllClose(filtered, expected)
+        filtered = TopPSampler(p=1.0, k=5).filter_probabilities(probabilities)
+        expected = np.zeros((self.batch_size, self.vocab_size))
+        expected[:, :5] = 1.0 / 5.0
+        self.assertAllClose(filtered, expected)
+        # Also when the nucleus is searched in the whole vocabulary.
+        vocab_size = 4096
+        probabilities = ops.softmax(ops.ones((1, vocab_size)))
+        filtered = TopPSampler(p=0.1).filter_probabilities(probabilities)
+        self.assertEqual(np.count_nonzero(filtered), 410)
+
+        def next(prompt, cache, index):
+            # Dummy hidden states.
+            hidden_states = ops.ones([self.batch_size, 5])
+            # A uniform distribution over the alphabet.
+            logits = ops.ones((self.batch_size, self.vocab_size))
+            return logits, hidden_states, cache
+
+        prompt = ops.full((self.batch_size, self.length), self.char_lookup["z"])
+        output = TopPSampler(p=0.1)(
+            next=next,
+            prompt=prompt,
+            index=5,
+        )
+        generated_str = self.join_as_string(output[:, 5:])[0]
+        self.assertContainsSubset(set(generated_str), set("abc"))
+
+    def test_filter_probabilities(self):
+        probabilities = ops.array([[0.1, 0.4, 0.2, 0.3]])
+        filtered = TopPSampler(p=0.6).filter_probabilities(probabilities)
+        self.assertAllClose(filtered, [[0.0, 4.0 / 7.0, 0.0, 3.0 / 7.0]])
+
     @parameterized.named_parameters(
         ("jit_compile_false", False), ("jit_compile_true", True)
     )
@@ -131,6 +131,30 @@ def truncate_at_token(inputs, token, mask):
     return tf.RaggedTensor.from_tensor(inputs, end_indices)
 
 
+def shift_sequences(inputs, shifts, fill_value=0):
+    """Shift each row of `inputs` to the left by a per row amount.
+
+    Positions shifted in from past the end of a row (or from before the start
+    of a row, for negative `shifts`) are set to `fill_value`.
+
+    Args:
+        inputs: A dense tensor with shape `(batch_size, sequence_length, ...)`.
+        shifts: An int tensor with shape `(batch_size,)`. The number of
+            positions to shift each row left along the sequence axis.
+        fill_value: The value used for positions shifted in.
+    """
+    sequence_length = ops.shape(inputs)[1]
+    positions = ops.arange(sequence_length, dtype="int32")[None, :]
+    positions = positions + ops.cast(shifts, "int32")[:, None]
+    valid = ops.logical_and(positions >= 0, positions < sequence_length)
+    positions = ops.clip(positions, 0, sequence_length - 1)
+    for _ in range(len(inputs.shape) - 2):
+        positions = ops.expand_dims(positions, axis=-1)
+        valid = ops.expand_dims(valid, axis=-1)
+    outputs = ops.take_along_axis(inputs, positions, axis=1)
+    return ops.where(valid, outputs, ops.cast(fill_value, outputs.dtype))
+
+
 def assert_tf_text_installed(symbol_name):
     if tf_text is None:
         raise ImportError(
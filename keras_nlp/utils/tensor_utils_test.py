@@ -17,6 +17,7 @@ import tensorflow as tf
 from keras_nlp.backend import ops
 from keras_nlp.tests.test_case import TestCase
 from keras_nlp.utils.tensor_utils import convert_to_ragged_batch
+from keras_nlp.utils.tensor_utils import shift_sequences
 from keras_nlp.utils.tensor_utils import tensor_to_list
 
 
@@ -97,3 +98,23 @@ class ConvertToRaggedBatch(TestCase):
         self.assertAllEqual(outputs, [[1, 2], [1]])
         self.assertFalse(unbatched)
         self.assertFalse(rectangular)
+
+
+class ShiftSequencesTest(TestCase):
+    def test_shift_left_and_right(self):
+        inputs = ops.array([[1, 2, 3, 4], [1, 2, 3, 4]])
+        outputs = shift_sequences(inputs, ops.array([1, -2]))
+        self.assertAllEqual(outputs, [[2, 3, 4, 0], [0, 0, 1, 2]])
+
+    def test_fill_value(self):
+        inputs = ops.array([[True, False, False]])
+        outputs = shift_sequences(inputs, ops.array([2]), fill_value=True)
+        self.assertAllEqual(outputs, [[False, True, True]])
+
+    def test_higher_rank(self):
+        inputs = ops.reshape(ops.arange(12, dtype="float32"), (2, 3, 2))
+        outputs = shift_sequences(inputs, ops.array([0, 1]))
+        self.assertAllEqual(
+            outputs,
+            [[[0, 1], [2, 3], [4, 5]], [[8, 9], [10, 11], [0, 0]]],
+        )